@@ -0,0 +1,104 @@
+"""
+Memory and join/leave cost of the WebSocket connection registry at 100k
+connections, next to the structures it replaced (a user -> socket dict for
+chat, room -> list of sockets for live).
+
+    PYTHONPATH=src python benchmarks/connections_memory.py
+
+Sockets, user ids and channel names are allocated before measuring: they
+exist whatever the bookkeeping looks like, so the numbers are what the
+bookkeeping itself costs. CONNECTIONS and ROOM_SIZE can be set in the
+environment.
+"""
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+from eron.core.websocket.registry import ConnectionRegistry
+
+CONNECTIONS = int(os.getenv("CONNECTIONS", "100000"))
+ROOM_SIZE = int(os.getenv("ROOM_SIZE", "1000"))
+# members that leave one by one from the biggest room for the churn timing
+CHURN = int(os.getenv("CHURN", "5000"))
+
+
+class FakeWebSocket:
+    __slots__ = ()
+
+
+def measure(build) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main():
+    sockets = [FakeWebSocket() for _ in range(CONNECTIONS)]
+    user_ids = [f"{i:08x}-0000-4000-8000-000000000000" for i in range(CONNECTIONS)]
+    channels = [f"live_{i}_1700000000" for i in range(CONNECTIONS // ROOM_SIZE + 1)]
+
+    # --- before: chat dict + live dict of lists ---
+    def old_idle():
+        return {user_ids[i]: sockets[i] for i in range(CONNECTIONS)}
+
+    def old_rooms():
+        rooms = {}
+        for i in range(CONNECTIONS):
+            rooms.setdefault(channels[i // ROOM_SIZE], []).append(sockets[i])
+        return rooms
+
+    old_users, old_idle_bytes = measure(old_idle)
+    old_room_map, old_room_bytes = measure(old_rooms)
+
+    # --- after: registry records + user and room indexes ---
+    registry = ConnectionRegistry("bench")
+
+    def register():
+        return [registry.register(sockets[i], user_ids[i]) for i in range(CONNECTIONS)]
+
+    conns, idle_bytes = measure(register)
+    # the list holding the records stands in for the handler coroutines' references
+    idle_bytes -= sys.getsizeof(conns)
+
+    def join():
+        for i, conn in enumerate(conns):
+            registry.join(conn, channels[i // ROOM_SIZE], "viewer")
+
+    _, room_bytes = measure(join)
+
+    # --- churn: members leaving a full room one by one ---
+    big = [sockets[i] for i in range(CONNECTIONS)]
+    started = time.perf_counter()
+    for websocket in sockets[:CHURN]:
+        big.remove(websocket)
+    list_leave = (time.perf_counter() - started) / CHURN
+
+    big_registry = ConnectionRegistry("bench-churn")
+    big_conns = [big_registry.register(sockets[i], user_ids[i]) for i in range(CONNECTIONS)]
+    for conn in big_conns:
+        big_registry.join(conn, channels[0], "viewer")
+    started = time.perf_counter()
+    for conn in big_conns[:CHURN]:
+        big_registry.leave(conn)
+    registry_leave = (time.perf_counter() - started) / CHURN
+
+    print(f"connections: {CONNECTIONS}, room size: {ROOM_SIZE}, rooms: {len(old_room_map)}")
+    print(f"{'':34}{'before':>12}{'registry':>12}")
+    print(f"{'bytes per idle connection':34}{old_idle_bytes / CONNECTIONS:12.1f}{idle_bytes / CONNECTIONS:12.1f}")
+    print(f"{'bytes per room member':34}{old_room_bytes / CONNECTIONS:12.1f}{room_bytes / CONNECTIONS:12.1f}")
+    print(f"{'total MiB':34}{(old_idle_bytes + old_room_bytes) / 2 ** 20:12.1f}"
+          f"{(idle_bytes + room_bytes) / 2 ** 20:12.1f}")
+    print(f"{'leave, 1 room of ' + str(CONNECTIONS) + ' (us)':34}{list_leave * 1e6:12.2f}{registry_leave * 1e6:12.2f}")
+    print("before: user id / channel / role lived in handler locals and aren't counted;"
+          " the registry's records carry them and can be inspected.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+401 throughput with the old print()-based HTTP exception handler vs the
+queued, sampled logging handler.
+
+Every request hits an authenticated route with a bad bearer token, so it is
+rejected in get_current_user before any database access and the cost is
+routing + JWT decode + exception handling + logging. No MongoDB needed.
+
+    python benchmarks/error_logging.py > /dev/null          # stdout to a file
+    python benchmarks/error_logging.py | cat > /dev/null    # stdout to a pipe (as under docker)
+
+Results go to stderr. REQUESTS and CONCURRENCY can be set in the environment.
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+from eron.core.logger.logger import setup_logging, shutdown_logging
+from eron.main import app
+
+REQUESTS = int(os.getenv("REQUESTS", "20000"))
+CONCURRENCY = int(os.getenv("CONCURRENCY", "50"))
+
+
+async def print_http_exception_handler(_: Request, exc: Exception):
+    # the handler as it was before structured logging
+    if isinstance(exc, StarletteHTTPException):
+        print(f"status:error")
+        print(f"message:{exc.detail}")
+        print(f"code:{exc.status_code}")
+
+        return JSONResponse(
+            status_code=exc.status_code,
+            content={"status": "error", "message": exc.detail, "code": exc.status_code},
+        )
+    return JSONResponse(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, content={"status": "fail"})
+
+
+@asynccontextmanager
+async def no_database(_):
+    yield
+
+
+async def hammer(client: httpx.AsyncClient) -> float:
+    remaining = REQUESTS
+    headers = {"Authorization": "Bearer expired.token.value"}
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            response = await client.get("/api/v1/social/me/counts", headers=headers)
+            assert response.status_code == 401
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    return REQUESTS / (time.perf_counter() - started)
+
+
+async def main():
+    app.router.lifespan_context = no_database
+    # the client's own per-request log lines aren't part of what we measure
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    original_handler = app.exception_handlers[StarletteHTTPException]
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # warm up routing / JWT code paths
+        await client.get("/api/v1/social/me/counts", headers={"Authorization": "Bearer x"})
+
+        app.exception_handlers[StarletteHTTPException] = print_http_exception_handler
+        app.middleware_stack = None
+        before = await hammer(client)
+
+        app.exception_handlers[StarletteHTTPException] = original_handler
+        app.middleware_stack = None
+        setup_logging()
+        after = await hammer(client)
+        shutdown_logging()
+
+    print(f"401/s with print():            {before:10.0f}", file=sys.stderr)
+    print(f"401/s with queued logging:     {after:10.0f}", file=sys.stderr)
+    print(f"speedup:                       {after / before:10.2f}x", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
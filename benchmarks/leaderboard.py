@@ -0,0 +1,59 @@
+"""
+Leaderboard operations on the in-memory RankedSet next to what a board
+without an ordered structure costs: sorting every score for a top-N or a
+rank-of-host query.
+
+    PYTHONPATH=src python benchmarks/leaderboard.py
+
+HOSTS and QUERIES can be set in the environment.
+"""
+import os
+import random
+import time
+
+from eron.core.leaderboard.ranked_set import RankedSet
+
+HOSTS = int(os.getenv("HOSTS", "100000"))
+QUERIES = int(os.getenv("QUERIES", "2000"))
+
+
+def per_op(fn, count: int) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def main():
+    random.seed(1)
+    hosts = [f"{i:08x}-0000-4000-8000-000000000000" for i in range(HOSTS)]
+    scores = {host: random.randint(0, 10 ** 6) for host in hosts}
+    board = RankedSet()
+    for host, score in scores.items():
+        board.set(host, score)
+
+    def increment():
+        host = random.choice(hosts)
+        scores[host] += 1
+        board.add(host, 1)
+
+    def sorted_top():
+        sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:10]
+
+    def sorted_rank():
+        host = random.choice(hosts)
+        order = sorted(scores, key=lambda h: (-scores[h], h))
+        order.index(host)
+
+    slow_queries = max(QUERIES // 100, 5)
+    print(f"hosts: {HOSTS}")
+    print(f"{'':22}{'full sort (us)':>16}{'RankedSet (us)':>16}")
+    print(f"{'increment':22}{per_op(lambda: scores.__setitem__(hosts[0], scores[hosts[0]] + 1), QUERIES):16.2f}"
+          f"{per_op(increment, QUERIES):16.2f}")
+    print(f"{'top 10':22}{per_op(sorted_top, slow_queries):16.0f}{per_op(lambda: board.top(10), QUERIES):16.2f}")
+    print(f"{'rank of a host':22}{per_op(sorted_rank, slow_queries):16.0f}"
+          f"{per_op(lambda: board.rank(random.choice(hosts)), QUERIES):16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+from jose import jwt
+
+from eron.users.utils import get_current_user
+from eron.users.utils.password import hash_password, verify_password
+from eron.users.utils.token_generate import create_access_token
+
+CLAIMS = {"sub": "3f2b8f8e-6a0c-4c39-9a57-2d8b1f0c7e11", "email": "user@bench.example.com", "role": "USER"}
+
+
+def test_create_access_token(benchmark):
+    benchmark(create_access_token, CLAIMS)
+
+
+def test_decode_access_token(benchmark):
+    # the part of get_current_user that runs before the database lookup
+    token = create_access_token(CLAIMS)
+    payload = benchmark(
+        jwt.decode, token, get_current_user.SECRET_KEY, algorithms=[get_current_user.ALGORITHM]
+    )
+    assert payload["sub"] == CLAIMS["sub"]
+
+
+def test_argon2_hash(benchmark):
+    benchmark.pedantic(hash_password, args=("correct horse battery staple",), rounds=20, warmup_rounds=1)
+
+
+def test_argon2_verify(benchmark):
+    hashed = hash_password("correct horse battery staple")
+    assert benchmark.pedantic(
+        verify_password, args=("correct horse battery staple", hashed), rounds=20, warmup_rounds=1
+    )
@@ -0,0 +1,80 @@
+import json
+import time
+
+import pytest
+from typing import List
+
+from agora_token_builder import RtcTokenBuilder
+from pydantic import TypeAdapter
+
+from eron.chats.schemas.chat_schemas import chat_frame_adapter
+from eron.core.websocket.protocol import CODECS, OutgoingFrame
+from eron.live_stream.utils.agora_tokens import APP_CERTIFICATE, APP_ID, AgoraTokens
+from eron.users.schemas.user_schemas import UserResponse
+
+user_list = TypeAdapter(List[UserResponse])
+
+COMMENT_PAYLOAD = {
+    "event": "new_comment",
+    "user": {
+        "id": "3f2b8f8e-6a0c-4c39-9a57-2d8b1f0c7e11",
+        "name": "ইউজার নাম",
+        "avatar": "https://cdn.pixabay.com/photo/2017/06/13/12/54/profile-2398783_1280.png",
+    },
+    "message": "হ্যালো, কেমন আছেন? 👋",
+    "total_comments": 1234,
+}
+ROOM_SIZE = 100
+
+
+def encode(payload: dict) -> str:
+    # what starlette's WebSocket.send_json does per call
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+
+def test_user_response_validate_1k(benchmark, users):
+    result = benchmark(user_list.validate_python, users, from_attributes=True)
+    assert len(result) == len(users)
+
+
+def test_user_response_serialize_1k(benchmark, users):
+    validated = user_list.validate_python(users, from_attributes=True)
+    benchmark(lambda: json.dumps(user_list.dump_python(validated, mode="json")))
+
+
+def test_rtc_token_build(benchmark):
+    expire = int(time.time()) + 3600
+    benchmark(RtcTokenBuilder.buildTokenWithUid, APP_ID, APP_CERTIFICATE, "live_bench_1700000000", 0, 2, expire)
+
+
+def test_rtc_token_cached(benchmark):
+    # what join_live / renew_token pay once the channel's viewer token exists
+    tokens = AgoraTokens()
+    tokens.get("live_bench_1700000000", "viewer")
+    benchmark(tokens.get, "live_bench_1700000000", "viewer")
+
+
+def test_chat_send_message_parse(benchmark):
+    raw = json.dumps({"receiver_id": "3f2b8f8e-6a0c-4c39-9a57-2d8b1f0c7e11", "message": "হ্যালো, কেমন আছেন?"})
+    benchmark(chat_frame_adapter.validate_json, raw)
+
+
+def test_broadcast_encode_once(benchmark):
+    benchmark(encode, COMMENT_PAYLOAD)
+
+
+def test_broadcast_encode_per_recipient(benchmark):
+    # what LiveConnectionManager.broadcast did with send_json: one encode per socket
+    benchmark(lambda: [encode(COMMENT_PAYLOAD) for _ in range(ROOM_SIZE)])
+
+
+@pytest.mark.parametrize("protocol", sorted(CODECS))
+def test_broadcast_frame_per_protocol(benchmark, protocol):
+    # LiveConnectionManager.broadcast now: one OutgoingFrame, encoded once per protocol
+    codec = CODECS[protocol]
+
+    def broadcast():
+        frame = OutgoingFrame(COMMENT_PAYLOAD)
+        return [frame.encoded(codec) for _ in range(ROOM_SIZE)]
+
+    benchmark(broadcast)
@@ -0,0 +1,65 @@
+"""
+CPU cost of the work every request pays for, pinned with pytest-benchmark.
+
+Run from the repository root (pytest-benchmark is a dev dependency):
+
+    pytest benchmarks/micro --benchmark-save=baseline   # record a baseline
+    pytest benchmarks/micro                             # compare, fail on regressions
+
+Every run is compared with the latest run saved in benchmarks/micro/baselines
+(one folder per machine/interpreter, committed) and a median more than 20%
+slower fails. On a machine without a baseline the first run records one
+instead of comparing (with a warning): commit it, later runs compare with
+it. The folder is only named after OS/interpreter, so the committed baseline
+should come from the machine that runs the comparison (the CI runner).
+Files are named bench_*.py so the regular test run doesn't collect them.
+"""
+import os
+from pathlib import Path
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("AGORA_APP_ID", "970ca35de60c44645bbae8a215061b33")
+os.environ.setdefault("AGORA_APP_CERTIFICATE", "5cfd2fd1755d40ecb72977518be15d3b")
+
+from datetime import datetime, timezone
+
+import pytest
+from pytest_benchmark.utils import get_machine_id
+
+from eron.users.models.user_models import UserModel
+
+BASELINES = Path(__file__).parent / "baselines"
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # runs before pytest-benchmark reads its options
+    config.option.benchmark_storage = f"file://{BASELINES}"
+    machine = BASELINES / get_machine_id()
+    if any(machine.glob("[0-9][0-9][0-9][0-9]_*.json")) or config.option.benchmark_disable:
+        return
+    if not (config.option.benchmark_save or config.option.benchmark_autosave):
+        # first run here: it becomes the baseline
+        config.option.benchmark_save = "baseline"
+        config.issue_config_time_warning(pytest.PytestConfigWarning(
+            f"no benchmark baseline for {machine.name}, recording one in {machine}: commit it"
+        ), stacklevel=2)
+    # nothing to compare with yet
+    config.option.benchmark_compare = False
+    config.option.benchmark_compare_fail = None
+
+
+@pytest.fixture(scope="session")
+def users():
+    # model_construct: no collection needed, same attributes the routers return
+    now = datetime.now(timezone.utc)
+    return [
+        UserModel.model_construct(
+            first_name="User", last_name=str(i), email=f"user{i}@bench.example.com",
+            phone_number="+8801700000000", coins=50.0, is_verified=True,
+            following_count=i % 300, followers_count=i % 500, total_like=i,
+            created_at=now, updated_at=now,
+        )
+        for i in range(1000)
+    ]
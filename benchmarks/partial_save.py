@@ -0,0 +1,111 @@
+"""
+Full-document save() vs BaseCollection.save_changes().
+
+Seeds a user whose `following` array holds FOLLOWING_SIZE links, then runs the
+two hot mutations we care about (presence toggle and a follow) ROUNDS times
+with each strategy. A pymongo CommandListener records the BSON size of every
+write command actually sent to the server.
+
+    MONGODB_URL=mongodb://localhost:27017 python benchmarks/partial_save.py
+
+Uses a throwaway database (`eron_bench`) which is dropped at the end.
+"""
+import asyncio
+import os
+import statistics
+import time
+
+import bson
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from eron.db import MODELS
+from eron.users.models.user_models import UserModel
+
+MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+DATABASE_NAME = "eron_bench"
+FOLLOWING_SIZE = int(os.getenv("FOLLOWING_SIZE", "5000"))
+ROUNDS = int(os.getenv("ROUNDS", "200"))
+
+WRITE_COMMANDS = {"update", "findAndModify", "insert"}
+
+
+class WriteSizeListener(monitoring.CommandListener):
+    def __init__(self):
+        self.bytes_sent = 0
+        self.commands = 0
+
+    def reset(self):
+        self.bytes_sent = 0
+        self.commands = 0
+
+    def started(self, event):
+        if event.command_name in WRITE_COMMANDS:
+            self.commands += 1
+            self.bytes_sent += len(bson.encode(event.command))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def run_round(user: UserModel, target: UserModel, partial: bool):
+    user.is_online = not user.is_online
+    user.following.append(target)
+    user.following_count += 1
+    if partial:
+        await user.save_changes()
+    else:
+        await user.save()
+
+
+async def measure(listener: WriteSizeListener, user: UserModel, targets, partial: bool):
+    listener.reset()
+    latencies = []
+    for target in targets:
+        started = time.perf_counter()
+        await run_round(user, target, partial)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    latencies.sort()
+    return {
+        "strategy": "save_changes" if partial else "save",
+        "write_commands": listener.commands,
+        "bytes_per_write": listener.bytes_sent // max(listener.commands, 1),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+    }
+
+
+async def main():
+    listener = WriteSizeListener()
+    client = AsyncIOMotorClient(
+        MONGODB_URL, uuidRepresentation="standard", event_listeners=[listener]
+    )
+    await init_beanie(database=client[DATABASE_NAME], document_models=MODELS)
+
+    try:
+        followed = [UserModel(email=f"seed{i}@bench.example.com") for i in range(FOLLOWING_SIZE)]
+        await UserModel.insert_many(followed)
+        targets = [UserModel(email=f"target{i}@bench.example.com") for i in range(ROUNDS * 2)]
+        await UserModel.insert_many(targets)
+
+        user = UserModel(email="heavy@bench.example.com", following=followed, following_count=FOLLOWING_SIZE)
+        await user.insert()
+        user = await UserModel.get(user.id)
+
+        for result in (
+            await measure(listener, user, targets[:ROUNDS], partial=False),
+            await measure(listener, user, targets[ROUNDS:], partial=True),
+        ):
+            print(result)
+    finally:
+        await client.drop_database(DATABASE_NAME)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,713 @@
+"""
+Load generator for the chat (/api/v1/chat/ws) and live (/api/v1/live/ws)
+WebSockets.
+
+    python benchmarks/ws_load.py run --clients 2000 --out ws_load.json
+    python benchmarks/ws_load.py run --clients 4000 --mix join_storm=1,comment_burst=2,chat=1
+    python benchmarks/ws_load.py run --mongo mongodb://localhost:27017 --clients 1000
+
+`run` starts the app in a subprocess (`serve`) on a free port, seeds
+--clients users, and drives the scenarios in --mix concurrently, splitting
+the clients between them by weight. By default the server uses an in-memory
+mongomock-motor database; --mongo points it at a real mongod instead
+(database eron_loadtest, emptied on start). The Agora token builder is
+stubbed either way. mongomock scans and copies whole collections on every
+query, so its numbers are only good for comparing runs with each other; use
+a real mongod for absolute figures. To drive an already running server:
+
+    python benchmarks/ws_load.py serve --port 8100 --users 2000 --tokens-out /tmp/tokens.json
+    python benchmarks/ws_load.py run --url ws://127.0.0.1:8100 --tokens /tmp/tokens.json --server-pid <pid>
+
+Scenarios:
+    join_storm     rooms of --room-size; every viewer sends join_live at the
+                   same moment. Latency: join_live -> joined_success.
+    like_storm     viewers send --likes likes each. A like carries nothing to
+                   correlate it by, so each one is followed by a fence frame
+                   (send_comment without a message, answered with an error
+                   only to the sender after the like was fully handled).
+                   Latency: send_like -> fence reply.
+    comment_burst  viewers send --comments comments each, back to back.
+                   Latency: send -> delivery, at every member of the room.
+    chat           clients paired up, --messages each way at --chat-rate/s.
+                   Latency: send -> delivery at the receiver.
+
+Results (p50/p95/p99 per scenario, throughput, server RSS) are written as
+JSON to --out and printed to stdout. --protocol msgpack has the clients
+negotiate the MessagePack subprotocol instead of JSON; --deflate has them
+offer permessage-deflate.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+try:
+    import msgpack
+except ImportError:  # only needed for --protocol msgpack
+    msgpack = None
+
+# the app's sources, so the commands above work without PYTHONPATH=src
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+SCENARIOS = ("join_storm", "like_storm", "comment_burst", "chat")
+DEFAULT_MIX = "join_storm=1,like_storm=1,comment_burst=1,chat=1"
+MARKER = "lt"
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+# ---------------------------------------------------------------- server
+
+def install_mongomock_compat():
+    """
+    mongomock gaps that the app hits: no BSON round trip for UUIDs, DBRef
+    fields can't be addressed with "field.$id", and $lookup doesn't accept
+    a pipeline (Beanie adds one for nested links). Only used by `serve`.
+    """
+    from uuid import UUID
+    from bson import Binary, DBRef
+    import mongomock.aggregate
+    import mongomock.collection
+    import mongomock.filtering
+    import mongomock.helpers
+
+    def ref_id(ref: DBRef):
+        return Binary.from_uuid(ref.id) if isinstance(ref.id, UUID) else ref.id
+
+    mongomock.collection.BSON = None
+
+    iter_key_candidates = mongomock.filtering.iter_key_candidates
+
+    def iter_key_candidates_with_refs(key, doc):
+        if isinstance(doc, DBRef):
+            doc = {"$ref": doc.collection, "$id": ref_id(doc)}
+        return iter_key_candidates(key, doc)
+
+    mongomock.filtering.iter_key_candidates = iter_key_candidates_with_refs
+
+    get_value_by_dot = mongomock.helpers.get_value_by_dot
+
+    def get_value_by_dot_with_refs(doc, key, *args, **kwargs):
+        if key.endswith(".$id"):
+            ref = get_value_by_dot(doc, key[:-4], *args, **kwargs)
+            if isinstance(ref, DBRef):
+                return ref_id(ref)
+        return get_value_by_dot(doc, key, *args, **kwargs)
+
+    mongomock.helpers.get_value_by_dot = get_value_by_dot_with_refs
+
+    handle_lookup = mongomock.aggregate._handle_lookup_stage
+
+    def handle_lookup_without_pipeline(in_collection, database, options):
+        # nested links stay unresolved, the live handlers only read host.id
+        options = {key: value for key, value in options.items() if key != "pipeline"}
+        return handle_lookup(in_collection, database, options)
+
+    mongomock.aggregate._PIPELINE_HANDLERS["$lookup"] = handle_lookup_without_pipeline
+
+
+def serve(args):
+    raise_fd_limit()
+    if SRC not in sys.path:
+        sys.path.insert(0, SRC)
+    os.environ.setdefault("SECRET_KEY", "loadtest-secret")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["DATABASE_NAME"] = args.database
+    # clients here don't retry on retry_later, so admission control is off unless asked for
+    os.environ["WS_ADMISSION_RATE"] = str(args.admission_rate)
+    # storms send far more likes/comments per user than the limiter allows
+    os.environ["RATE_LIMITS"] = args.rate_limits
+    if args.mongo != "mock":
+        os.environ["MONGODB_URL"] = args.mongo
+
+    if args.mongo == "mock":
+        install_mongomock_compat()
+        from mongomock_motor import AsyncMongoMockClient
+        import eron.db
+
+        # pymongo event listeners mean nothing to mongomock
+        eron.db.AsyncIOMotorClient = lambda url, event_listeners=None, **kwargs: AsyncMongoMockClient(**kwargs)
+
+    from agora_token_builder import RtcTokenBuilder
+    RtcTokenBuilder.buildTokenWithUid = staticmethod(lambda *args: "loadtest-agora-token")
+
+    import uvicorn
+    from eron.db import MODELS
+    from eron.main import app
+    from eron.users.models.user_models import UserModel
+    from eron.users.utils.token_generate import create_access_token
+
+    app_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def seeded_lifespan(_app):
+        async with app_lifespan(_app):
+            for model in MODELS:
+                await model.delete_all()
+            users = [
+                UserModel(
+                    email=f"load{i}@bench.example.com",
+                    first_name="Load", last_name=str(i),
+                    is_verified=True, coins=1_000_000,
+                )
+                for i in range(args.users)
+            ]
+            for start in range(0, len(users), 1000):
+                await UserModel.insert_many(users[start:start + 1000])
+            tokens = [{"id": str(user.id), "token": create_access_token({"sub": str(user.id)})} for user in users]
+
+            # written last: its appearance tells `run` the server is ready
+            partial = args.tokens_out + ".partial"
+            with open(partial, "w") as f:
+                json.dump(tokens, f)
+            os.replace(partial, args.tokens_out)
+            yield
+
+    app.router.lifespan_context = seeded_lifespan
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+# ---------------------------------------------------------------- client
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class Recorder:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: List[float] = []
+        self.counters: Dict[str, int] = {}
+        self.started = self.finished = 0.0
+
+    def latency(self, seconds: float):
+        self.latencies.append(seconds)
+
+    def count(self, key: str, n: int = 1):
+        self.counters[key] = self.counters.get(key, 0) + n
+
+    def summary(self) -> dict:
+        duration = max(self.finished - self.started, 1e-9)
+
+        def ms(value):
+            return None if value is None else round(value * 1000, 3)
+
+        return {
+            "samples": len(self.latencies),
+            "p50_ms": ms(percentile(self.latencies, 50)),
+            "p95_ms": ms(percentile(self.latencies, 95)),
+            "p99_ms": ms(percentile(self.latencies, 99)),
+            "max_ms": ms(max(self.latencies) if self.latencies else None),
+            "duration_s": round(duration, 3),
+            "throughput_per_s": round(len(self.latencies) / duration, 1),
+            **self.counters,
+        }
+
+
+class RssSampler:
+    """VmRSS of the server process from /proc, sampled in the background."""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.25):
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[int] = []
+        self._task = None
+
+    def read(self) -> Optional[int]:
+        if not self.pid:
+            return None
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            return None
+        return None
+
+    async def _run(self):
+        while True:
+            value = self.read()
+            if value is not None:
+                self.samples.append(value)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> dict:
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        end = self.read()
+
+        def mb(value):
+            return None if value is None else round(value / 2 ** 20, 1)
+
+        return {
+            "pid": self.pid,
+            "rss_start_mb": mb(self.samples[0] if self.samples else None),
+            "rss_peak_mb": mb(max(self.samples) if self.samples else None),
+            "rss_end_mb": mb(end),
+        }
+
+
+class Client:
+    """One WebSocket connection with a reader task dispatching to `on_event`."""
+
+    def __init__(self, base_url: str, path: str, token: str, user_id: str, protocol: str = "json",
+                 deflate: bool = False):
+        self.url = f"{base_url}{path}?token={token}"
+        self.protocol = protocol
+        self.deflate = deflate
+        self.user_id = user_id
+        self.ws = None
+        self.reader = None
+        self.on_event = None
+        self.waiters: Dict[str, asyncio.Future] = {}
+        self.closed = False
+
+    async def connect(self, timeout: float):
+        from websockets.asyncio.client import connect
+        # no client keepalive: a saturated server answering pings late is what
+        # we're measuring, not a reason to drop the connection
+        self.ws = await connect(
+            self.url, open_timeout=timeout, max_size=None, ping_interval=None,
+            compression="deflate" if self.deflate else None,
+            subprotocols=[self.protocol] if self.protocol != "json" else None,
+        )
+        self.reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        try:
+            async for raw in self.ws:
+                received = time.perf_counter()
+                event = msgpack.unpackb(raw) if isinstance(raw, bytes) else json.loads(raw)
+                name = event.get("event") or ("error" if "error" in event else "message")
+                waiter = self.waiters.pop(name, None)
+                if waiter and not waiter.done():
+                    waiter.set_result((received, event))
+                if self.on_event:
+                    self.on_event(received, event)
+        except Exception:
+            pass
+        self.closed = True
+
+    def expect(self, event_name: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[event_name] = future
+        return future
+
+    async def send(self, payload: dict) -> bool:
+        from websockets.exceptions import ConnectionClosed
+        try:
+            await self.ws.send(msgpack.packb(payload) if self.protocol == "msgpack" else json.dumps(payload))
+            return True
+        except ConnectionClosed:
+            self.closed = True
+            return False
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+        if self.reader is not None:
+            await asyncio.gather(self.reader, return_exceptions=True)
+
+
+def stamped(text: str) -> str:
+    return f"{MARKER} {time.perf_counter():.9f} {text}"
+
+
+def stamp_of(message) -> Optional[float]:
+    if isinstance(message, str) and message.startswith(MARKER + " "):
+        try:
+            return float(message.split(" ", 2)[1])
+        except (IndexError, ValueError):
+            return None
+    return None
+
+
+async def connect_all(clients: List[Client], args, recorder: Recorder):
+    async def one(client: Client):
+        if args.ramp:
+            await asyncio.sleep(random.uniform(0, args.ramp))
+        try:
+            await client.connect(args.timeout)
+        except Exception:
+            recorder.count("connect_errors")
+            client.ws = None
+
+    await asyncio.gather(*(one(client) for client in clients))
+    return [client for client in clients if client.ws is not None]
+
+
+async def open_rooms(users: List[dict], args, recorder: Recorder, join_together: bool):
+    """
+    Hosts start a live each, then viewers join. With join_together every
+    viewer's join_live goes out at once and join latency is recorded.
+    """
+    size = max(args.room_size, 2)
+    groups = [users[i:i + size] for i in range(0, len(users), size)]
+    groups = [group for group in groups if len(group) >= 2]
+    rooms = []
+
+    hosts = await connect_all(
+        [Client(args.url, "/api/v1/live/ws", g[0]["token"], g[0]["id"], args.protocol, args.deflate) for g in groups], args, recorder
+    )
+    for host, group in zip(hosts, groups):
+        started = host.expect("live_started")
+        await host.send({"action": "start_live"})
+        try:
+            _, event = await asyncio.wait_for(started, args.timeout)
+        except asyncio.TimeoutError:
+            recorder.count("start_errors")
+            continue
+        viewers = [Client(args.url, "/api/v1/live/ws", u["token"], u["id"], args.protocol, args.deflate)
+                   for u in group[1:]]
+        rooms.append({"channel": event["channel_name"], "host": host, "viewers": viewers})
+
+    for room in rooms:
+        room["viewers"] = await connect_all(room["viewers"], args, recorder)
+
+    async def join(room, viewer: Client, gate: Optional[asyncio.Event]):
+        if gate is not None:
+            await gate.wait()
+        joined = viewer.expect("joined_success")
+        sent = time.perf_counter()
+        if not await viewer.send({"action": "join_live", "channel_name": room["channel"]}):
+            recorder.count("dropped_connections")
+            return
+        try:
+            received, _ = await asyncio.wait_for(joined, args.timeout)
+        except asyncio.TimeoutError:
+            recorder.count("join_timeouts")
+            return
+        if gate is not None:
+            recorder.latency(received - sent)
+
+    gate = asyncio.Event() if join_together else None
+    joins = [asyncio.create_task(join(room, viewer, gate)) for room in rooms for viewer in room["viewers"]]
+    recorder.started = time.perf_counter()
+    if gate is not None:
+        gate.set()
+    await asyncio.gather(*joins)
+    recorder.finished = time.perf_counter()
+    return rooms
+
+
+async def close_rooms(rooms):
+    for room in rooms:
+        await room["host"].send({"action": "end_live", "channel_name": room["channel"]})
+    await asyncio.sleep(0.2)
+    await asyncio.gather(*(
+        client.close() for room in rooms for client in [room["host"], *room["viewers"]]
+    ))
+
+
+async def join_storm(users: List[dict], args) -> Recorder:
+    recorder = Recorder("join_storm")
+    rooms = await open_rooms(users, args, recorder, join_together=True)
+    recorder.count("rooms", len(rooms))
+    recorder.count("viewers", sum(len(room["viewers"]) for room in rooms))
+    await close_rooms(rooms)
+    return recorder
+
+
+async def like_storm(users: List[dict], args) -> Recorder:
+    recorder = Recorder("like_storm")
+    rooms = await open_rooms(users, args, Recorder("setup"), join_together=False)
+    recorder.count("rooms", len(rooms))
+
+    async def like(room, viewer: Client):
+        for _ in range(args.likes):
+            fence = viewer.expect("error")
+            sent = time.perf_counter()
+            if not (await viewer.send({"action": "send_like", "channel_name": room["channel"]})
+                    and await viewer.send({"action": "send_comment", "channel_name": room["channel"]})):
+                recorder.count("dropped_connections")
+                return
+            try:
+                received, _ = await asyncio.wait_for(fence, args.timeout)
+            except asyncio.TimeoutError:
+                recorder.count("timeouts")
+                continue
+            recorder.latency(received - sent)
+
+    fanout = 0
+
+    def on_event(_, event):
+        nonlocal fanout
+        if event.get("event") == "new_like":
+            fanout += 1
+
+    for room in rooms:
+        for client in [room["host"], *room["viewers"]]:
+            client.on_event = on_event
+
+    recorder.started = time.perf_counter()
+    await asyncio.gather(*(like(room, viewer) for room in rooms for viewer in room["viewers"]))
+    recorder.finished = time.perf_counter()
+    recorder.count("likes_sent", sum(len(room["viewers"]) for room in rooms) * args.likes)
+    recorder.count("new_like_events_received", fanout)
+    await close_rooms(rooms)
+    return recorder
+
+
+async def comment_burst(users: List[dict], args) -> Recorder:
+    recorder = Recorder("comment_burst")
+    rooms = await open_rooms(users, args, Recorder("setup"), join_together=False)
+    recorder.count("rooms", len(rooms))
+
+    expected = sum(len(room["viewers"]) * args.comments * (len(room["viewers"]) + 1) for room in rooms)
+    done = asyncio.Event()
+
+    def on_event(received, event):
+        if event.get("event") != "new_comment":
+            return
+        sent = stamp_of(event.get("message"))
+        if sent is not None:
+            recorder.latency(received - sent)
+            if len(recorder.latencies) >= expected:
+                done.set()
+
+    for room in rooms:
+        for client in [room["host"], *room["viewers"]]:
+            client.on_event = on_event
+
+    async def burst(room, viewer: Client):
+        for n in range(args.comments):
+            await viewer.send({
+                "action": "send_comment", "channel_name": room["channel"], "message": stamped(str(n)),
+            })
+
+    recorder.started = time.perf_counter()
+    await asyncio.gather(*(burst(room, viewer) for room in rooms for viewer in room["viewers"]))
+    try:
+        await asyncio.wait_for(done.wait(), args.timeout)
+    except asyncio.TimeoutError:
+        recorder.count("missing_deliveries", expected - len(recorder.latencies))
+    recorder.finished = time.perf_counter()
+    recorder.count("comments_sent", sum(len(room["viewers"]) for room in rooms) * args.comments)
+    await close_rooms(rooms)
+    return recorder
+
+
+async def chat(users: List[dict], args) -> Recorder:
+    recorder = Recorder("chat")
+    clients = [Client(args.url, "/api/v1/chat/ws", u["token"], u["id"], args.protocol, args.deflate)
+               for u in users[:len(users) // 2 * 2]]
+    clients = await connect_all(clients, args, recorder)
+    pairs = [(clients[i], clients[i + 1]) for i in range(0, len(clients) - 1, 2)]
+
+    expected = len(pairs) * 2 * args.messages
+    done = asyncio.Event()
+
+    def on_event(received, event):
+        sent = stamp_of(event.get("message"))
+        if sent is not None:
+            recorder.latency(received - sent)
+            if len(recorder.latencies) >= expected:
+                done.set()
+
+    for client in clients:
+        client.on_event = on_event
+
+    async def talk(sender: Client, receiver: Client):
+        interval = 1 / args.chat_rate if args.chat_rate else 0
+        for n in range(args.messages):
+            await sender.send({"receiver_id": receiver.user_id, "message": stamped(str(n))})
+            if interval:
+                await asyncio.sleep(interval)
+
+    recorder.started = time.perf_counter()
+    await asyncio.gather(*(talk(a, b) for a, b in pairs), *(talk(b, a) for a, b in pairs))
+    try:
+        await asyncio.wait_for(done.wait(), args.timeout)
+    except asyncio.TimeoutError:
+        recorder.count("missing_deliveries", expected - len(recorder.latencies))
+    recorder.finished = time.perf_counter()
+    recorder.count("pairs", len(pairs))
+    await asyncio.gather(*(client.close() for client in clients))
+    return recorder
+
+
+RUNNERS = {
+    "join_storm": join_storm,
+    "like_storm": like_storm,
+    "comment_burst": comment_burst,
+    "chat": chat,
+}
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, weight = item.partition("=")
+        if name not in RUNNERS:
+            raise SystemExit(f"unknown scenario {name!r}, expected one of {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def split_users(users: List[dict], mix: Dict[str, float]) -> Dict[str, List[dict]]:
+    total = sum(mix.values())
+    shares, start = {}, 0
+    for i, (name, weight) in enumerate(mix.items()):
+        end = len(users) if i == len(mix) - 1 else start + int(len(users) * weight / total)
+        shares[name] = users[start:end]
+        start = end
+    return shares
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn_server(args):
+    port = free_port()
+    tokens_path = os.path.join(tempfile.mkdtemp(prefix="ws_load_"), "tokens.json")
+    log = open(args.server_log, "w") if args.server_log else subprocess.DEVNULL
+    process = subprocess.Popen(
+        [
+            sys.executable, os.path.abspath(__file__), "serve",
+            "--port", str(port), "--users", str(args.clients),
+            "--tokens-out", tokens_path, "--mongo", args.mongo,
+            "--admission-rate", str(args.admission_rate),
+            "--rate-limits", args.rate_limits,
+        ],
+        stdout=log, stderr=log,
+    )
+    deadline = time.monotonic() + args.startup_timeout
+    while not os.path.exists(tokens_path):
+        if process.poll() is not None:
+            raise SystemExit(f"server exited with {process.returncode} before it was ready")
+        if time.monotonic() > deadline:
+            process.terminate()
+            raise SystemExit("server did not become ready in time")
+        time.sleep(0.1)
+    return process, f"ws://127.0.0.1:{port}", tokens_path
+
+
+async def run_scenarios(args, tokens: List[dict], server_pid: Optional[int]) -> dict:
+    mix = parse_mix(args.mix)
+    shares = split_users(tokens[:args.clients], mix)
+    rss = RssSampler(server_pid)
+    rss.start()
+
+    started = time.perf_counter()
+    recorders = await asyncio.gather(*(RUNNERS[name](users, args) for name, users in shares.items()))
+    duration = time.perf_counter() - started
+
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "clients": args.clients, "mix": mix, "room_size": args.room_size,
+            "likes": args.likes, "comments": args.comments,
+            "messages": args.messages, "chat_rate": args.chat_rate,
+            "ramp_s": args.ramp, "protocol": args.protocol, "deflate": args.deflate, "mongo": args.mongo if not args.tokens else "external",
+        },
+        "duration_s": round(duration, 3),
+        "scenarios": {
+            recorder.name: {"clients": len(shares[recorder.name]), **recorder.summary()}
+            for recorder in recorders
+        },
+        "server": await rss.stop(),
+    }
+
+
+def run(args):
+    raise_fd_limit()
+    process = None
+    if args.tokens:
+        if not args.url:
+            raise SystemExit("--tokens needs --url")
+        tokens_path, server_pid = args.tokens, args.server_pid
+    else:
+        process, args.url, tokens_path = spawn_server(args)
+        server_pid = process.pid
+
+    try:
+        with open(tokens_path) as f:
+            tokens = json.load(f)
+        if len(tokens) < args.clients:
+            raise SystemExit(f"only {len(tokens)} users seeded, --clients is {args.clients}")
+        results = asyncio.run(run_scenarios(args, tokens, server_pid))
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    output = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="drive the scenarios and report")
+    run_parser.add_argument("--clients", type=int, default=1000)
+    run_parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario=weight,...")
+    run_parser.add_argument("--room-size", type=int, default=50, help="host + viewers per live room")
+    run_parser.add_argument("--likes", type=int, default=20, help="likes per viewer (like_storm)")
+    run_parser.add_argument("--comments", type=int, default=5, help="comments per viewer (comment_burst)")
+    run_parser.add_argument("--messages", type=int, default=20, help="messages each way per pair (chat)")
+    run_parser.add_argument("--chat-rate", type=float, default=10, help="messages/s per sender, 0 = no pause")
+    run_parser.add_argument("--ramp", type=float, default=2.0, help="spread connects over this many seconds")
+    run_parser.add_argument("--timeout", type=float, default=60.0)
+    run_parser.add_argument("--protocol", choices=["json", "msgpack"], default="json", help="frame subprotocol")
+    run_parser.add_argument("--deflate", action="store_true", help="offer permessage-deflate")
+    run_parser.add_argument("--mongo", default="mock", help='"mock" or a MongoDB URL for the spawned server')
+    run_parser.add_argument("--url", help="ws://host:port of a running `serve`")
+    run_parser.add_argument("--tokens", help="tokens file written by that `serve`")
+    run_parser.add_argument("--server-pid", type=int, help="pid of that server, for RSS")
+    run_parser.add_argument("--server-log", help="write the spawned server's output here")
+    run_parser.add_argument("--startup-timeout", type=float, default=120.0)
+    run_parser.add_argument("--admission-rate", type=float, default=0, help="WS_ADMISSION_RATE for the spawned server")
+    run_parser.add_argument("--rate-limits", default="", help="RATE_LIMITS for the spawned server, empty = off")
+    run_parser.add_argument("--out", help="write the JSON results here")
+    run_parser.set_defaults(handler=run)
+
+    serve_parser = commands.add_parser("serve", help="run the app with seeded users")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8100)
+    serve_parser.add_argument("--users", type=int, default=1000)
+    serve_parser.add_argument("--tokens-out", required=True)
+    serve_parser.add_argument("--mongo", default="mock", help='"mock" or a MongoDB URL')
+    serve_parser.add_argument("--database", default="eron_loadtest")
+    serve_parser.add_argument("--admission-rate", type=float, default=0, help="WS_ADMISSION_RATE, 0 = off")
+    serve_parser.add_argument("--rate-limits", default="", help="RATE_LIMITS, empty = off")
+    serve_parser.set_defaults(handler=serve)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+from uuid import UUID
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel
+
+
+class _RollupModel(Document):
+    """
+    Activity of one host (or the whole platform, host=None) in one time
+    bucket. Written only by eron.jobs.rollup_analytics with $merge.
+    """
+    # {"host": ..., "bucket": ...}, the $merge key
+    id: Optional[Dict[str, Any]] = Field(default=None, alias="_id")
+    host: Optional[UUID] = None
+    # start of the hour / day, UTC
+    bucket: datetime
+    # coins paid by viewers
+    earnings: int = 0
+    # viewer joins
+    views: int = 0
+    unique_viewers: int = 0
+    comments: int = 0
+    # minutes of ended sessions that fall into the bucket
+    live_minutes: float = 0
+    updated_at: Optional[datetime] = None
+
+
+# one host's buckets in a range
+_ROLLUP_INDEXES = [IndexModel([("host", 1), ("bucket", 1)])]
+
+
+class HourlyRollupModel(_RollupModel):
+    class Settings:
+        name = "analytics_hourly"
+        indexes = _ROLLUP_INDEXES
+
+
+class DailyRollupModel(_RollupModel):
+    class Settings:
+        name = "analytics_daily"
+        indexes = _ROLLUP_INDEXES
+
+
+class RollupCursorModel(Document):
+    """How far a granularity has been rolled up: every bucket before `high_water` is final."""
+    # "hourly" / "daily"
+    id: str = Field(alias="_id")
+    high_water: datetime
+    updated_at: datetime
+    # the run rolling up the window from high_water, until its claim lapses
+    claimed_by: Optional[str] = None
+    claimed_until: Optional[datetime] = None
+
+    class Settings:
+        name = "analytics_cursors"
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from eron.analytics.models.rollups import DailyRollupModel, HourlyRollupModel, RollupCursorModel
+from eron.analytics.schemas.analytics import AnalyticsResponse, Granularity, RollupBucket, RollupTotals
+from eron.users.models.user_models import UserModel
+from eron.users.utils.get_current_user import get_current_user
+from eron.users.utils.user_role import UserRole
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+# granularity -> (rollup collection, default range, longest range)
+ROLLUPS = {
+    "hourly": (HourlyRollupModel, timedelta(days=1), timedelta(days=31)),
+    "daily": (DailyRollupModel, timedelta(days=7), timedelta(days=366)),
+}
+
+
+def _aware(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+async def _analytics(
+        host_id: Optional[UUID],
+        granularity: Granularity,
+        start: Optional[datetime],
+        end: Optional[datetime],
+) -> AnalyticsResponse:
+    model, default_range, longest_range = ROLLUPS[granularity]
+    end = _aware(end) if end else datetime.now(timezone.utc)
+    start = _aware(start) if start else end - default_range
+    if start >= end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must be before end")
+    if end - start > longest_range:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {longest_range.days} days of {granularity} data per request",
+        )
+
+    # শুধু রোলআপ কালেকশন পড়া হয়, লাইভ কালেকশনে কোনো কুয়েরি যায় না
+    buckets = await model.find(
+        {"host": host_id, "bucket": {"$gte": start, "$lt": end}},
+        projection_model=RollupBucket,
+    ).sort("bucket").to_list()
+    cursor = await RollupCursorModel.get(granularity)
+
+    totals = RollupTotals()
+    for bucket in buckets:
+        totals.earnings += bucket.earnings
+        totals.views += bucket.views
+        totals.comments += bucket.comments
+        totals.live_minutes += bucket.live_minutes
+    return AnalyticsResponse(
+        granularity=granularity,
+        start=start,
+        end=end,
+        as_of=cursor.high_water if cursor else None,
+        totals=totals,
+        buckets=buckets,
+    )
+
+
+@router.get("/hosts/{host_id}", response_model=AnalyticsResponse)
+async def get_host_analytics(
+        host_id: UUID,
+        granularity: Granularity = "daily",
+        start: Optional[datetime] = Query(None, description="default: one day (hourly) or a week (daily) before end"),
+        end: Optional[datetime] = Query(None, description="default: now"),
+        current_user: UserModel = Depends(get_current_user)
+):
+    """
+    Earnings, views, unique viewers, comments and live minutes of one host
+    per hour or day. Hosts see their own numbers, admins everyone's.
+    """
+    if current_user.id != host_id and current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not your analytics")
+    return await _analytics(host_id, granularity, start, end)
+
+
+@router.get("/platform", response_model=AnalyticsResponse)
+async def get_platform_analytics(
+        granularity: Granularity = "daily",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        current_user: UserModel = Depends(get_current_user)
+):
+    """The same numbers for the whole platform (admins only)."""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admins only")
+    return await _analytics(None, granularity, start, end)
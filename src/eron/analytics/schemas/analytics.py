@@ -0,0 +1,32 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+from pydantic import BaseModel
+
+Granularity = Literal["hourly", "daily"]
+
+
+class RollupBucket(BaseModel):
+    bucket: datetime
+    earnings: int = 0
+    views: int = 0
+    unique_viewers: int = 0
+    comments: int = 0
+    live_minutes: float = 0
+
+
+class RollupTotals(BaseModel):
+    # unique viewers aren't additive across buckets, so they have no total
+    earnings: int = 0
+    views: int = 0
+    comments: int = 0
+    live_minutes: float = 0
+
+
+class AnalyticsResponse(BaseModel):
+    granularity: Granularity
+    start: datetime
+    end: datetime
+    # buckets from here on aren't rolled up yet
+    as_of: Optional[datetime] = None
+    totals: RollupTotals
+    buckets: List[RollupBucket]
@@ -1,9 +1,17 @@
-from beanie import Link
+import os
+from beanie import Document, Link
+from pymongo import IndexModel
+from uuid import UUID
 from pydantic import Field
 from datetime import datetime, timezone
 from eron.core.base.base import BaseCollection
 from eron.users.models.user_models import UserModel
 
+# "index": per-user inverted index in chat_search_postings, written as messages
+#   are sent (backfill older ones with eron.jobs.index_chat_search)
+# "text": MongoDB text index on chat_messages.message; it covers every user's
+#   messages, so a search scans all matches and filters them to the caller
+CHAT_SEARCH_BACKEND = os.getenv("CHAT_SEARCH_BACKEND", "index")
 
 class ChatMessageModel(BaseCollection):
 
@@ -12,7 +20,47 @@ class ChatMessageModel(BaseCollection):
 
     message: str
     is_read: bool = Field(default=False)
+    # set by the receiver's "delivered"/"read" acks, see eron.chats.utils.acks
+    is_delivered: bool = Field(default=False)
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+    class Settings(BaseCollection.Settings):
+        name = "chat_messages"
+        indexes = [
+            # history of one conversation, newest first
+            IndexModel([("sender.$id", 1), ("receiver.$id", 1), ("timestamp", -1)]),
+            # archival scan, oldest first (eron.jobs.archive_chats)
+            IndexModel([("timestamp", 1)]),
+            # offline queue: only undelivered messages are in it, so a
+            # reconnect reads what was missed and nothing else
+            IndexModel(
+                [("receiver.$id", 1), ("timestamp", 1), ("_id", 1)],
+                name="undelivered_by_receiver",
+                partialFilterExpression={"is_delivered": False},
+            ),
+        ]
+        if CHAT_SEARCH_BACKEND == "text":
+            # /chat/search; no stemming or stop words, they'd only fit one of
+            # the languages people write in. Only built when it's used: it
+            # costs every message insert a write per word
+            indexes.append(IndexModel([("message", "text")], name="message_text", default_language="none"))
+
+
+class ChatSearchPostingModel(Document):
+    """
+    One term of one message, for one side of the conversation. Only written
+    with CHAT_SEARCH_BACKEND=index (the default), see eron.chats.utils.search.
+    Field names are short because there is a document per term and participant.
+    """
+    u: UUID
+    t: str
+    m: UUID
+    ts: datetime
+
     class Settings:
-        name = "chat_messages"
\ No newline at end of file
+        name = "chat_search_postings"
+        indexes = [
+            # a user's messages containing a term, newest first; unique so a
+            # re-index doesn't double count
+            IndexModel([("u", 1), ("t", 1), ("ts", -1), ("m", 1)], unique=True),
+        ]
\ No newline at end of file
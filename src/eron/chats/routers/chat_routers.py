@@ -4,8 +4,23 @@ from eron.users.models.user_models import UserModel
 from eron.chats.models.chat_models import ChatMessageModel
 from eron.chats.utils.manager import manager
 from eron.users.utils.get_current_user import get_current_user
-from eron.chats.schemas.chat_schemas import ChatSendMessage
-from beanie.operators import Or, And
+from eron.chats.schemas.chat_schemas import chat_frame_adapter
+from eron.chats.utils.acks import ack_batcher
+from eron.chats.utils.delivery import deliver_pending, message_payload
+from eron.chats.utils.archive import find_archived, reaches_archive
+from eron.chats.utils.typing_indicator import typing_throttle
+from eron.chats.utils.search import posting_writer, search_messages, snippet, tokenize
+from eron.users.schemas.user_schemas import UserCard
+from eron.core.loader.link_loader import LinkLoader, get_link_loader, link_id
+from eron.core.metrics.metrics import WEBSOCKET_FRAMES
+from eron.core.metrics.tracing import frame_tracer
+from eron.core.websocket.protocol import codec_of, receive_frame, send_message
+from eron.core.websocket.admission import admit
+from eron.core.ratelimit.limiter import limiter
+from beanie.operators import Or, And, In
+from functools import partial
+from datetime import datetime
+from typing import Optional
 from uuid import UUID
 
 
@@ -17,6 +32,8 @@ async def websocket_endpoint(
         websocket: WebSocket,
         token: str = Query(...)
 ):
+    if not await admit(websocket, "chat"):
+        return
     try:
 
         current_user = await get_current_user(token)
@@ -25,77 +42,209 @@ async def websocket_endpoint(
         return
 
     user_id = str(current_user.id)
-    await manager.connect(user_id, websocket)
+    conn = await manager.connect(user_id, websocket)
+    codec = codec_of(websocket)
 
 
     current_user.is_online = True
-    await current_user.save()
+    await current_user.save_changes()
 
     try:
-        while True:
-            data = await websocket.receive_json()
-
+        # অফলাইনে থাকাকালীন আসা মেসেজগুলো ব্যাচে পাঠানো
+        await deliver_pending(conn, current_user.id)
 
+        while True:
+            raw = await receive_frame(websocket)
+            trace = frame_tracer.start("chat")
             try:
-                chat_data = ChatSendMessage(**data)
-            except Exception as e:
-                await websocket.send_json({"error": "Invalid data format", "details": str(e)})
-                continue
-
-            receiver_id = chat_data.receiver_id
-            text = chat_data.message
-
-
-            target_user = await UserModel.get(receiver_id)
-
-            if not target_user:
-                await websocket.send_json({"error": "Target user not found"})
-                continue
+                try:
+                    with trace.span("parse"):
+                        frame = codec.parse(raw, chat_frame_adapter)
+                except Exception as e:
+                    trace.action = "unknown"
+                    WEBSOCKET_FRAMES.inc(endpoint="chat", action=trace.action)
+                    await send_message(websocket, {"error": "Invalid data format", "details": str(e)})
+                    continue
+                action = trace.action = "send_message" if frame.type == "message" else frame.type
+                WEBSOCKET_FRAMES.inc(endpoint="chat", action=trace.action)
+
+                retry_after = await trace.timed("rate_limit", limiter.hit(action, user_id))
+                if retry_after:
+                    await send_message(websocket, {"event": "rate_limited", "action": action, "retry_after": round(retry_after, 2)})
+                    continue
+
+                # টাইপিং: ডাটাবেসে কিছু লেখা হয় না, প্রতি কথোপকথনে সেকেন্ডে সর্বোচ্চ একবার
+                if frame.type == "typing":
+                    await typing_throttle.typing(
+                        user_id, frame.receiver_id, frame.is_typing,
+                        partial(forward_typing, user_id, frame.receiver_id),
+                    )
+                    continue
+
+                # delivered/read: প্রেরককে সাথে সাথে জানানো, ডাটাবেসে ব্যাচে লেখা
+                if frame.type in ("delivered", "read"):
+                    ack_batcher.add(frame.type, current_user.id, frame.sender_id, frame.message_ids)
+                    await trace.timed("broadcast", manager.send_personal_message({
+                        "event": frame.type,
+                        "by": user_id,
+                        "message_ids": [str(message_id) for message_id in frame.message_ids],
+                    }, str(frame.sender_id)))
+                    continue
+
+                chat_data = frame
+                receiver_id = chat_data.receiver_id
+                text = chat_data.message
+
+
+                target_user = await trace.timed("db.find_receiver", UserModel.get(receiver_id))
+
+                if not target_user:
+                    await send_message(websocket, {"error": "Target user not found"})
+                    continue
+
+
+                new_msg = ChatMessageModel(
+                    sender=current_user,
+                    receiver=target_user,
+                    message=text
+                )
+                await trace.timed("db.insert_message", new_msg.insert())
+                posting_writer.add(new_msg)
+
+
+                payload = message_payload(new_msg)
+                pushed = await trace.timed("broadcast", manager.send_personal_message(payload, receiver_id))
+                if pushed:
+                    # অনলাইনে পৌঁছে গেছে, অফলাইন কিউতে আর রাখার দরকার নেই
+                    ack_batcher.add("delivered", target_user.id, current_user.id, [new_msg.id])
+                # প্রেরক আইডি দিয়ে পরে delivered/read টিক মেলাবে
+                await send_message(websocket, {
+                    "event": "sent",
+                    "id": str(new_msg.id),
+                    "receiver_id": receiver_id,
+                    "timestamp": str(new_msg.timestamp),
+                })
+            finally:
+                frame_tracer.finish(trace)
 
+    except WebSocketDisconnect:
+        manager.disconnect(conn)
+        # অন্য ডিভাইসে এখনও কানেক্টেড থাকলে অনলাইনই থাকবে
+        if not manager.registry.is_online(user_id):
+            typing_throttle.forget(user_id)
+            current_user.is_online = False
+            await current_user.save_changes()
+    finally:
+        manager.disconnect(conn)
 
-            new_msg = ChatMessageModel(
-                sender=current_user,
-                receiver=target_user,
-                message=text
-            )
-            await new_msg.insert()
 
+async def forward_typing(sender_id: str, receiver_id: str, is_typing: bool):
+    await manager.send_personal_message({"event": "typing", "sender_id": sender_id, "is_typing": is_typing}, receiver_id)
 
-            payload = {
-                "sender_id": user_id,
-                "message": text,
-                "timestamp": str(new_msg.timestamp),
-                "is_read": new_msg.is_read
-            }
-            await manager.send_personal_message(payload, receiver_id)
 
-    except WebSocketDisconnect:
-        manager.disconnect(user_id)
-        current_user.is_online = False
-        await current_user.save()
+def serialize_message(msg: ChatMessageModel, users: dict) -> dict:
+    return {
+        "id": msg.id,
+        "sender": users.get(link_id(msg.sender)),
+        "receiver": users.get(link_id(msg.receiver)),
+        "message": msg.message,
+        "is_read": msg.is_read,
+        "is_delivered": msg.is_delivered,
+        "timestamp": msg.timestamp
+    }
 
 
 @chat_router.get("/history/{other_user_id}")
-async def get_chat_history(other_user_id: UUID, current_user: UserModel = Depends(get_current_user)):
+async def get_chat_history(
+        other_user_id: UUID,
+        before: Optional[datetime] = Query(None, description="শুধু এর আগের মেসেজ (আগের পেজ)"),
+        limit: int = Query(50, ge=1, le=200, description="পেজে সর্বোচ্চ কয়টা মেসেজ"),
+        current_user: UserModel = Depends(get_current_user),
+        loader: LinkLoader = Depends(get_link_loader)
+):
+    """
+    Messages with another user, oldest first: the newest `limit` messages
+    before `before`. Pass the first message's timestamp as `before` to load
+    the previous page. Archived months are only read once the hot
+    collection runs out or the page reaches back into archived time.
+    """
     my_id = current_user.id
     db_another_user=await UserModel.get(other_user_id)
     if not db_another_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="User doesn't exist")
 
-    messages = await ChatMessageModel.find(
-        Or(
-            And(ChatMessageModel.receiver["id"]==other_user_id,ChatMessageModel.sender["id"]==my_id),
-            And(ChatMessageModel.sender["id"]==other_user_id,ChatMessageModel.receiver["id"]==my_id),
-
-        ),
-        fetch_links=True
-    ).sort(+ChatMessageModel.timestamp).to_list()
-
-    for msg in messages:
-        if str(msg.receiver.id) == my_id and not msg.is_read:
-            await msg.update({"$is_read":True})
-
-    return messages
+    conditions = [Or(
+        And(ChatMessageModel.receiver.id==other_user_id,ChatMessageModel.sender.id==my_id),
+        And(ChatMessageModel.sender.id==other_user_id,ChatMessageModel.receiver.id==my_id),
+    )]
+    if before is not None:
+        conditions.append(ChatMessageModel.timestamp < before)
+    messages = await ChatMessageModel.find(*conditions).sort(-ChatMessageModel.timestamp).limit(limit).to_list()
+
+    hot_ids = {msg.id for msg in messages}
+    # আর্কাইভ শুধু তখনই পড়া হয় যখন পেজটা হট উইন্ডোর বাইরে যায়
+    if len(messages) < limit or await reaches_archive(messages[-1].timestamp):
+        archived = await find_archived(
+            {"$or": [
+                {"sender.$id": my_id, "receiver.$id": other_user_id},
+                {"sender.$id": other_user_id, "receiver.$id": my_id},
+            ]},
+            before,
+            limit,
+        )
+        # a batch being moved right now can be in both for a moment
+        messages += [msg for msg in archived if msg.id not in hot_ids]
+        messages.sort(key=lambda msg: msg.timestamp, reverse=True)
+        messages = messages[:limit]
+    messages.reverse()
+
+    unread_ids = [msg.id for msg in messages if msg.id in hot_ids and link_id(msg.receiver) == my_id and not msg.is_read]
+    if unread_ids:
+        await ChatMessageModel.find(In(ChatMessageModel.id, unread_ids)).update(
+            {"$set": {ChatMessageModel.is_read: True, ChatMessageModel.is_delivered: True}}
+        )
+        # প্রেরক অনলাইনে থাকলে রিড টিক সাথে সাথে পাবে
+        await manager.send_personal_message({
+            "event": "read",
+            "by": str(my_id),
+            "message_ids": [str(message_id) for message_id in unread_ids],
+        }, str(other_user_id))
+
+    users = await loader.resolve(messages, "sender", "receiver", projection_model=UserCard)
+    return [serialize_message(msg, users) for msg in messages]
+
+
+@chat_router.get("/search")
+async def search_chats(
+        q: str = Query(..., min_length=2, max_length=200),
+        skip: int = Query(0, ge=0, le=1000),
+        limit: int = Query(20, ge=1, le=50),
+        current_user: UserModel = Depends(get_current_user),
+        loader: LinkLoader = Depends(get_link_loader)
+):
+    """
+    Messages the caller sent or received that match `q`, best match first,
+    each with a snippet around the match and the match offsets in it. Pass
+    `next_skip` back as `skip` for the next page.
+    """
+    # শুধু নিজের কথোপকথনের মেসেজ খোঁজা হয়
+    found = await search_messages(current_user.id, q, skip, limit)
+    terms = tokenize(q)
+    users = await loader.resolve([msg for msg, _ in found], "sender", "receiver", projection_model=UserCard)
+
+    results = []
+    for msg, score in found:
+        text, matches = snippet(msg.message, terms)
+        results.append({
+            "id": msg.id,
+            "sender": users.get(link_id(msg.sender)),
+            "receiver": users.get(link_id(msg.receiver)),
+            "timestamp": msg.timestamp,
+            "score": score,
+            "snippet": text,
+            "matches": matches,
+        })
+    return {"results": results, "next_skip": skip + limit if len(found) == limit else None}
 
 
 @chat_router.get("/active-users")
@@ -123,6 +272,7 @@ async def get_active_users(current_user: UserModel = Depends(get_current_user)):
 
 
 @chat_router.get("/all/chats",status_code=status.HTTP_200_OK)
-async def get_chat_history():
-    chats=await ChatMessageModel.find(fetch_links=True).to_list()
-    return chats
\ No newline at end of file
+async def get_all_chats(loader: LinkLoader = Depends(get_link_loader)):
+    chats=await ChatMessageModel.find_all().to_list()
+    users = await loader.resolve(chats, "sender", "receiver", projection_model=UserCard)
+    return [serialize_message(msg, users) for msg in chats]
\ No newline at end of file
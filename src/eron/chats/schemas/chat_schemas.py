@@ -1,5 +1,41 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Discriminator, Field, Tag, TypeAdapter
+from typing import Annotated, Any, List, Literal, Union
+from uuid import UUID
 
 class ChatSendMessage(BaseModel):
+    type: Literal["message"] = "message"
     receiver_id: str = Field(..., description="যাকে মেসেজ পাঠানো হচ্ছে তার Database ID", example="658af123456789")
-    message: str = Field(..., min_length=1, description="মেসেজের টেক্সট", example="হ্যালো, কেমন আছেন?")
\ No newline at end of file
+    message: str = Field(..., min_length=1, description="মেসেজের টেক্সট", example="হ্যালো, কেমন আছেন?")
+
+
+# ---- other chat WebSocket frames, selected by "type" (none = a message) ----
+
+class ChatTypingFrame(BaseModel):
+    type: Literal["typing"]
+    receiver_id: str = Field(..., min_length=1)
+    is_typing: bool = True
+
+
+class ChatAckFrame(BaseModel):
+    type: Literal["delivered", "read"]
+    # who sent the acknowledged messages, the ack is forwarded to them
+    sender_id: UUID
+    message_ids: List[UUID] = Field(..., min_length=1, max_length=500)
+
+
+def _frame_type(value: Any) -> str:
+    if isinstance(value, dict):
+        return value.get("type", "message")
+    return getattr(value, "type", "message")
+
+
+ChatFrame = Annotated[
+    Union[
+        Annotated[ChatSendMessage, Tag("message")],
+        Annotated[ChatTypingFrame, Tag("typing")],
+        Annotated[ChatAckFrame, Tag("delivered")],
+        Annotated[ChatAckFrame, Tag("read")],
+    ],
+    Discriminator(_frame_type),
+]
+chat_frame_adapter = TypeAdapter(ChatFrame)
@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import os
+from typing import Dict, List, Set, Tuple
+from uuid import UUID
+from pymongo import UpdateMany
+from pymongo.errors import PyMongoError
+from eron.chats.models.chat_models import ChatMessageModel
+
+logger = logging.getLogger(__name__)
+
+# seconds between ack flushes; a tick shows up on the sender's side right
+# away, only the database write waits
+CHAT_ACK_FLUSH_INTERVAL = float(os.getenv("CHAT_ACK_FLUSH_INTERVAL", "1"))
+
+_FIELDS = {
+    "delivered": {"is_delivered": True},
+    "read": {"is_delivered": True, "is_read": True},
+}
+
+
+class AckBatcher:
+    """
+    Collects delivered/read acks and writes them in one bulk_write per
+    flush: one UpdateMany per (kind, receiver, sender), filtered on both so
+    a user can only tick messages that were sent to them.
+    """
+
+    def __init__(self):
+        self._pending: Dict[Tuple[str, UUID, UUID], Set[UUID]] = {}
+
+    def add(self, kind: str, receiver_id: UUID, sender_id: UUID, message_ids: List[UUID]):
+        self._pending.setdefault((kind, receiver_id, sender_id), set()).update(message_ids)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        writes = [
+            UpdateMany(
+                {"_id": {"$in": list(ids)}, "receiver.$id": receiver_id, "sender.$id": sender_id},
+                {"$set": _FIELDS[kind]},
+            )
+            for (kind, receiver_id, sender_id), ids in pending.items()
+        ]
+        try:
+            await ChatMessageModel.get_motor_collection().bulk_write(writes, ordered=False)
+        except PyMongoError:
+            # the client acks again when it next opens the conversation
+            logger.warning("could not write %d chat ack batches", len(writes), exc_info=True)
+
+    async def run(self, interval: float = CHAT_ACK_FLUSH_INTERVAL):
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await self.flush()
+        finally:
+            await self.flush()
+
+
+ack_batcher = AckBatcher()
@@ -0,0 +1,134 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from beanie.odm.utils.parsing import parse_obj
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import CollectionInvalid
+from eron.chats.models.chat_models import ChatMessageModel
+
+# messages older than this move out of chat_messages, 0 = never
+CHAT_ARCHIVE_AFTER_DAYS = int(os.getenv("CHAT_ARCHIVE_AFTER_DAYS", "90"))
+# zstd needs MongoDB 4.2+, snappy is the server default
+CHAT_ARCHIVE_COMPRESSOR = os.getenv("CHAT_ARCHIVE_COMPRESSOR", "zstd")
+
+# how long a worker trusts its list of archive months; the archiver waits
+# this long after creating a month before deleting anything moved into it
+CHAT_ARCHIVE_LIST_TTL = float(os.getenv("CHAT_ARCHIVE_LIST_TTL", "5"))
+
+ARCHIVE_PREFIX = "chat_messages_archive_"
+
+# archive collections carry the same conversation index as the hot one
+ARCHIVE_INDEXES = [
+    IndexModel([("sender.$id", ASCENDING), ("receiver.$id", ASCENDING), ("timestamp", DESCENDING)]),
+]
+
+
+def hot_cutoff(now: Optional[datetime] = None) -> Optional[datetime]:
+    if CHAT_ARCHIVE_AFTER_DAYS <= 0:
+        return None
+    return (now or datetime.now(timezone.utc)) - timedelta(days=CHAT_ARCHIVE_AFTER_DAYS)
+
+
+def archive_name(timestamp: datetime) -> str:
+    return f"{ARCHIVE_PREFIX}{timestamp.year:04d}_{timestamp.month:02d}"
+
+
+def _month_start(name: str) -> datetime:
+    year, month = name[len(ARCHIVE_PREFIX):].split("_")
+    return datetime(int(year), int(month), 1, tzinfo=timezone.utc)
+
+
+def _database():
+    return ChatMessageModel.get_motor_collection().database
+
+
+class _ArchiveCatalog:
+    """Names of the monthly archive collections, listed at most once per CHAT_ARCHIVE_LIST_TTL."""
+
+    def __init__(self):
+        self._names: List[str] = []
+        self._listed: Optional[float] = None
+        self._ready = set()
+
+    async def names(self) -> List[str]:
+        # newest month first
+        if self._listed is None or time.monotonic() - self._listed > CHAT_ARCHIVE_LIST_TTL:
+            names = await _database().list_collection_names(
+                filter={"name": {"$regex": f"^{ARCHIVE_PREFIX}"}}
+            )
+            self._names = sorted(names, reverse=True)
+            self._listed = time.monotonic()
+        return self._names
+
+    async def ensure(self, name: str) -> bool:
+        """
+        Create a month's collection (compressed, indexed) before the first
+        write to it. True if it didn't exist yet: other workers won't list it
+        for up to CHAT_ARCHIVE_LIST_TTL.
+        """
+        if name in self._ready:
+            return False
+        database = _database()
+        created = True
+        try:
+            await database.create_collection(
+                name,
+                storageEngine={"wiredTiger": {"configString": f"block_compressor={CHAT_ARCHIVE_COMPRESSOR}"}},
+            )
+        except CollectionInvalid:
+            created = False  # already there
+        await database[name].create_indexes(ARCHIVE_INDEXES)
+        self._ready.add(name)
+        self.invalidate()
+        return created
+
+    def invalidate(self):
+        """List the months again on the next read."""
+        self._listed = None
+
+
+archive_catalog = _ArchiveCatalog()
+
+
+def _aware(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+async def reaches_archive(oldest: datetime) -> bool:
+    """
+    Whether archived messages can be newer than `oldest`. Undelivered
+    messages stay hot past the cutoff, so a hot page can reach back into
+    archived months.
+    """
+    names = await archive_catalog.names()
+    if not names:
+        return False
+    newest = _month_start(names[0])
+    newest_end = newest.replace(year=newest.year + newest.month // 12, month=newest.month % 12 + 1)
+    return _aware(oldest) < newest_end
+
+
+async def find_archived(query: Dict[str, Any], before: Optional[datetime], limit: Optional[int]) -> List[ChatMessageModel]:
+    """
+    Archived messages matching `query`, newest first, older than `before`.
+    Months are read newest to oldest and reading stops once `limit` is
+    reached, so a page near the hot window touches one or two archives.
+    """
+    if before is not None:
+        before = _aware(before)
+    found: List[ChatMessageModel] = []
+    for name in await archive_catalog.names():
+        if before is not None and _month_start(name) >= before:
+            continue
+        remaining = None if limit is None else limit - len(found)
+        if remaining is not None and remaining <= 0:
+            break
+        month_query = dict(query)
+        if before is not None:
+            month_query["timestamp"] = {"$lt": before}
+        cursor = _database()[name].find(month_query).sort("timestamp", DESCENDING)
+        if remaining is not None:
+            cursor = cursor.limit(remaining)
+        found += [parse_obj(ChatMessageModel, raw) for raw in await cursor.to_list(None)]
+    return found
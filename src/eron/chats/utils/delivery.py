@@ -0,0 +1,71 @@
+import os
+from typing import Optional
+from uuid import UUID
+from beanie.operators import And, Or
+from eron.chats.models.chat_models import ChatMessageModel
+from eron.core.loader.link_loader import link_id
+from eron.core.websocket.registry import Connection
+from eron.core.websocket.protocol import send_message
+
+# messages per frame when a reconnecting user catches up
+CHAT_CATCHUP_BATCH_SIZE = int(os.getenv("CHAT_CATCHUP_BATCH_SIZE", "100"))
+
+
+def message_payload(msg: ChatMessageModel) -> dict:
+    # same shape whether pushed live or during catch-up
+    return {
+        "id": str(msg.id),
+        "sender_id": str(link_id(msg.sender)),
+        "message": msg.message,
+        "timestamp": str(msg.timestamp),
+        "is_read": msg.is_read,
+    }
+
+
+async def deliver_pending(conn: Connection, user_id: UUID, batch_size: int = CHAT_CATCHUP_BATCH_SIZE) -> int:
+    """
+    Stream the messages that arrived while the user was offline, oldest
+    first, in frames of `batch_size`. Pages are read past a (timestamp, _id)
+    watermark from the partial undelivered index, so the cost follows the
+    number of missed messages, not the length of any history. Everything up
+    to the watermark is marked delivered in one update once streaming
+    finished; if the socket drops before that, the next connect sends them
+    again.
+    """
+    watermark: Optional[ChatMessageModel] = None
+    delivered = 0
+    while True:
+        conditions = [ChatMessageModel.receiver.id == user_id, ChatMessageModel.is_delivered == False]
+        if watermark is not None:
+            conditions.append(Or(
+                ChatMessageModel.timestamp > watermark.timestamp,
+                And(ChatMessageModel.timestamp == watermark.timestamp, ChatMessageModel.id > watermark.id),
+            ))
+        batch = await ChatMessageModel.find(*conditions).sort(
+            +ChatMessageModel.timestamp, +ChatMessageModel.id
+        ).limit(batch_size + 1).to_list()
+        if not batch:
+            break
+
+        more = len(batch) > batch_size
+        batch = batch[:batch_size]
+        await send_message(conn.websocket, {
+            "event": "missed_messages",
+            "messages": [message_payload(msg) for msg in batch],
+            "more": more,
+        })
+        delivered += len(batch)
+        watermark = batch[-1]
+        if not more:
+            break
+
+    if watermark is not None:
+        await ChatMessageModel.find(
+            ChatMessageModel.receiver.id == user_id,
+            ChatMessageModel.is_delivered == False,
+            Or(
+                ChatMessageModel.timestamp < watermark.timestamp,
+                And(ChatMessageModel.timestamp == watermark.timestamp, ChatMessageModel.id <= watermark.id),
+            ),
+        ).update({"$set": {ChatMessageModel.is_delivered: True}})
+    return delivered
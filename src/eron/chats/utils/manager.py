@@ -1,23 +1,27 @@
 from fastapi import WebSocket
-from typing import Dict
+from eron.core.websocket.protocol import accept_websocket, send_message
+from eron.core.websocket.registry import Connection, ConnectionRegistry
 
 class ConnectionManager:
     def __init__(self):
-        # active_connections = { "user_id": websocket_object }
-        self.active_connections: Dict[str, WebSocket] = {}
+        # ইউজার আইডি অনুযায়ী খোলা সকেট (একাধিক ডিভাইস হলে একাধিক)
+        self.registry = ConnectionRegistry("chat")
 
-    async def connect(self, user_id: str, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections[user_id] = websocket
+    async def connect(self, user_id: str, websocket: WebSocket) -> Connection:
+        await accept_websocket(websocket)
+        return self.registry.register(websocket, user_id)
 
-    def disconnect(self, user_id: str):
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
+    def disconnect(self, conn: Connection):
+        self.registry.unregister(conn)
 
     async def send_personal_message(self, message: dict, user_id: str):
-        if user_id in self.active_connections:
-            await self.active_connections[user_id].send_json(message)
-            return True  # মেসেজ সরাসরি অনলাইনে ডেলিভার হয়েছে
-        return False  # ইউজার অফলাইন
+        delivered = False
+        for conn in self.registry.connections_of(user_id):
+            try:
+                await send_message(conn.websocket, message)
+                delivered = True
+            except Exception:
+                pass
+        return delivered  # False হলে ইউজার অফলাইন
 
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager()
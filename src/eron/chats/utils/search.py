@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import os
+import re
+from typing import Dict, List, Tuple
+from uuid import UUID
+from beanie.odm.utils.parsing import parse_obj
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from eron.chats.models.chat_models import CHAT_SEARCH_BACKEND, ChatMessageModel, ChatSearchPostingModel
+from eron.chats.utils.archive import archive_name
+from eron.core.loader.link_loader import link_id
+
+logger = logging.getLogger(__name__)
+
+# CHAT_SEARCH_BACKEND ("index" or "text") lives with the models, which only
+# declare the text index when it's the one in use
+CHAT_SEARCH_FLUSH_INTERVAL = float(os.getenv("CHAT_SEARCH_FLUSH_INTERVAL", "1"))
+_DUPLICATE_KEY = 11000
+SNIPPET_CONTEXT = 40
+# terms indexed per message, the rest of a very long message isn't searchable
+MAX_TERMS_PER_MESSAGE = 64
+
+# latin/digits plus the Bengali block, whose vowel signs \w alone would split on
+_TOKEN = re.compile(r"[\w\u0980-\u09FF]+")
+
+
+def tokenize(text: str) -> List[str]:
+    terms = []
+    seen = set()
+    for term in _TOKEN.findall(text.lower()):
+        if len(term) < 2 or term in seen:
+            continue
+        seen.add(term)
+        terms.append(term)
+    return terms
+
+
+def _terms_pattern(terms: List[str]):
+    # longest first, so "hello" wins over "he" at the same position
+    alternatives = "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+    return re.compile(alternatives, re.IGNORECASE) if alternatives else None
+
+
+def snippet(text: str, terms: List[str]) -> Tuple[str, List[Tuple[int, int]]]:
+    """
+    Up to SNIPPET_CONTEXT characters around the first matched term, and the
+    [start, end) offsets of every matched term inside the snippet. Matching
+    runs on `text` itself, not text.lower(), whose length can differ.
+    """
+    pattern = _terms_pattern(terms)
+    found = pattern.search(text) if pattern else None
+    first = found.start() if found else 0
+    start = max(first - SNIPPET_CONTEXT, 0)
+    end = min(first + SNIPPET_CONTEXT * 2, len(text))
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(text) else ""
+    window = text[start:end]
+
+    matches = []
+    if pattern:
+        matches = [(len(prefix) + m.start(), len(prefix) + m.end()) for m in pattern.finditer(window)]
+    return prefix + window + suffix, matches
+
+
+class _PostingWriter:
+    """Postings of sent messages, inserted in one unordered bulk write per flush."""
+
+    def __init__(self):
+        self._pending: List[dict] = []
+
+    def add(self, msg: ChatMessageModel):
+        if CHAT_SEARCH_BACKEND != "index":
+            return
+        self._pending += postings_for(msg)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        try:
+            await ChatSearchPostingModel.get_motor_collection().bulk_write(
+                [InsertOne(posting) for posting in pending], ordered=False
+            )
+        except BulkWriteError as e:
+            # duplicates were indexed by a backfill already
+            failed = [error for error in e.details.get("writeErrors", []) if error["code"] != _DUPLICATE_KEY]
+            if failed:
+                logger.warning("could not write %d chat search postings", len(failed))
+        except PyMongoError:
+            # rebuilt by eron.jobs.index_chat_search
+            logger.warning("could not write %d chat search postings", len(pending), exc_info=True)
+
+    async def run(self, interval: float = CHAT_SEARCH_FLUSH_INTERVAL):
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await self.flush()
+        finally:
+            await self.flush()
+
+
+posting_writer = _PostingWriter()
+
+
+def postings_for(msg: ChatMessageModel) -> List[dict]:
+    # one posting per term for each side of the conversation
+    terms = tokenize(msg.message)[:MAX_TERMS_PER_MESSAGE]
+    users = {link_id(msg.sender), link_id(msg.receiver)}
+    return [
+        {"u": user, "t": term, "m": msg.id, "ts": msg.timestamp}
+        for user in users for term in terms
+    ]
+
+
+async def _search_text(user_id: UUID, query: str, skip: int, limit: int) -> List[Tuple[ChatMessageModel, float]]:
+    """
+    Only chat_messages is searched: messages moved to the monthly archives by
+    eron.jobs.archive_chats aren't found, unlike with _search_index, whose
+    postings outlive the archival.
+    """
+    collection = ChatMessageModel.get_motor_collection()
+    cursor = collection.find(
+        {
+            "$text": {"$search": query},
+            "$or": [{"sender.$id": user_id}, {"receiver.$id": user_id}],
+        },
+        projection={"score": {"$meta": "textScore"}},
+    ).sort([("score", {"$meta": "textScore"}), ("timestamp", -1)]).skip(skip).limit(limit)
+    found = []
+    for row in await cursor.to_list(None):
+        score = row.pop("score", 0.0)
+        found.append((parse_obj(ChatMessageModel, row), score))
+    return found
+
+
+async def _search_index(user_id: UUID, terms: List[str], skip: int, limit: int) -> List[Tuple[ChatMessageModel, float]]:
+    # only this user's postings of the query terms: the work follows the
+    # user's own messages, not the size of the collection
+    ranked = await ChatSearchPostingModel.get_motor_collection().aggregate([
+        {"$match": {"u": user_id, "t": {"$in": terms}}},
+        {"$group": {"_id": "$m", "score": {"$sum": 1}, "ts": {"$first": "$ts"}}},
+        {"$sort": {"score": -1, "ts": -1}},
+        {"$skip": skip},
+        {"$limit": limit},
+    ]).to_list(None)
+    if not ranked:
+        return []
+
+    ids = [row["_id"] for row in ranked]
+    found: Dict[UUID, ChatMessageModel] = {
+        msg.id: msg for msg in await ChatMessageModel.find({"_id": {"$in": ids}}).to_list()
+    }
+    # the rest has been archived, look in the month of each posting
+    missing: Dict[str, List[UUID]] = {}
+    for row in ranked:
+        if row["_id"] not in found:
+            missing.setdefault(archive_name(row["ts"]), []).append(row["_id"])
+    database = ChatMessageModel.get_motor_collection().database
+    for name, month_ids in missing.items():
+        for raw in await database[name].find({"_id": {"$in": month_ids}}).to_list(None):
+            msg = parse_obj(ChatMessageModel, raw)
+            found[msg.id] = msg
+
+    return [(found[row["_id"]], float(row["score"])) for row in ranked if row["_id"] in found]
+
+
+async def search_messages(user_id: UUID, query: str, skip: int = 0, limit: int = 20) -> List[Tuple[ChatMessageModel, float]]:
+    """
+    Messages sent or received by `user_id` that match `query`, best first,
+    with their score. Terms are ORed; more matched terms rank higher.
+    """
+    if CHAT_SEARCH_BACKEND == "index":
+        terms = tokenize(query)
+        if not terms:
+            return []
+        return await _search_index(user_id, terms, skip, limit)
+    return await _search_text(user_id, query, skip, limit)
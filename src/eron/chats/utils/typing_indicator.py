@@ -0,0 +1,70 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+# at most one typing event per conversation and direction per this many seconds
+TYPING_THROTTLE_INTERVAL = float(os.getenv("TYPING_THROTTLE_INTERVAL", "1"))
+
+Forward = Callable[[bool], Awaitable[None]]
+
+
+class _Conversation:
+    __slots__ = ("last_sent", "pending", "timer")
+
+    def __init__(self):
+        self.last_sent = 0.0
+        self.pending: Optional[Tuple[bool, Forward]] = None
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class TypingThrottle:
+    """
+    Coalesces typing frames. The first one in a window is forwarded at once;
+    later ones only replace the pending state, which goes out when the
+    window closes, so the receiver always ends up with the latest state
+    (a "stopped typing" is never lost). Nothing is stored anywhere.
+    """
+
+    def __init__(self, interval: float = TYPING_THROTTLE_INTERVAL):
+        self.interval = interval
+        # sender -> receiver -> state, so a disconnect drops one dict
+        self._conversations: Dict[str, Dict[str, _Conversation]] = {}
+
+    async def typing(self, sender_id: str, receiver_id: str, is_typing: bool, forward: Forward):
+        conversations = self._conversations.setdefault(sender_id, {})
+        conversation = conversations.get(receiver_id)
+        if conversation is None:
+            conversation = conversations[receiver_id] = _Conversation()
+
+        wait = conversation.last_sent + self.interval - time.monotonic()
+        if wait <= 0 and conversation.timer is None:
+            conversation.last_sent = time.monotonic()
+            await forward(is_typing)
+            return
+
+        conversation.pending = (is_typing, forward)
+        if conversation.timer is None:
+            conversation.timer = asyncio.get_running_loop().call_later(
+                max(wait, 0), lambda: asyncio.ensure_future(self._flush(conversation))
+            )
+
+    async def _flush(self, conversation: _Conversation):
+        conversation.timer = None
+        pending, conversation.pending = conversation.pending, None
+        if pending is not None:
+            conversation.last_sent = time.monotonic()
+            is_typing, forward = pending
+            try:
+                await forward(is_typing)
+            except Exception:
+                pass
+
+    def forget(self, sender_id: str):
+        """Drop a disconnected user's conversations; their pending frames go nowhere."""
+        for conversation in self._conversations.pop(sender_id, {}).values():
+            if conversation.timer is not None:
+                conversation.timer.cancel()
+
+
+typing_throttle = TypingThrottle()
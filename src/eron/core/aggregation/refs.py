@@ -0,0 +1,23 @@
+from typing import Any, Dict, List, Type
+from uuid import UUID
+from eron.core.base.base import BaseCollection
+
+
+def ref_id(path: str) -> dict:
+    """
+    Aggregation expression for the id of the DBRef at `path`. DBRef ids live
+    under "$id", which can't be used in a field path directly ($getField
+    needs MongoDB 5.0+).
+    """
+    return {"$getField": {"field": {"$literal": "$id"}, "input": f"${path}"}}
+
+
+async def group_by_ref(model: Type[BaseCollection], ref_path: str, ids: List[UUID],
+                       value: Any = 1) -> Dict[UUID, int]:
+    """Sum of `value` over the rows of `model` linking to each of `ids` through `ref_path`."""
+    pipeline = [
+        {"$match": {f"{ref_path}.$id": {"$in": ids}}},
+        {"$group": {"_id": ref_id(ref_path), "n": {"$sum": value}}},
+    ]
+    rows = await model.get_motor_collection().aggregate(pipeline).to_list(None)
+    return {row["_id"]: row["n"] for row in rows}
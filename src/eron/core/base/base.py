@@ -1,5 +1,10 @@
 from beanie import Document
+from beanie.odm.actions import EventTypes, wrap_with_actions
+from beanie.odm.utils.dump import get_dict
+from beanie.odm.utils.self_validation import validate_self_before
+from beanie.odm.utils.state import saved_state_needed
 from pydantic import Field
+from typing import Any, ClassVar, Dict, FrozenSet, List, Optional
 from uuid import UUID, uuid4
 from pydantic import BaseModel
 
@@ -7,6 +12,96 @@ from pydantic import BaseModel
 class BaseCollection(Document):
     id: UUID = Field(default_factory=uuid4, alias="_id")
 
+    # Counter fields are never written back from the local copy. Whatever a
+    # handler did to them since the document was loaded is sent as an $inc
+    # delta, so two workers bumping the same counter don't overwrite each other.
+    increment_only_fields: ClassVar[FrozenSet[str]] = frozenset()
+
+    class Settings:
+        use_state_management = True
+
+    def _current_state(self) -> Dict[str, Any]:
+        return get_dict(
+            self,
+            to_db=True,
+            keep_nulls=self.get_settings().keep_nulls,
+            exclude={"revision_id"},
+        )
+
+    @saved_state_needed
+    def get_update_document(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Build the smallest update document ($set / $inc / $push / $pullAll)
+        that brings the stored document in line with the local one.
+        """
+        saved = self.get_saved_state()
+        update: Dict[str, Dict[str, Any]] = {}
+
+        for path, value in self._collect_updates(saved, self._current_state()).items():
+            old = saved.get(path)
+            if path in saved and old == value:
+                continue
+
+            if path in self.increment_only_fields and isinstance(old, (int, float)):
+                update.setdefault("$inc", {})[path] = value - old
+            elif isinstance(old, list) and isinstance(value, list):
+                operator, argument = _list_update(old, value)
+                update.setdefault(operator, {})[path] = argument
+            else:
+                update.setdefault("$set", {})[path] = value
+
+        return update
+
+    @saved_state_needed
+    @wrap_with_actions(EventTypes.SAVE_CHANGES)
+    @validate_self_before
+    async def save_changes(
+        self,
+        ignore_revision: bool = False,
+        session=None,
+        bulk_writer=None,
+        skip_actions: Optional[List[Any]] = None,
+    ):
+        """
+        Persist only the fields changed since the document was loaded.
+
+        Unlike ``save()`` this never rewrites the whole document: plain fields
+        go out as $set, counters declared in ``increment_only_fields`` as $inc,
+        and appends/removals on arrays as $push/$pullAll.
+        """
+        if not self.is_changed:
+            return None
+        update = self.get_update_document()
+        if not update:
+            self._save_state()
+            return None
+        return await self.update(
+            update,
+            ignore_revision=ignore_revision,
+            session=session,
+            bulk_writer=bulk_writer,
+        )
+
+
+def _list_update(old: List[Any], new: List[Any]):
+    # Appending to the end of an array -> $push only the new tail
+    if len(new) > len(old) and new[:len(old)] == old:
+        return "$push", {"$each": new[len(old):]}
+
+    # Dropping items -> $pullAll them, as long as new is old minus those items
+    if len(new) < len(old):
+        removed = []
+        position = 0
+        for item in old:
+            if position < len(new) and new[position] == item:
+                position += 1
+            else:
+                removed.append(item)
+        if position == len(new) and not any(item in new for item in removed):
+            return "$pullAll", removed
+
+    return "$set", new
+
 
 class BaseResponse(BaseModel):
-    id: UUID
\ No newline at end of file
+    id: UUID
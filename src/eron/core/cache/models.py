@@ -0,0 +1,16 @@
+from datetime import datetime
+from beanie import Document
+from pymongo import IndexModel
+
+
+class CacheInvalidationModel(Document):
+    """One invalidated cache key, read by the other workers. Only used with RESPONSE_CACHE_BACKEND=mongo."""
+    cache: str
+    key: str
+    # worker that published it, it already dropped the key itself
+    origin: str
+    at: datetime
+
+    class Settings:
+        name = "cache_invalidations"
+        indexes = [IndexModel([("at", 1)], expireAfterSeconds=300)]
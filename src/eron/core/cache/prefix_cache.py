@@ -0,0 +1,134 @@
+import os
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+from eron.core.cache.response_cache import caches, publish_invalidation
+
+PREFIX_CACHE_TTL = float(os.getenv("PREFIX_CACHE_TTL", "30"))
+PREFIX_CACHE_MAX_ENTRIES = int(os.getenv("PREFIX_CACHE_MAX_ENTRIES", "20000"))
+# longer prefixes aren't cached and aren't looked up on invalidation
+MAX_CACHED_PREFIX = 32
+
+
+def fold(text: Optional[str]) -> str:
+    """Lowercase, without accents and repeated spaces: "  Ámélie " -> "amelie"."""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().split())
+
+
+class _PrefixEntry:
+    __slots__ = ("rows", "ids", "complete", "expires")
+
+    def __init__(self, rows: List[Tuple[Any, Tuple[str, ...]]], ids: List[str], complete: bool, expires: float):
+        # (result, folded searchable fields) in result order
+        self.rows = rows
+        self.ids = ids
+        # every match is in rows, so a longer prefix can be answered by filtering
+        self.complete = complete
+        self.expires = expires
+
+
+class PrefixCache:
+    """
+    LRU of typeahead results keyed by the folded prefix. Typing "ali" after
+    "al" is answered from the "al" entry when that one holds every match,
+    so most keystrokes after the first few never reach the database.
+    `invalidate(id, fields)` drops the entries holding that document and the
+    ones its new field values would now match.
+    """
+
+    def __init__(self, name: str, ttl: float = PREFIX_CACHE_TTL, max_entries: int = PREFIX_CACHE_MAX_ENTRIES):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _PrefixEntry]" = OrderedDict()
+        # document id -> prefixes whose entry contains it
+        self._holders: Dict[str, Set[str]] = {}
+        caches[name] = self
+
+    def get(self, prefix: str, limit: int) -> Optional[List[Any]]:
+        now = time.monotonic()
+        entry = self._entries.get(prefix)
+        if entry is not None and entry.expires > now:
+            self._entries.move_to_end(prefix)
+            return [result for result, _ in entry.rows[:limit]]
+        # the longest cached shorter prefix; usable if it holds all of its matches
+        for end in range(len(prefix) - 1, 0, -1):
+            shorter = self._entries.get(prefix[:end])
+            if shorter is None or shorter.expires <= now:
+                continue
+            if not shorter.complete:
+                return None
+            self._entries.move_to_end(prefix[:end])
+            return [result for result, fields in shorter.rows if matches(prefix, fields)][:limit]
+        return None
+
+    def put(self, prefix: str, rows: List[Tuple[Hashable, Any, Tuple[str, ...]]], complete: bool):
+        """`rows` are (document id, result, folded fields)."""
+        if len(prefix) > MAX_CACHED_PREFIX:
+            return
+        self._forget(prefix)
+        ids = [str(doc_id) for doc_id, _, _ in rows]
+        self._entries[prefix] = _PrefixEntry(
+            [(result, fields) for _, result, fields in rows], ids, complete, time.monotonic() + self.ttl
+        )
+        for doc_id in ids:
+            self._holders.setdefault(doc_id, set()).add(prefix)
+        while len(self._entries) > self.max_entries:
+            self._forget(next(iter(self._entries)))
+
+    def _forget(self, prefix: str):
+        entry = self._entries.pop(prefix, None)
+        if entry is None:
+            return
+        for doc_id in entry.ids:
+            held = self._holders.get(doc_id)
+            if held is not None:
+                held.discard(prefix)
+                if not held:
+                    del self._holders[doc_id]
+
+    def drop(self, key: str, fields: Iterable[str] = ()):
+        """Forget `key` in this worker only."""
+        for prefix in list(self._holders.get(key, ())):
+            self._forget(prefix)
+        # every prefix of the new values, so the document shows up under them
+        for value in fields:
+            for end in range(1, min(len(value), MAX_CACHED_PREFIX) + 1):
+                self._forget(value[:end])
+
+    def invalidate(self, key: Hashable, fields: Iterable[str] = ()):
+        key = str(key)
+        self.drop(key, fields)
+        # other workers drop the entries holding the document; new matches
+        # show up there after the TTL
+        publish_invalidation(self.name, key)
+
+
+def split_prefix(prefix: str) -> Tuple[str, Optional[str]]:
+    """Split "ada lov" into a whole first word and the start of the next: ("ada", "lov")."""
+    head, _, tail = prefix.partition(" ")
+    return head, tail or None
+
+
+def matches(prefix: str, fields: Tuple[str, ...]) -> bool:
+    """
+    Same rule as the database query over (first name, last name):
+    a field starts with the prefix, or for "a b" one name is "a" and the
+    other starts with "b".
+    """
+    if any(field.startswith(prefix) for field in fields):
+        return True
+    head, tail = split_prefix(prefix)
+    if tail is None:
+        return False
+    first, last = fields[0], fields[1]
+    return (first == head and last.startswith(tail)) or (last == head and first.startswith(tail))
+
+
+# /users/search, invalidated by UserModel writes
+user_search_cache = PrefixCache("user_search")
@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+from uuid import UUID, uuid4
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from pymongo.errors import PyMongoError
+from eron.core.cache.models import CacheInvalidationModel
+from eron.core.metrics.metrics import RESPONSE_CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+# "memory": invalidations stay in this worker, "mongo": published to all workers
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+# how often workers pick up each other's invalidations (mongo backend)
+RESPONSE_CACHE_SYNC_INTERVAL = float(os.getenv("RESPONSE_CACHE_SYNC_INTERVAL", "1"))
+# invalidations are re-read this far back, covers clock skew between workers
+RESPONSE_CACHE_SYNC_OVERLAP = 5.0
+
+WORKER_ID = uuid4().hex
+
+# name -> cache, so published invalidations find their cache
+caches: Dict[str, "ResponseCache"] = {}
+# (cache, key) invalidated here and not yet published; a like storm on one
+# host becomes one document per sync interval instead of one per like
+_outbox: Set[Tuple[str, str]] = set()
+
+
+class _CacheEntry:
+    __slots__ = ("body", "etag", "expires")
+
+    def __init__(self, body: bytes, expires: float):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        self.expires = expires
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _canonical_id(value: str) -> Optional[str]:
+    try:
+        return str(UUID(value))
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+class ResponseCache:
+    """
+    Read-through cache of serialized JSON responses, keyed by route and a
+    document id. Entries live for `ttl` and are answered with an ETag, so a
+    client that sends it back gets a 304. `invalidate(id)` drops every route
+    cached for that id; a build that was running at the time isn't stored.
+    """
+
+    def __init__(self, name: str, ttl: float = RESPONSE_CACHE_TTL, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], _CacheEntry]" = OrderedDict()
+        self._building: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._routes: Set[str] = set()
+        caches[name] = self
+
+    async def _entry(self, key: Tuple[str, str], build: Callable[[], Awaitable[Any]]) -> Tuple[_CacheEntry, bool]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires > time.monotonic():
+                self._entries.move_to_end(key)
+                return entry, True
+            del self._entries[key]
+
+        pending = self._building.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending), True
+
+        future = self._building[key] = asyncio.get_running_loop().create_future()
+        try:
+            data = await build()
+            body = json.dumps(
+                jsonable_encoder(data), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+            ).encode("utf-8")
+            entry = _CacheEntry(body, time.monotonic() + self.ttl)
+            # invalidate() takes the future out of _building; then the data
+            # may predate the write and must not be kept
+            if self._building.get(key) is future:
+                self._entries[key] = entry
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            future.set_result(entry)
+            return entry, False
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            if self._building.get(key) is future:
+                del self._building[key]
+
+    async def response(self, request: Request, route: str, key: str, build: Callable[[], Awaitable[Any]]):
+        """
+        The cached body for (route, key) as a Response, or a 304 if the
+        client already has it. Keys that aren't UUIDs aren't cached.
+        """
+        canonical = _canonical_id(key)
+        if canonical is None:
+            return await build()
+
+        self._routes.add(route)
+        entry, cached = await self._entry((route, canonical), build)
+        headers = {"ETag": entry.etag, "Cache-Control": "public, no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+            RESPONSE_CACHE_REQUESTS.inc(cache=self.name, outcome="not_modified")
+            return Response(status_code=304, headers=headers)
+        RESPONSE_CACHE_REQUESTS.inc(cache=self.name, outcome="hit" if cached else "miss")
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def drop(self, key: str):
+        """Forget `key` in this worker only."""
+        for route in self._routes:
+            self._entries.pop((route, key), None)
+            self._building.pop((route, key), None)
+
+    def invalidate(self, key: Hashable):
+        key = str(key)
+        self.drop(key)
+        publish_invalidation(self.name, key)
+
+
+def publish_invalidation(cache_name: str, key: str):
+    """
+    Have the other workers drop `key` from their cache registered as
+    `cache_name` (in `caches`). A no-op unless RESPONSE_CACHE_BACKEND=mongo.
+    """
+    if RESPONSE_CACHE_BACKEND == "mongo":
+        _outbox.add((cache_name, key))
+
+
+# public profile card and stats, invalidated by UserModel writes
+profile_cache = ResponseCache("profile")
+
+
+async def listen_for_invalidations(interval: float = RESPONSE_CACHE_SYNC_INTERVAL):
+    """
+    Publish this worker's invalidations and apply the other workers'.
+    Started from the app lifespan when RESPONSE_CACHE_BACKEND=mongo.
+    """
+    since = datetime.now(timezone.utc)
+    seen: Dict[Any, datetime] = {}
+    collection = CacheInvalidationModel.get_motor_collection()
+    while True:
+        await asyncio.sleep(interval)
+        polled_at = datetime.now(timezone.utc)
+        if _outbox:
+            outgoing = [
+                {"cache": name, "key": key, "origin": WORKER_ID, "at": polled_at}
+                for name, key in _outbox
+            ]
+            _outbox.clear()
+            try:
+                await collection.insert_many(outgoing, ordered=False)
+            except PyMongoError:
+                # the other workers fall back to the TTL for these keys
+                logger.warning("could not publish %d cache invalidations", len(outgoing), exc_info=True)
+        window_start = since - timedelta(seconds=RESPONSE_CACHE_SYNC_OVERLAP)
+        try:
+            published: List[dict] = await collection.find(
+                {"at": {"$gte": window_start}, "origin": {"$ne": WORKER_ID}},
+                projection={"cache": 1, "key": 1, "at": 1},
+            ).to_list(None)
+        except PyMongoError:
+            logger.warning("could not read cache invalidations", exc_info=True)
+            continue
+        for doc in published:
+            if doc["_id"] in seen:
+                continue
+            seen[doc["_id"]] = doc["at"].replace(tzinfo=timezone.utc)
+            cache = caches.get(doc["cache"])
+            if cache is not None:
+                cache.drop(doc["key"])
+        since = polled_at
+        # ids older than the next window can't come back
+        cutoff = since - timedelta(seconds=RESPONSE_CACHE_SYNC_OVERLAP)
+        for doc_id in [doc_id for doc_id, at in seen.items() if at < cutoff]:
+            del seen[doc_id]
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from eron.core.compression.middleware import COMPRESSION_MIN_SIZE, choose_encoding, compress
+
+# How long a feed body is served before it's rebuilt
+FEED_CACHE_TTL = float(os.getenv("FEED_CACHE_TTL", "5"))
+FEED_CACHE_MAX_ENTRIES = int(os.getenv("FEED_CACHE_MAX_ENTRIES", "256"))
+
+
+class _FeedEntry:
+    __slots__ = ("body", "expires", "variants")
+
+    def __init__(self, body: bytes, expires: float):
+        self.body = body
+        self.expires = expires
+        self.variants: Dict[str, bytes] = {}
+
+    def encoded(self, encoding: str) -> bytes:
+        variant = self.variants.get(encoding)
+        if variant is None:
+            variant = self.variants[encoding] = compress(self.body, encoding)
+        return variant
+
+
+class PrecompressedFeed:
+    """
+    Short-lived cache for public JSON feeds. The body is rendered once per
+    TTL and kept together with its gzip/brotli variants, so every caller in
+    that window gets bytes that are already encoded. Concurrent misses for
+    the same key share one build.
+    """
+
+    def __init__(self, name: str, ttl: float = FEED_CACHE_TTL, max_entries: int = FEED_CACHE_MAX_ENTRIES):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, _FeedEntry] = {}
+        self._building: Dict[Hashable, asyncio.Future] = {}
+        # bumped by invalidate(); a build that started before it isn't stored
+        self._generation = 0
+
+    async def _entry(self, key: Hashable, build: Callable[[], Awaitable[Any]]) -> _FeedEntry:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires > time.monotonic():
+            return entry
+
+        pending = self._building.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = self._building[key] = asyncio.get_running_loop().create_future()
+        generation = self._generation
+        try:
+            data = await build()
+            body = json.dumps(
+                jsonable_encoder(data), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+            ).encode("utf-8")
+            entry = _FeedEntry(body, time.monotonic() + self.ttl)
+            if generation == self._generation:
+                self._entries.pop(key, None)
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries:
+                    del self._entries[next(iter(self._entries))]
+            future.set_result(entry)
+            return entry
+        except BaseException as e:
+            future.set_exception(e)
+            # nobody else may be waiting; don't leave "exception never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._building[key]
+
+    async def response(self, request: Request, key: Hashable, build: Callable[[], Awaitable[Any]]) -> Response:
+        entry = await self._entry(key, build)
+        headers = {"Vary": "Accept-Encoding", "Cache-Control": f"public, max-age={int(self.ttl)}"}
+
+        body = entry.body
+        encoding: Optional[str] = None
+        if len(body) >= COMPRESSION_MIN_SIZE:
+            encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+        if encoding is not None:
+            body = entry.encoded(encoding)
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        self._generation += 1
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+
+# GET /users/ pages; UserModel drops them on every user write
+users_feed = PrecompressedFeed("users")
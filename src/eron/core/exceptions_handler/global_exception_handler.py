@@ -1,13 +1,30 @@
 
+import logging
 from fastapi import Request, status
 from fastapi.responses import JSONResponse
+from eron.core.logger.logger import status_sampler
+
+logger = logging.getLogger(__name__)
 
 
 # Handler for any unexpected errors
 async def global_exception_handler(request: Request, exc: Exception):
     # Accessing app.debug from request.app
     debug_mode = request.app.debug
-    print(f"Global Error Captured: {str(exc)}")
+
+    suppressed = status_sampler.should_log(status.HTTP_500_INTERNAL_SERVER_ERROR)
+    if suppressed is not None:
+        logger.error(
+            "Global Error Captured: %s", exc,
+            exc_info=exc,
+            extra={
+                "method": request.method,
+                "path": request.url.path,
+                "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "suppressed": suppressed,
+                "request_id": getattr(request.state, "request_id", None),
+            },
+        )
 
     return JSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,10 +1,14 @@
+import logging
 from fastapi import Request, status
 from fastapi.responses import JSONResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
+from eron.core.logger.logger import status_sampler
+
+logger = logging.getLogger(__name__)
 
 
 # Handler for specific HTTP exceptions (e.g., 404, 403, 401)
-async def http_exception_handler(_: Request, exc: Exception):
+async def http_exception_handler(request: Request, exc: Exception):
     """
     Global handler for Starlette/FastAPI HTTPExceptions.
     This ensures that all manual 'raise HTTPException' calls
@@ -13,9 +17,18 @@ async def http_exception_handler(_: Request, exc: Exception):
 
     # Check if the exception is an instance of StarletteHTTPException
     if isinstance(exc, StarletteHTTPException):
-        print(f"status:error")
-        print(f"message:{exc.detail}")
-        print(f"code:{exc.status_code}")
+        # sampled and rate limited per status code, a 401 storm stays cheap
+        suppressed = status_sampler.should_log(exc.status_code)
+        if suppressed is not None:
+            logger.info(
+                "HTTP %s: %s", exc.status_code, exc.detail,
+                extra={
+                    "method": request.method,
+                    "path": request.url.path,
+                    "status_code": exc.status_code,
+                    "suppressed": suppressed,
+                },
+            )
 
         return JSONResponse(
             status_code=exc.status_code,
@@ -24,6 +37,8 @@ async def http_exception_handler(_: Request, exc: Exception):
                 "message": exc.detail,
                 "code": exc.status_code
             },
+            # Retry-After on 429, WWW-Authenticate on 401
+            headers=getattr(exc, "headers", None),
         )
 
     # Fallback for generic internal server errors if they reach this handler
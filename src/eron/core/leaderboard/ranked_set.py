@@ -0,0 +1,142 @@
+import random
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# enough levels for 4 ** 16 members
+_MAX_LEVEL = 16
+_P = 0.25
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key: Any, level: int):
+        self.key = key
+        self.next: List[Optional["_Node"]] = [None] * level
+        # level-0 steps to next[i]; on the last node of a level, to past the end
+        self.width: List[int] = [1] * level
+
+
+class _SkipList:
+    """Indexable skip list: insert, remove and rank in O(log n) expected."""
+
+    def __init__(self):
+        self.head = _Node(None, _MAX_LEVEL)
+        self.size = 0
+
+    @staticmethod
+    def _level() -> int:
+        level = 1
+        while level < _MAX_LEVEL and random.random() < _P:
+            level += 1
+        return level
+
+    def _path(self, key) -> Tuple[List[_Node], List[int]]:
+        # last node before `key` on every level, and its position (head = 0)
+        update: List[_Node] = [self.head] * _MAX_LEVEL
+        positions = [0] * _MAX_LEVEL
+        node, position = self.head, 0
+        for i in reversed(range(_MAX_LEVEL)):
+            while node.next[i] is not None and node.next[i].key < key:
+                position += node.width[i]
+                node = node.next[i]
+            update[i] = node
+            positions[i] = position
+        return update, positions
+
+    def insert(self, key):
+        update, positions = self._path(key)
+        level = self._level()
+        node = _Node(key, level)
+        for i in range(_MAX_LEVEL):
+            if i < level:
+                node.next[i] = update[i].next[i]
+                update[i].next[i] = node
+                steps = positions[0] - positions[i]
+                node.width[i] = update[i].width[i] - steps
+                update[i].width[i] = steps + 1
+            else:
+                update[i].width[i] += 1
+        self.size += 1
+
+    def remove(self, key):
+        update, _ = self._path(key)
+        node = update[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        for i in range(_MAX_LEVEL):
+            if update[i].next[i] is node:
+                update[i].width[i] += node.width[i] - 1
+                update[i].next[i] = node.next[i]
+            else:
+                update[i].width[i] -= 1
+        self.size -= 1
+
+    def rank(self, key) -> int:
+        """Number of keys smaller than `key`."""
+        _, positions = self._path(key)
+        return positions[0]
+
+    def __iter__(self) -> Iterator:
+        node = self.head.next[0]
+        while node is not None:
+            yield node.key
+            node = node.next[0]
+
+
+class RankedSet:
+    """
+    String members with a score, highest first. Setting or adding to a
+    score, the rank of a member and the top n are O(log n) (+ n). Ties are
+    broken by member so the order is stable.
+    """
+
+    def __init__(self):
+        self._scores: Dict[str, float] = {}
+        self._order = _SkipList()
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def __contains__(self, member: str) -> bool:
+        return member in self._scores
+
+    @staticmethod
+    def _key(member: str, score: float):
+        return -score, member
+
+    def score(self, member: str) -> Optional[float]:
+        return self._scores.get(member)
+
+    def set(self, member: str, score: float):
+        old = self._scores.get(member)
+        if old == score:
+            return
+        if old is not None:
+            self._order.remove(self._key(member, old))
+        self._scores[member] = score
+        self._order.insert(self._key(member, score))
+
+    def add(self, member: str, amount: float) -> float:
+        score = self._scores.get(member, 0) + amount
+        self.set(member, score)
+        return score
+
+    def discard(self, member: str):
+        old = self._scores.pop(member, None)
+        if old is not None:
+            self._order.remove(self._key(member, old))
+
+    def rank(self, member: str) -> Optional[int]:
+        """0 for the highest score, None if not ranked."""
+        score = self._scores.get(member)
+        if score is None:
+            return None
+        return self._order.rank(self._key(member, score))
+
+    def top(self, n: int) -> List[Tuple[str, float]]:
+        result = []
+        for negative_score, member in self._order:
+            if len(result) >= n:
+                break
+            result.append((member, -negative_score))
+        return result
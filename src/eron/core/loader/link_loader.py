@@ -0,0 +1,89 @@
+from typing import Any, Dict, Iterable, List, Optional, Type
+from beanie import Document, Link
+from beanie.operators import In
+from pydantic import BaseModel
+
+
+def link_id(value: Any) -> Any:
+    """
+    Id of a linked document, whether the link was fetched or not.
+    """
+    if isinstance(value, Link):
+        return value.ref.id
+    return getattr(value, "id", value)
+
+
+class LinkLoader:
+    """
+    Request-scoped batch loader for linked documents.
+
+    Collects the referenced ids, fetches everything missing with a single
+    `$in` query (optionally through a projection model) and memoizes the
+    results, so the same user is read at most once per request / frame.
+    """
+
+    def __init__(self):
+        self._cache: Dict[tuple, Optional[BaseModel]] = {}
+
+    async def load_many(
+            self,
+            model: Type[Document],
+            ids: Iterable[Any],
+            projection_model: Optional[Type[BaseModel]] = None,
+    ) -> Dict[Any, Optional[BaseModel]]:
+        view = projection_model or model
+        ids = list(dict.fromkeys(ids))
+        missing = [i for i in ids if (model, view, i) not in self._cache]
+
+        if missing:
+            found = await model.find(
+                In(model.id, missing),
+                projection_model=projection_model
+            ).to_list()
+            for doc in found:
+                self._cache[(model, view, doc.id)] = doc
+            for i in missing:
+                self._cache.setdefault((model, view, i), None)
+
+        return {i: self._cache[(model, view, i)] for i in ids}
+
+    async def load(
+            self,
+            model: Type[Document],
+            id: Any,
+            projection_model: Optional[Type[BaseModel]] = None,
+    ) -> Optional[BaseModel]:
+        return (await self.load_many(model, [id], projection_model))[id]
+
+    async def resolve(
+            self,
+            documents: List[Document],
+            *fields: str,
+            projection_model: Optional[Type[BaseModel]] = None,
+    ) -> Dict[Any, Optional[BaseModel]]:
+        """
+        Resolve the given link fields of every document in one round trip per
+        target model. Returns `{linked_id: document}`.
+        """
+        ids_by_model: Dict[Type[Document], List[Any]] = {}
+        for doc in documents:
+            for field in fields:
+                values = getattr(doc, field)
+                for value in values if isinstance(values, list) else [values]:
+                    if value is None:
+                        continue
+                    target = value.document_class if isinstance(value, Link) else type(value)
+                    ids_by_model.setdefault(target, []).append(link_id(value))
+
+        resolved: Dict[Any, Optional[BaseModel]] = {}
+        for model, ids in ids_by_model.items():
+            resolved.update(await self.load_many(model, ids, projection_model))
+        return resolved
+
+
+def get_link_loader() -> LinkLoader:
+    """
+    FastAPI dependency: one loader per request. For WebSocket handlers create
+    a `LinkLoader()` per received frame instead.
+    """
+    return LinkLoader()
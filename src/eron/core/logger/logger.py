@@ -0,0 +1,204 @@
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+from uuid import uuid4
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# "401:0.01,404:0.1" -> log 1% of 401s and 10% of 404s; unlisted codes: 1.0
+LOG_STATUS_SAMPLE_RATES = os.getenv("LOG_STATUS_SAMPLE_RATES", "401:0.01,403:0.1,404:0.1")
+# at most this many log lines per second per status code, the rest are counted
+LOG_STATUS_RATE_LIMIT = float(os.getenv("LOG_STATUS_RATE_LIMIT", "20"))
+
+REQUEST_ID_HEADER = "x-request-id"
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# attributes every LogRecord has; anything else came in through `extra=`
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        # captured on the calling side, the listener thread has no context
+        if getattr(record, "request_id", None) is None:
+            record.request_id = request_id_var.get()
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler over a bounded queue: when the listener can't keep up,
+    records are dropped and counted instead of blocking the event loop.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # only freeze the message; JSON and traceback rendering happen on the
+        # listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(level: str = LOG_LEVEL):
+    """
+    Route all logging through a queue: handlers only enqueue, a background
+    thread formats JSON and writes to stdout. Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+
+    queue_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level)
+    # uvicorn installs its own stream handlers, send those through the queue too
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
+
+    _listener = QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flush what is still queued. Called at the end of the app lifespan."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _parse_sample_rates(value: str) -> Dict[int, float]:
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        code, _, rate = item.partition(":")
+        rates[int(code)] = float(rate)
+    return rates
+
+
+class StatusLogSampler:
+    """
+    Decides whether an error response gets a log line: first a per-status
+    sample rate, then a per-status lines-per-second cap. Suppressed lines are
+    counted and reported on the next line that does get through.
+    """
+
+    def __init__(self, sample_rates: Dict[int, float], rate_limit: float):
+        self.sample_rates = sample_rates
+        self.rate_limit = rate_limit
+        self._window: Dict[int, list] = {}  # status -> [window start, lines, suppressed]
+        self._seen: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def should_log(self, status_code: int) -> Optional[int]:
+        """
+        None if this occurrence should be skipped, else the number of
+        occurrences suppressed since the last logged one.
+        """
+        with self._lock:
+            seen = self._seen[status_code] = self._seen.get(status_code, 0) + 1
+            window = self._window.setdefault(status_code, [time.monotonic(), 0, 0])
+
+            rate = self.sample_rates.get(status_code, 1.0)
+            if rate <= 0 or (rate < 1 and seen % max(int(round(1 / rate)), 1) != 1):
+                window[2] += 1
+                return None
+
+            now = time.monotonic()
+            if now - window[0] >= 1:
+                window[0], window[1] = now, 0
+            if self.rate_limit and window[1] >= self.rate_limit:
+                window[2] += 1
+                return None
+
+            window[1] += 1
+            suppressed, window[2] = window[2], 0
+            return suppressed
+
+
+status_sampler = StatusLogSampler(_parse_sample_rates(LOG_STATUS_SAMPLE_RATES), LOG_STATUS_RATE_LIMIT)
+
+
+class RequestIdMiddleware:
+    """
+    Takes X-Request-ID from the client (or makes one), exposes it to log
+    records through a context variable and echoes it on the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid4().hex
+        token = request_id_var.set(request_id)
+        # handlers running outside this middleware (500s) read it from request.state
+        scope.setdefault("state", {})["request_id"] = request_id
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (REQUEST_ID_HEADER.encode(), request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
@@ -0,0 +1,79 @@
+import time
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from eron.core.metrics.metrics import (
+    REGISTRY,
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS_IN_FLIGHT,
+    WEBSOCKET_CONNECTIONS,
+)
+
+
+def route_template(scope) -> str:
+    # Route templates only (e.g. /api/v1/users/{user_id}); anything the router
+    # didn't match is lumped together so raw paths can't blow up cardinality
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware: request latency per route template, in-flight
+    requests, and open WebSocket connections per endpoint.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            await self._http(scope, receive, send)
+        elif scope["type"] == "websocket":
+            await self._websocket(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def _http(self, scope, receive, send):
+        method = scope["method"]
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc(method=method)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec(method=method)
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - started,
+                method=method, route=route_template(scope), status=status_code,
+            )
+
+    async def _websocket(self, scope, receive, send):
+        endpoint = None
+
+        async def send_wrapper(message):
+            nonlocal endpoint
+            if message["type"] == "websocket.accept" and endpoint is None:
+                endpoint = route_template(scope)
+                WEBSOCKET_CONNECTIONS.inc(endpoint=endpoint)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if endpoint is not None:
+                WEBSOCKET_CONNECTIONS.dec(endpoint=endpoint)
+
+
+metrics_router = APIRouter(tags=["Metrics"])
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,62 @@
+import threading
+from pymongo import monitoring
+from eron.core.metrics.metrics import MONGO_COMMAND_DURATION, MONGO_COMMAND_DOCUMENTS
+
+
+# Commands whose first argument isn't a collection name
+_COLLECTIONLESS = {"getMore", "endSessions", "ping", "hello", "isMaster", "ismaster",
+                   "saslStart", "saslContinue", "buildInfo", "listCollections",
+                   "listIndexes", "killCursors", "commitTransaction", "abortTransaction"}
+
+
+def _collection_of(event: monitoring.CommandStartedEvent) -> str:
+    if event.command_name == "getMore":
+        return str(event.command.get("collection", ""))
+    if event.command_name in _COLLECTIONLESS:
+        return ""
+    value = event.command.get(event.command_name)
+    return value if isinstance(value, str) else ""
+
+
+def _documents_of(command_name: str, reply) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") is not None else 0
+    n = reply.get("n")
+    return n if isinstance(n, int) else 0
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """
+    Per-collection / per-command latency and document counts.
+    Registered on the AsyncIOMotorClient in eron.db.
+    """
+
+    def __init__(self):
+        # request_id -> collection, filled on start, consumed on finish
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        with self._lock:
+            self._collections[event.request_id] = _collection_of(event)
+
+    def _finish(self, event, outcome: str):
+        with self._lock:
+            collection = self._collections.pop(event.request_id, "")
+        MONGO_COMMAND_DURATION.observe(
+            event.duration_micros / 1_000_000,
+            collection=collection, command=event.command_name, outcome=outcome,
+        )
+        return collection
+
+    def succeeded(self, event):
+        collection = self._finish(event, "success")
+        documents = _documents_of(event.command_name, event.reply)
+        if documents:
+            MONGO_COMMAND_DOCUMENTS.inc(documents, collection=collection, command=event.command_name)
+
+    def failed(self, event):
+        self._finish(event, "failure")
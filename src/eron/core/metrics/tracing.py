@@ -0,0 +1,186 @@
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, List, Optional, TypeVar
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from eron.core.metrics.metrics import Histogram
+from eron.core.websocket.registry import registries
+from eron.users.models.user_models import UserModel
+from eron.users.utils.get_current_user import get_current_user
+from eron.users.utils.user_role import UserRole
+
+logger = logging.getLogger(__name__)
+
+# Share of frames that get per-step spans; every frame gets its total time
+FRAME_TRACE_SAMPLE_RATE = float(os.getenv("FRAME_TRACE_SAMPLE_RATE", "0.01"))
+SLOW_FRAME_THRESHOLD_MS = float(os.getenv("SLOW_FRAME_THRESHOLD_MS", "250"))
+SLOW_FRAME_BUFFER_SIZE = int(os.getenv("SLOW_FRAME_BUFFER_SIZE", "50"))
+
+WEBSOCKET_FRAME_DURATION = Histogram(
+    "websocket_frame_duration_seconds", "Server time spent handling one WebSocket frame",
+    ["endpoint", "action"],
+)
+
+T = TypeVar("T")
+
+
+class _Span:
+    __slots__ = ("trace", "name", "started")
+
+    def __init__(self, trace: "FrameTrace", name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.spans.append((self.name, time.perf_counter() - self.started))
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class FrameTrace:
+    """
+    Timing of one received frame. Unsampled traces only keep the total, so
+    `span()` / `timed()` cost next to nothing on them.
+    """
+    __slots__ = ("endpoint", "action", "started", "total", "spans")
+
+    def __init__(self, endpoint: str, sampled: bool):
+        self.endpoint = endpoint
+        self.action: Optional[str] = None
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.spans: Optional[list] = [] if sampled else None
+
+    def span(self, name: str):
+        if self.spans is None:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    async def timed(self, name: str, awaitable: Awaitable[T]) -> T:
+        if self.spans is None:
+            return await awaitable
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.spans.append((name, time.perf_counter() - started))
+
+    def as_dict(self) -> dict:
+        return {
+            "endpoint": self.endpoint,
+            "action": self.action,
+            "total_ms": round(self.total * 1000, 3),
+            "sampled": self.spans is not None,
+            "spans": [
+                {"name": name, "ms": round(duration * 1000, 3)}
+                for name, duration in self.spans or []
+            ],
+        }
+
+
+class FrameTracer:
+    def __init__(
+            self,
+            sample_rate: float = FRAME_TRACE_SAMPLE_RATE,
+            slow_threshold_ms: float = SLOW_FRAME_THRESHOLD_MS,
+            keep: int = SLOW_FRAME_BUFFER_SIZE,
+    ):
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold_ms / 1000
+        self.keep = keep
+        # min-heap of (total, seq, record): the root is the fastest kept frame
+        self._slowest: list = []
+        self._seq = itertools.count()
+
+    def start(self, endpoint: str) -> FrameTrace:
+        return FrameTrace(endpoint, random.random() < self.sample_rate)
+
+    def finish(self, trace: FrameTrace):
+        trace.total = time.perf_counter() - trace.started
+        action = trace.action or "unknown"
+        WEBSOCKET_FRAME_DURATION.observe(trace.total, endpoint=trace.endpoint, action=action)
+
+        if self.keep and (len(self._slowest) < self.keep or trace.total > self._slowest[0][0]):
+            record = trace.as_dict()
+            record["at"] = datetime.now(timezone.utc).isoformat()
+            entry = (trace.total, next(self._seq), record)
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, entry)
+            else:
+                heapq.heapreplace(self._slowest, entry)
+
+        if trace.total >= self.slow_threshold:
+            logger.warning(
+                "slow websocket frame %s/%s took %.1fms",
+                trace.endpoint, action, trace.total * 1000,
+                extra={"frame": trace.as_dict()},
+            )
+
+    def slowest(self) -> List[dict]:
+        return [record for _, _, record in sorted(self._slowest, reverse=True)]
+
+    def reset(self):
+        self._slowest.clear()
+
+
+frame_tracer = FrameTracer()
+
+
+debug_router = APIRouter(prefix="/debug", tags=["Debug"])
+
+
+@debug_router.get("/slow-frames", status_code=status.HTTP_200_OK)
+async def get_slow_frames(current_user: UserModel = Depends(get_current_user)):
+    """
+    Slowest WebSocket frames seen by this worker (admins only).
+    """
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admins only")
+    return {
+        "sample_rate": frame_tracer.sample_rate,
+        "slow_threshold_ms": frame_tracer.slow_threshold * 1000,
+        "frames": frame_tracer.slowest(),
+    }
+
+
+@debug_router.get("/connections", status_code=status.HTTP_200_OK)
+async def get_connections(
+        channel: Optional[str] = Query(None),
+        user_id: Optional[str] = Query(None),
+        current_user: UserModel = Depends(get_current_user)
+):
+    """
+    Open WebSocket connections on this worker (admins only): totals per
+    endpoint, plus the members of `channel` / the sockets of `user_id`.
+    """
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admins only")
+    result = {}
+    for endpoint, registry in registries.items():
+        entry = registry.stats()
+        if channel:
+            entry["members"] = registry.room_members(channel)
+        if user_id:
+            entry["user_connections"] = registry.user_connections(user_id)
+        result[endpoint] = entry
+    return result
@@ -0,0 +1,163 @@
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException, Request, status
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+from eron.core.metrics.metrics import RATE_LIMITED
+from eron.core.ratelimit.models import RateLimitBucketModel
+
+logger = logging.getLogger(__name__)
+
+# "memory": buckets per worker process, "mongo": shared by all workers
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+# action=limit/seconds; the limit is also the burst size. Actions not listed aren't limited.
+RATE_LIMITS = os.getenv(
+    "RATE_LIMITS",
+    "send_like=10/1,send_comment=3/2,send_message=10/5,start_live=3/60,join_live=20/60,renew_token=6/60,"
+    "login=5/60,resend_otp=3/600,auth_ip=30/60,search_users=20/10",
+)
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# proxies in front of the app that append to X-Forwarded-For (load balancer,
+# ingress...); 0 = clients connect directly and the header is ignored
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+
+
+class RateLimit:
+    __slots__ = ("capacity", "rate")
+
+    def __init__(self, limit: float, seconds: float):
+        self.capacity = limit
+        self.rate = limit / seconds  # tokens per second
+
+
+def parse_rate_limits(value: str) -> Dict[str, RateLimit]:
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        action, _, spec = item.partition("=")
+        limit, _, seconds = spec.partition("/")
+        limits[action.strip()] = RateLimit(float(limit), float(seconds or 1))
+    return limits
+
+
+class MemoryBackend:
+    """Token buckets in this process: key -> (tokens, updated), least recently hit first."""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, limit: RateLimit) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (limit.capacity, now))
+        tokens = min(limit.capacity, tokens + (now - updated) * limit.rate)
+        allowed = tokens >= 1
+        self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self.max_keys:
+            self._evict()
+        if allowed:
+            return 0.0
+        return (1 - tokens) / limit.rate
+
+    def _evict(self):
+        # least recently hit half; a dropped bucket just starts full again,
+        # and the keys still being hammered are never the ones dropped
+        for _ in range(len(self._buckets) // 2):
+            self._buckets.popitem(last=False)
+
+
+class MongoBackend:
+    """
+    Token buckets in the rate_limits collection, refilled and taken in one
+    findOneAndUpdate so concurrent workers can't both spend the last token.
+    Fails open: if MongoDB errors, the request is let through.
+    """
+
+    async def take(self, key: str, limit: RateLimit) -> float:
+        now = time.time()
+        full_in = limit.capacity / limit.rate
+        refilled = {"$min": [
+            limit.capacity,
+            {"$add": [
+                {"$ifNull": ["$tokens", limit.capacity]},
+                {"$multiply": [{"$max": [0, {"$subtract": [now, {"$ifNull": ["$ts", now]}]}]}, limit.rate]},
+            ]},
+        ]}
+        pipeline = [
+            {"$set": {"tokens": refilled, "ts": now}},
+            {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+            {"$set": {
+                "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                "expires_at": datetime.now(timezone.utc) + timedelta(seconds=full_in),
+            }},
+        ]
+        try:
+            bucket = await RateLimitBucketModel.get_motor_collection().find_one_and_update(
+                {"_id": key}, pipeline,
+                upsert=True, return_document=ReturnDocument.AFTER,
+                projection={"tokens": 1, "allowed": 1},
+            )
+        except PyMongoError:
+            logger.warning("rate limit backend unavailable, letting %s through", key, exc_info=True)
+            return 0.0
+        if bucket["allowed"]:
+            return 0.0
+        return (1 - bucket["tokens"]) / limit.rate
+
+
+class RateLimiter:
+    def __init__(self, limits: Dict[str, RateLimit], backend):
+        self.limits = limits
+        self.backend = backend
+
+    async def hit(self, action: str, key: str) -> float:
+        """
+        Spend one token of `action` for `key`. 0 if allowed, else the
+        seconds until the next token.
+        """
+        limit = self.limits.get(action)
+        if limit is None:
+            return 0.0
+        retry_after = await self.backend.take(f"{action}:{key}", limit)
+        if retry_after:
+            RATE_LIMITED.inc(action=action)
+        return retry_after
+
+
+limiter = RateLimiter(
+    parse_rate_limits(RATE_LIMITS),
+    MongoBackend() if RATE_LIMIT_BACKEND == "mongo" else MemoryBackend(),
+)
+
+
+def client_ip(request: Request) -> Optional[str]:
+    """
+    The address the request came from. Behind TRUSTED_PROXY_HOPS proxies
+    that is the X-Forwarded-For entry the outermost trusted proxy appended;
+    anything left of it was written by the client and can't be trusted.
+    """
+    peer = request.client.host if request.client else None
+    if TRUSTED_PROXY_HOPS <= 0:
+        return peer
+    forwarded = [part.strip() for part in request.headers.get("x-forwarded-for", "").split(",") if part.strip()]
+    if not forwarded:
+        return peer
+    return forwarded[-min(TRUSTED_PROXY_HOPS, len(forwarded))]
+
+
+async def enforce_rate_limit(action: str, key: Optional[str]):
+    """HTTP side: 429 with Retry-After when the bucket is empty."""
+    if not key:
+        return
+    retry_after = await limiter.hit(action, key)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
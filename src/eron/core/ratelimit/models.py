@@ -0,0 +1,16 @@
+from datetime import datetime
+from beanie import Document
+from pymongo import IndexModel
+
+
+class RateLimitBucketModel(Document):
+    """Shared token bucket, one per "<action>:<key>". Only used with RATE_LIMIT_BACKEND=mongo."""
+    id: str
+    tokens: float
+    ts: float
+    # when the bucket would be full again; expired buckets are the same as no bucket
+    expires_at: datetime
+
+    class Settings:
+        name = "rate_limits"
+        indexes = [IndexModel([("expires_at", 1)], expireAfterSeconds=0)]
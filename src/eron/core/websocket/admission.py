@@ -0,0 +1,65 @@
+import os
+import random
+import time
+from fastapi import WebSocket, status
+from eron.core.metrics.metrics import WEBSOCKET_ADMISSIONS
+from eron.core.websocket.protocol import accept_websocket, send_message
+
+# New WebSocket sessions a worker sets up per second, and how many may queue up at once
+WS_ADMISSION_RATE = float(os.getenv("WS_ADMISSION_RATE", "200"))
+WS_ADMISSION_BURST = float(os.getenv("WS_ADMISSION_BURST", "400"))
+WS_ADMISSION_MAX_RETRY_AFTER = float(os.getenv("WS_ADMISSION_MAX_RETRY_AFTER", "30"))
+
+
+class AdmissionController:
+    """
+    Token bucket in front of the WebSocket handshake. When a restart makes
+    every client reconnect at once, the ones over the rate are each given a
+    later slot in a virtual queue (plus jitter) as their retry-after, so they
+    come back staggered at roughly the rate we admit instead of as a second
+    wave.
+    """
+
+    def __init__(self, rate: float = WS_ADMISSION_RATE, burst: float = WS_ADMISSION_BURST,
+                 max_retry_after: float = WS_ADMISSION_MAX_RETRY_AFTER):
+        self.rate = rate
+        self.burst = burst
+        self.max_retry_after = max_retry_after
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._next_slot = 0.0
+
+    def try_admit(self) -> float:
+        """0 if admitted, else seconds the client should wait before retrying."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+
+        self._next_slot = max(self._next_slot, now) + 1 / self.rate
+        wait = (self._next_slot - now) * random.uniform(0.8, 1.2)
+        return min(self.max_retry_after, max(0.5, wait))
+
+
+admission = AdmissionController()
+
+
+async def admit(websocket: WebSocket, endpoint: str) -> bool:
+    """
+    Admission check for a new connection. Turned-away clients get a
+    retry_later event and close code 1013 (try again later).
+    """
+    retry_after = admission.try_admit()
+    if not retry_after:
+        WEBSOCKET_ADMISSIONS.inc(endpoint=endpoint, outcome="admitted")
+        return True
+
+    WEBSOCKET_ADMISSIONS.inc(endpoint=endpoint, outcome="rejected")
+    await accept_websocket(websocket)
+    await send_message(websocket, {"event": "retry_later", "retry_after": round(retry_after, 2)})
+    await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+    return False
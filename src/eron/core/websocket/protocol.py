@@ -0,0 +1,113 @@
+import json
+from typing import Any, Dict, Optional, Tuple, Union
+import msgpack
+from fastapi import WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, TypeAdapter
+from eron.core.metrics.metrics import WEBSOCKET_SENT_BYTES
+
+Frame = Union[str, bytes]
+
+
+class FrameCodec:
+    """JSON over text frames. The default when the client asks for nothing else."""
+    name = "json"
+
+    def encode(self, payload: Any) -> Frame:
+        # starlette's send_json output; default=str like the msgpack codec, so
+        # UUIDs and datetimes go out the same way in both protocols
+        return json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str)
+
+    def parse(self, raw: Frame, schema: Union[TypeAdapter, type[BaseModel]]):
+        if isinstance(schema, TypeAdapter):
+            return schema.validate_json(raw)
+        return schema.model_validate_json(raw)
+
+    async def send(self, websocket: WebSocket, frame: Frame):
+        await websocket.send_text(frame)
+
+
+class MsgpackCodec(FrameCodec):
+    """MessagePack over binary frames, negotiated with the "msgpack" subprotocol."""
+    name = "msgpack"
+
+    def encode(self, payload: Any) -> Frame:
+        return msgpack.packb(payload, use_bin_type=True, default=str)
+
+    def parse(self, raw: Frame, schema: Union[TypeAdapter, type[BaseModel]]):
+        data = msgpack.unpackb(raw.encode() if isinstance(raw, str) else raw, raw=False)
+        if isinstance(schema, TypeAdapter):
+            return schema.validate_python(data)
+        return schema.model_validate(data)
+
+    async def send(self, websocket: WebSocket, frame: Frame):
+        await websocket.send_bytes(frame)
+
+
+JSON_CODEC = FrameCodec()
+CODECS: Dict[str, FrameCodec] = {"json": JSON_CODEC, "msgpack": MsgpackCodec()}
+
+
+def negotiate(websocket: WebSocket) -> Tuple[FrameCodec, Optional[str]]:
+    """
+    First subprotocol from the client's Sec-WebSocket-Protocol list that we
+    speak; JSON (and no subprotocol in the reply) if none.
+    """
+    for offered in websocket.scope.get("subprotocols") or []:
+        codec = CODECS.get(offered)
+        if codec is not None:
+            return codec, offered
+    return JSON_CODEC, None
+
+
+async def accept_websocket(websocket: WebSocket) -> FrameCodec:
+    codec, subprotocol = negotiate(websocket)
+    websocket.state.codec = codec
+    await websocket.accept(subprotocol=subprotocol)
+    return codec
+
+
+def codec_of(websocket: WebSocket) -> FrameCodec:
+    return getattr(websocket.state, "codec", JSON_CODEC)
+
+
+async def receive_frame(websocket: WebSocket) -> Frame:
+    """Next text or binary frame, whichever the client sent."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+    text = message.get("text")
+    return text if text is not None else message.get("bytes", b"")
+
+
+def _encode(codec: FrameCodec, payload: Any) -> Tuple[Frame, int]:
+    frame = codec.encode(payload)
+    return frame, len(frame) if isinstance(frame, bytes) else len(frame.encode())
+
+
+class OutgoingFrame:
+    """
+    A payload plus its encodings. A broadcast builds one of these and every
+    recipient reuses the frame for its protocol, so each protocol encodes once.
+    """
+    __slots__ = ("payload", "_frames")
+
+    def __init__(self, payload: Any):
+        self.payload = payload
+        self._frames: Dict[str, Tuple[Frame, int]] = {}
+
+    def encoded(self, codec: FrameCodec) -> Tuple[Frame, int]:
+        encoded = self._frames.get(codec.name)
+        if encoded is None:
+            encoded = self._frames[codec.name] = _encode(codec, self.payload)
+        return encoded
+
+
+async def send_message(websocket: WebSocket, message: Union[OutgoingFrame, Any]):
+    """Send a payload (or a prepared OutgoingFrame) in the socket's negotiated protocol."""
+    codec = codec_of(websocket)
+    if isinstance(message, OutgoingFrame):
+        frame, size = message.encoded(codec)
+    else:
+        frame, size = _encode(codec, message)
+    WEBSOCKET_SENT_BYTES.inc(size, protocol=codec.name)
+    await codec.send(websocket, frame)
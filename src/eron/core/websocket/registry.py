@@ -0,0 +1,143 @@
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+from fastapi import WebSocket
+
+# endpoint name -> registry, for the debug introspection endpoint
+registries: Dict[str, "ConnectionRegistry"] = {}
+
+
+class Connection:
+    """State of one open socket. The handler keeps a reference; the registry indexes it."""
+    __slots__ = ("websocket", "user_id", "channel", "role", "connected_at")
+
+    def __init__(self, websocket: WebSocket, user_id: str):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.channel: Optional[str] = None
+        self.role: Optional[str] = None
+        self.connected_at = time.time()
+
+    def as_dict(self) -> dict:
+        return {
+            "user_id": self.user_id,
+            "channel": self.channel,
+            "role": self.role,
+            "connected_at": self.connected_at,
+        }
+
+
+class ConnectionRegistry:
+    """
+    Open connections of one endpoint, indexed by user and by room. Register,
+    unregister, join and leave are O(1).
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        # almost every user has exactly one socket, so the value is the
+        # Connection itself and only becomes a set on a second device
+        self._users: Dict[str, Union[Connection, Set[Connection]]] = {}
+        self._rooms: Dict[str, Set[Connection]] = {}
+        self._count = 0
+        registries[endpoint] = self
+
+    def __len__(self) -> int:
+        return self._count
+
+    def register(self, websocket: WebSocket, user_id: str) -> Connection:
+        conn = Connection(websocket, user_id)
+        existing = self._users.get(user_id)
+        if existing is None:
+            self._users[user_id] = conn
+        elif isinstance(existing, Connection):
+            self._users[user_id] = {existing, conn}
+        else:
+            existing.add(conn)
+        self._count += 1
+        return conn
+
+    def unregister(self, conn: Connection):
+        self.leave(conn)
+        existing = self._users.get(conn.user_id)
+        if existing is conn:
+            del self._users[conn.user_id]
+        elif isinstance(existing, set) and conn in existing:
+            existing.discard(conn)
+            if len(existing) == 1:
+                self._users[conn.user_id] = existing.pop()
+        else:
+            return
+        self._count -= 1
+
+    def join(self, conn: Connection, channel: str, role: Optional[str] = None):
+        if conn.channel is not None and conn.channel != channel:
+            self.leave(conn)
+        room = self._rooms.get(channel)
+        if room is None:
+            room = self._rooms[channel] = set()
+        room.add(conn)
+        conn.channel = channel
+        conn.role = role
+
+    def leave(self, conn: Connection) -> Optional[str]:
+        """Take the connection out of its room; the room's name, or None if it wasn't in one."""
+        channel = conn.channel
+        if channel is None:
+            return None
+        room = self._rooms.get(channel)
+        if room is not None:
+            room.discard(conn)
+            if not room:
+                del self._rooms[channel]
+        conn.channel = conn.role = None
+        return channel
+
+    # --- lookups ---
+
+    def connections_of(self, user_id: str) -> List[Connection]:
+        existing = self._users.get(user_id)
+        if existing is None:
+            return []
+        if isinstance(existing, Connection):
+            return [existing]
+        return list(existing)
+
+    def is_online(self, user_id: str) -> bool:
+        return user_id in self._users
+
+    def members(self, channel: str) -> Tuple[Connection, ...]:
+        # a copy: sends await, and the room may change while we iterate
+        return tuple(self._rooms.get(channel, ()))
+
+    def room_size(self, channel: str) -> int:
+        return len(self._rooms.get(channel, ()))
+
+    def has_room(self, channel: str) -> bool:
+        return channel in self._rooms
+
+    def rooms(self) -> Iterable[str]:
+        return self._rooms.keys()
+
+    # --- introspection ---
+
+    def stats(self) -> dict:
+        roles = Counter(conn.role for room in self._rooms.values() for conn in room)
+        return {
+            "endpoint": self.endpoint,
+            "connections": self._count,
+            "users": len(self._users),
+            "rooms": len(self._rooms),
+            "in_rooms": sum(roles.values()),
+            "roles": {role or "none": count for role, count in roles.items()},
+            "largest_rooms": sorted(
+                ((channel, len(room)) for channel, room in self._rooms.items()),
+                key=lambda item: item[1], reverse=True,
+            )[:10],
+        }
+
+    def room_members(self, channel: str) -> List[dict]:
+        return [conn.as_dict() for conn in self._rooms.get(channel, ())]
+
+    def user_connections(self, user_id: str) -> List[dict]:
+        return [conn.as_dict() for conn in self.connections_of(user_id)]
@@ -0,0 +1,97 @@
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Container, Deque, Dict, List, Optional, Tuple
+from jose import JWTError, jwt
+from eron.core.websocket.protocol import OutgoingFrame
+
+SECRET_KEY = os.getenv("SECRET_KEY")
+ALGORITHM = "HS256"
+
+# How long after a disconnect a client may resume instead of joining again
+RESUME_TOKEN_TTL = int(os.getenv("RESUME_TOKEN_TTL", "120"))
+# Replayable events kept per live room
+REPLAY_BUFFER_SIZE = int(os.getenv("REPLAY_BUFFER_SIZE", "256"))
+
+
+def issue_resume_token(user_id: str, channel_name: str, role: str) -> str:
+    return jwt.encode(
+        {
+            "sub": user_id,
+            "typ": "resume",
+            "ch": channel_name,
+            "role": role,
+            "exp": datetime.now(timezone.utc) + timedelta(seconds=RESUME_TOKEN_TTL),
+        },
+        SECRET_KEY,
+        algorithm=ALGORITHM,
+    )
+
+
+def read_resume_token(token: str, user_id: str) -> Optional[dict]:
+    """Claims of a valid, unexpired resume token issued to user_id, else None."""
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if claims.get("typ") != "resume" or claims.get("sub") != user_id or not claims.get("ch"):
+        return None
+    return claims
+
+
+class RoomLog:
+    """
+    Sequence numbers and the last REPLAY_BUFFER_SIZE events of one room.
+    Frames are kept encoded, so a replay costs no re-encoding.
+    """
+    __slots__ = ("seq", "events", "touched")
+
+    def __init__(self, size: int = REPLAY_BUFFER_SIZE):
+        self.seq = 0
+        self.events: Deque[Tuple[int, OutgoingFrame]] = deque(maxlen=size)
+        self.touched = time.monotonic()
+
+    def append(self, payload: dict) -> OutgoingFrame:
+        self.seq += 1
+        self.touched = time.monotonic()
+        frame = OutgoingFrame({**payload, "seq": self.seq})
+        self.events.append((self.seq, frame))
+        return frame
+
+    def since(self, last_seq: int) -> Optional[List[OutgoingFrame]]:
+        """
+        Events after last_seq, or None if some of them were already dropped
+        (or last_seq is from before this log was made, e.g. a worker restart).
+        """
+        if last_seq > self.seq:
+            return None
+        if last_seq == self.seq:
+            return []
+        if not self.events or self.events[0][0] > last_seq + 1:
+            return None
+        return [frame for seq, frame in self.events if seq > last_seq]
+
+
+class RoomLogs:
+    def __init__(self):
+        self._logs: Dict[str, RoomLog] = {}
+
+    def get(self, channel_name: str) -> RoomLog:
+        log = self._logs.get(channel_name)
+        if log is None:
+            log = self._logs[channel_name] = RoomLog()
+        return log
+
+    def find(self, channel_name: str) -> Optional[RoomLog]:
+        return self._logs.get(channel_name)
+
+    def drop(self, channel_name: str):
+        self._logs.pop(channel_name, None)
+
+    def drop_idle(self, keep: Container[str], max_idle: float = RESUME_TOKEN_TTL):
+        # empty rooms nobody wrote to for longer than a resume token lives
+        cutoff = time.monotonic() - max_idle
+        idle = [name for name, log in self._logs.items() if log.touched < cutoff and name not in keep]
+        for channel_name in idle:
+            del self._logs[channel_name]
@@ -1,14 +1,40 @@
 import os
+import asyncio
+import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
-from eron.chats.models.chat_models import ChatMessageModel
+from eron.chats.models.chat_models import ChatMessageModel, ChatSearchPostingModel
 from eron.live_stream.models.live_stream import LiveStreamModel, LiveViewerModel, LiveCommentModel
+from eron.live_stream.models.leaderboard import LeaderboardScoreModel
+from eron.live_stream.utils.leaderboards import leaderboards
+from eron.live_stream.utils.liveness import heartbeats
 from eron.users.models.user_models import UserModel
+from eron.users.models.suggestion_models import FollowSuggestionModel
+from eron.analytics.models.rollups import DailyRollupModel, HourlyRollupModel, RollupCursorModel
+from eron.core.ratelimit.models import RateLimitBucketModel
+from eron.core.cache.models import CacheInvalidationModel
+from eron.core.cache.response_cache import RESPONSE_CACHE_BACKEND, listen_for_invalidations
+from eron.jobs.reconcile_counters import run_periodically
+from eron.jobs import archive_chats, rollup_analytics, suggest_follows
+from eron.chats.utils.acks import ack_batcher
+from eron.chats.utils.search import CHAT_SEARCH_BACKEND, posting_writer
+from eron.core.metrics.mongo import MongoCommandMetrics
+from eron.core.logger.logger import setup_logging, shutdown_logging
+
+logger = logging.getLogger(__name__)
 
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "eron")
+# seconds between in-process counter reconciliation passes, unset = off
+COUNTER_RECONCILE_INTERVAL = os.getenv("COUNTER_RECONCILE_INTERVAL")
+# seconds between chat archival passes, unset = off
+CHAT_ARCHIVE_INTERVAL = os.getenv("CHAT_ARCHIVE_INTERVAL")
+# seconds between who-to-follow rebuilds, unset = off
+FOLLOW_SUGGESTIONS_INTERVAL = os.getenv("FOLLOW_SUGGESTIONS_INTERVAL")
+# seconds between analytics rollup passes, unset = off
+ANALYTICS_ROLLUP_INTERVAL = os.getenv("ANALYTICS_ROLLUP_INTERVAL")
 
 
 MODELS = [
@@ -16,19 +42,58 @@ MODELS = [
 ChatMessageModel,
 LiveStreamModel,
 LiveViewerModel,
-LiveCommentModel
+LiveCommentModel,
+RateLimitBucketModel,
+CacheInvalidationModel,
+ChatSearchPostingModel,
+FollowSuggestionModel,
+LeaderboardScoreModel,
+HourlyRollupModel,
+DailyRollupModel,
+RollupCursorModel
 
 ]
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    client = AsyncIOMotorClient(MONGODB_URL,uuidRepresentation="standard")
+async def connect() -> AsyncIOMotorClient:
+    client = AsyncIOMotorClient(
+        MONGODB_URL,
+        uuidRepresentation="standard",
+        event_listeners=[MongoCommandMetrics()]
+    )
     await init_beanie(
         database=client[DATABASE_NAME],
         document_models=MODELS,
     )
-    print(f"✅ Connected to MongoDB: {DATABASE_NAME}")
+    return client
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()
+    client = await connect()
+    logger.info("Connected to MongoDB: %s", DATABASE_NAME)
+
+    background_tasks = []
+    if COUNTER_RECONCILE_INTERVAL:
+        background_tasks.append(asyncio.create_task(run_periodically(float(COUNTER_RECONCILE_INTERVAL))))
+    if CHAT_ARCHIVE_INTERVAL:
+        background_tasks.append(asyncio.create_task(archive_chats.run_periodically(float(CHAT_ARCHIVE_INTERVAL))))
+    if FOLLOW_SUGGESTIONS_INTERVAL:
+        background_tasks.append(asyncio.create_task(suggest_follows.run_periodically(float(FOLLOW_SUGGESTIONS_INTERVAL))))
+    if ANALYTICS_ROLLUP_INTERVAL:
+        background_tasks.append(asyncio.create_task(rollup_analytics.run_periodically(float(ANALYTICS_ROLLUP_INTERVAL))))
+    if RESPONSE_CACHE_BACKEND == "mongo":
+        background_tasks.append(asyncio.create_task(listen_for_invalidations()))
+    # host leaderboards: current boards into memory, checkpointed from then on
+    await leaderboards.load()
+    background_tasks.append(asyncio.create_task(leaderboards.run()))
+    # heartbeats of the lives hosted here, then the stale live sweep
+    background_tasks.append(asyncio.create_task(heartbeats.run()))
+    # chat delivered/read acks, written in batches (flushes once more on shutdown)
+    background_tasks.append(asyncio.create_task(ack_batcher.run()))
+    if CHAT_SEARCH_BACKEND == "index":
+        background_tasks.append(asyncio.create_task(posting_writer.run()))
 
     # ----------------------------------------
     # try:
@@ -40,5 +105,10 @@ async def lifespan(app: FastAPI):
 
     yield
 
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+
     client.close()
-    print("👋 MongoDB connection closed.")
+    logger.info("MongoDB connection closed")
+    shutdown_logging()
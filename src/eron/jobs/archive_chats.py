@@ -0,0 +1,138 @@
+"""
+Move old chat messages out of chat_messages into monthly archive
+collections (chat_messages_archive_YYYY_MM, see eron.chats.utils.archive).
+
+Messages older than CHAT_ARCHIVE_AFTER_DAYS are read oldest first in
+batches, inserted into the archive of their month and then deleted from the
+hot collection. When a batch opens a new month the delete waits
+CHAT_ARCHIVE_LIST_TTL, so every worker lists the month before its messages
+leave the hot collection. Undelivered messages stay: they are the offline queue. A
+batch that was copied but not deleted (crash, restart) is simply copied
+again; the duplicate inserts are ignored.
+
+Run once from the command line:
+
+    python -m eron.jobs.archive_chats --batch-size 1000 --rate 5000
+
+or in-process by setting CHAT_ARCHIVE_INTERVAL (seconds), see eron.db.
+"""
+import argparse
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pymongo.errors import BulkWriteError
+
+from eron.chats.models.chat_models import ChatMessageModel
+from eron.chats.utils.archive import CHAT_ARCHIVE_LIST_TTL, archive_catalog, archive_name, hot_cutoff
+from eron.jobs.throttle import Throttle
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.getenv("CHAT_ARCHIVE_BATCH_SIZE", "1000"))
+# Messages moved per second, keeps the job well below chat traffic
+RATE_LIMIT = float(os.getenv("CHAT_ARCHIVE_RATE", "5000"))
+
+_DUPLICATE_KEY = 11000
+
+
+@dataclass
+class ArchiveStats:
+    moved: int = 0
+    batches: int = 0
+    months: Dict[str, int] = field(default_factory=dict)
+
+
+async def _copy(name: str, docs: List[dict]) -> bool:
+    """Insert docs into the month's archive; True if that archive was just created."""
+    created = await archive_catalog.ensure(name)
+    try:
+        await ChatMessageModel.get_motor_collection().database[name].insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        # already archived by an earlier, interrupted run
+        if any(error["code"] != _DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+            raise
+    return created
+
+
+async def archive(
+        cutoff: Optional[datetime] = None,
+        batch_size: int = BATCH_SIZE,
+        rate: float = RATE_LIMIT,
+        dry_run: bool = False,
+) -> ArchiveStats:
+    stats = ArchiveStats()
+    cutoff = cutoff or hot_cutoff()
+    if cutoff is None:
+        return stats
+
+    collection = ChatMessageModel.get_motor_collection()
+    throttle = Throttle(rate)
+    query = {"timestamp": {"$lt": cutoff}, "is_delivered": {"$ne": False}}
+    while True:
+        batch = await collection.find(query).sort("timestamp", 1).limit(batch_size).to_list(None)
+        if not batch:
+            break
+
+        by_month: Dict[str, List[dict]] = {}
+        for doc in batch:
+            by_month.setdefault(archive_name(doc["timestamp"]), []).append(doc)
+        new_month = False
+        for name, docs in by_month.items():
+            stats.months[name] = stats.months.get(name, 0) + len(docs)
+            if not dry_run:
+                new_month |= await _copy(name, docs)
+
+        stats.batches += 1
+        stats.moved += len(batch)
+        if dry_run:
+            # nothing is deleted, so the same batch would come back
+            break
+        if new_month:
+            # until other workers re-list the archives, these messages would
+            # be in neither place for them; in both is fine (reads dedupe)
+            await asyncio.sleep(CHAT_ARCHIVE_LIST_TTL)
+        await collection.delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+
+        await throttle.wait(len(batch))
+        if len(batch) < batch_size:
+            break
+    return stats
+
+
+async def run_periodically(interval: float):
+    """Background loop started from the app lifespan."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            stats = await archive()
+            if stats.moved:
+                logger.info("chat archival: moved=%s months=%s", stats.moved, stats.months)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("chat archival failed")
+
+
+async def _main(args):
+    from eron.db import connect
+
+    client = await connect()
+    try:
+        cutoff = datetime.fromisoformat(args.before) if args.before else None
+        print(await archive(cutoff=cutoff, batch_size=args.batch_size, rate=args.rate, dry_run=args.dry_run))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old chat messages to monthly archives")
+    parser.add_argument("--before", help="ISO timestamp, default: now - CHAT_ARCHIVE_AFTER_DAYS")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--rate", type=float, default=RATE_LIMIT, help="messages per second, 0 = unlimited")
+    parser.add_argument("--dry-run", action="store_true", help="count the first batch without moving it")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
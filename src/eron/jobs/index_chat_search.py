@@ -0,0 +1,114 @@
+"""
+Build the chat search postings (CHAT_SEARCH_BACKEND=index, see
+eron.chats.utils.search) for messages that were sent before the backend was
+switched on, or whose postings could not be written at the time.
+
+Hot and archived messages are read oldest first in batches; postings that
+already exist are skipped by the unique index, so the job can be stopped and
+run again from any --since.
+
+    python -m eron.jobs.index_chat_search --since 2025-01-01 --batch-size 1000 --rate 5000
+"""
+import argparse
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from beanie.odm.utils.parsing import parse_obj
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+
+from eron.chats.models.chat_models import ChatMessageModel, ChatSearchPostingModel
+from eron.chats.utils.archive import archive_catalog
+from eron.chats.utils.search import postings_for
+from eron.jobs.throttle import Throttle
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.getenv("CHAT_SEARCH_INDEX_BATCH_SIZE", "1000"))
+# Messages indexed per second, keeps the job well below chat traffic
+RATE_LIMIT = float(os.getenv("CHAT_SEARCH_INDEX_RATE", "5000"))
+
+_DUPLICATE_KEY = 11000
+
+
+@dataclass
+class IndexStats:
+    messages: int = 0
+    postings: int = 0
+    existing: int = 0
+
+
+async def _insert(postings: list, stats: IndexStats):
+    if not postings:
+        return
+    try:
+        await ChatSearchPostingModel.get_motor_collection().bulk_write(
+            [InsertOne(posting) for posting in postings], ordered=False
+        )
+        stats.postings += len(postings)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error["code"] != _DUPLICATE_KEY for error in errors):
+            raise
+        stats.postings += len(postings) - len(errors)
+        stats.existing += len(errors)
+
+
+async def index_collection(collection, since: Optional[datetime], batch_size: int, throttle: Throttle, stats: IndexStats):
+    query = {"timestamp": {"$gte": since}} if since else {}
+    last = None
+    while True:
+        page_query = dict(query)
+        if last is not None:
+            # (timestamp, _id) keyset, messages sent in the same instant aren't skipped
+            page_query["$or"] = [
+                {"timestamp": {"$gt": last[0]}},
+                {"timestamp": last[0], "_id": {"$gt": last[1]}},
+            ]
+        batch = await collection.find(page_query).sort([("timestamp", 1), ("_id", 1)]).limit(batch_size).to_list(None)
+        if not batch:
+            break
+        postings = []
+        for raw in batch:
+            postings += postings_for(parse_obj(ChatMessageModel, raw))
+        await _insert(postings, stats)
+        stats.messages += len(batch)
+        last = (batch[-1]["timestamp"], batch[-1]["_id"])
+
+        await throttle.wait(len(batch))
+        if len(batch) < batch_size:
+            break
+
+
+async def index_all(since: Optional[datetime] = None, batch_size: int = BATCH_SIZE, rate: float = RATE_LIMIT) -> IndexStats:
+    stats = IndexStats()
+    throttle = Throttle(rate)
+    hot = ChatMessageModel.get_motor_collection()
+    for name in sorted(await archive_catalog.names()):
+        await index_collection(hot.database[name], since, batch_size, throttle, stats)
+    await index_collection(hot, since, batch_size, throttle, stats)
+    return stats
+
+
+async def _main(args):
+    from eron.db import connect
+
+    client = await connect()
+    try:
+        since = datetime.fromisoformat(args.since) if args.since else None
+        print(await index_all(since=since, batch_size=args.batch_size, rate=args.rate))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build chat search postings for existing messages")
+    parser.add_argument("--since", help="ISO timestamp, only index messages sent after it")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--rate", type=float, default=RATE_LIMIT, help="messages per second, 0 = unlimited")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,67 @@
+"""
+Recompute the all-time leaderboards (eron.live_stream.utils.leaderboards)
+from the counters on livestreams, e.g. after the boards were first
+introduced or the collection was lost. Daily and weekly boards can't be
+rebuilt: the counters carry no per-day history.
+
+Running workers pick the new scores up at their next checkpoint.
+
+    python -m eron.jobs.rebuild_leaderboards
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict
+
+from pymongo import UpdateOne
+
+from eron.core.aggregation.refs import ref_id
+from eron.live_stream.models.leaderboard import LeaderboardScoreModel
+from eron.live_stream.models.live_stream import LiveStreamModel
+from eron.live_stream.utils.leaderboards import board_name
+
+logger = logging.getLogger(__name__)
+
+# leaderboard metric -> LiveStreamModel counter
+COUNTERS = {"likes": "total_like", "views": "total_views", "coins": "earn_coins"}
+
+
+async def rebuild() -> Dict[str, int]:
+    now = datetime.now(timezone.utc)
+    rows = await LiveStreamModel.get_motor_collection().aggregate([
+        {"$group": {
+            "_id": ref_id("host"),
+            **{metric: {"$sum": f"${counter}"} for metric, counter in COUNTERS.items()},
+        }},
+    ], allowDiskUse=True).to_list(None)
+
+    written = {}
+    for metric in COUNTERS:
+        board = board_name(metric, "all_time", now)
+        writes = [
+            UpdateOne(
+                {"_id": f"{board}:{row['_id']}"},
+                {"$set": {"board": board, "host": row["_id"], "score": row[metric], "updated_at": now}},
+                upsert=True,
+            )
+            for row in rows if row[metric]
+        ]
+        if writes:
+            await LeaderboardScoreModel.get_motor_collection().bulk_write(writes, ordered=False)
+        written[metric] = len(writes)
+    return written
+
+
+async def _main():
+    from eron.db import connect
+
+    client = await connect()
+    try:
+        print(await rebuild())
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
@@ -0,0 +1,255 @@
+"""
+Recompute denormalized counters from their source collections.
+
+UserModel
+    following_count  <- size of `following`
+    followers_count  <- users whose `following` contains the user
+    total_like       <- sum of `total_like` over the user's streams
+LiveStreamModel
+    earn_coins       <- sum of `fee_paid` over the session's live_viewers rows
+    total_comment    <- live_comments rows for the session
+
+total_views is left alone: it counts joins, rejoins included, while
+live_viewers keeps one row per viewer, so there is nothing to recompute it
+from.
+
+Documents are walked in `_id` order in fixed-size batches, each batch is
+recomputed with a handful of aggregations and only documents whose counters
+differ are written. Writes are guarded by the values that were read, so an
+increment that lands in between makes the write a no-op instead of being
+overwritten (the next pass picks it up).
+
+Run once from the command line:
+
+    python -m eron.jobs.reconcile_counters --batch-size 500 --rate 1000
+
+or in-process by setting COUNTER_RECONCILE_INTERVAL (seconds), see eron.db.
+"""
+import argparse
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Type
+from uuid import UUID
+
+from pymongo import UpdateOne
+
+from eron.core.aggregation.refs import group_by_ref, ref_id
+from eron.core.base.base import BaseCollection
+from eron.core.cache.response_cache import profile_cache
+from eron.jobs.throttle import Throttle
+from eron.live_stream.models.live_stream import LiveStreamModel
+from eron.live_stream.utils.counters import stream_counters
+from eron.users.models.user_models import UserModel
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.getenv("COUNTER_RECONCILE_BATCH_SIZE", "500"))
+CONCURRENCY = int(os.getenv("COUNTER_RECONCILE_CONCURRENCY", "2"))
+# Documents scanned per second, keeps the job well below live traffic
+RATE_LIMIT = float(os.getenv("COUNTER_RECONCILE_RATE", "1000"))
+
+
+@dataclass
+class ReconcileStats:
+    collection: str
+    scanned: int = 0
+    corrected: int = 0
+    skipped: int = 0
+    last_id: Optional[UUID] = None
+    fields: Dict[str, int] = field(default_factory=dict)
+
+
+async def _user_counters(batch: List[dict]) -> Dict[UUID, Dict[str, int]]:
+    ids = [doc["_id"] for doc in batch]
+
+    # followers: only users following someone in the batch, and only the
+    # matching entries of their following arrays
+    followers_rows = await UserModel.get_motor_collection().aggregate([
+        {"$match": {"following.$id": {"$in": ids}}},
+        {"$project": {"following": 1}},
+        {"$unwind": "$following"},
+        {"$match": {"following.$id": {"$in": ids}}},
+        {"$group": {"_id": ref_id("following"), "n": {"$sum": 1}}},
+    ]).to_list(None)
+    followers = {row["_id"]: row["n"] for row in followers_rows}
+    likes = await group_by_ref(LiveStreamModel, "host", ids, "$total_like")
+
+    return {
+        doc["_id"]: {
+            "following_count": doc["actual_following"],
+            "followers_count": followers.get(doc["_id"], 0),
+            "total_like": likes.get(doc["_id"], 0),
+        }
+        for doc in batch
+    }
+
+
+RECONCILERS = {
+    UserModel: (
+        _user_counters,
+        {"following_count": 1, "followers_count": 1, "total_like": 1,
+         "actual_following": {"$size": {"$ifNull": ["$following", []]}}},
+    ),
+    LiveStreamModel: (
+        stream_counters,
+        {"earn_coins": 1, "total_comment": 1},
+    ),
+}
+
+
+async def _fix_batch(model: Type[BaseCollection], batch: List[dict], stats: ReconcileStats,
+                     dry_run: bool):
+    compute, _ = RECONCILERS[model]
+    expected = await compute(batch)
+
+    writes = []
+    corrected_ids = []
+    for doc in batch:
+        changes = {
+            name: value for name, value in expected[doc["_id"]].items()
+            if doc.get(name, 0) != value
+        }
+        if not changes:
+            continue
+        for name in changes:
+            stats.fields[name] = stats.fields.get(name, 0) + 1
+        # guarded by the values we read, a concurrent $inc wins over us
+        guard = {"_id": doc["_id"], **{name: doc.get(name, 0) for name in changes}}
+        writes.append(UpdateOne(guard, {"$set": changes}))
+        corrected_ids.append(doc["_id"])
+
+    if writes and not dry_run:
+        result = await model.get_motor_collection().bulk_write(writes, ordered=False)
+        stats.corrected += result.modified_count
+        if model is UserModel:
+            for user_id in corrected_ids:
+                profile_cache.invalidate(user_id)
+        stats.skipped += len(writes) - result.modified_count
+    elif writes:
+        stats.corrected += len(writes)
+
+
+async def reconcile(
+        model: Type[BaseCollection],
+        start_after: Optional[UUID] = None,
+        end_at: Optional[UUID] = None,
+        batch_size: int = BATCH_SIZE,
+        concurrency: int = CONCURRENCY,
+        rate: float = RATE_LIMIT,
+        dry_run: bool = False,
+) -> ReconcileStats:
+    """
+    Reconcile the counters of one collection over the `_id` range
+    (start_after, end_at]. `stats.last_id` is the resume point.
+    """
+    _, projection = RECONCILERS[model]
+    collection = model.get_motor_collection()
+    stats = ReconcileStats(collection=collection.name, last_id=start_after)
+    throttle = Throttle(rate)
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+    # (last id of batch, task) in dispatch order; the resume point only moves
+    # past a batch once it and every batch before it have finished
+    in_flight: List[tuple] = []
+
+    async def run(batch):
+        try:
+            await _fix_batch(model, batch, stats, dry_run)
+        finally:
+            semaphore.release()
+
+    last_id = start_after
+    while True:
+        match: Dict[str, Any] = {}
+        if last_id is not None:
+            match["$gt"] = last_id
+        if end_at is not None:
+            match["$lte"] = end_at
+
+        pipeline = [{"$match": {"_id": match}}] if match else []
+        pipeline += [{"$sort": {"_id": 1}}, {"$limit": batch_size}, {"$project": projection}]
+        batch = await collection.aggregate(pipeline).to_list(None)
+        if not batch:
+            break
+
+        last_id = batch[-1]["_id"]
+        stats.scanned += len(batch)
+
+        # at most `concurrency` batches in flight
+        await semaphore.acquire()
+        in_flight.append((last_id, asyncio.create_task(run(batch))))
+
+        await throttle.wait(len(batch))
+        while in_flight and in_flight[0][1].done():
+            done_id, task = in_flight.pop(0)
+            task.result()
+            stats.last_id = done_id
+            logger.debug("reconciled %s up to %s", stats.collection, done_id)
+
+        if len(batch) < batch_size:
+            break
+
+    for done_id, task in in_flight:
+        await task
+        stats.last_id = done_id
+    return stats
+
+
+async def reconcile_all(**kwargs) -> List[ReconcileStats]:
+    results = []
+    for model in RECONCILERS:
+        stats = await reconcile(model, **kwargs)
+        logger.info(
+            "counter reconciliation %s: scanned=%s corrected=%s skipped=%s fields=%s",
+            stats.collection, stats.scanned, stats.corrected, stats.skipped, stats.fields,
+        )
+        results.append(stats)
+    return results
+
+
+async def run_periodically(interval: float):
+    """Background loop started from the app lifespan."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await reconcile_all()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("counter reconciliation failed")
+
+
+async def _main(args):
+    from eron.db import connect
+
+    client = await connect()
+    models = {"users": UserModel, "livestreams": LiveStreamModel}
+    try:
+        targets = [models[args.collection]] if args.collection else list(RECONCILERS)
+        for model in targets:
+            stats = await reconcile(
+                model,
+                start_after=args.start_after,
+                end_at=args.end_at,
+                batch_size=args.batch_size,
+                concurrency=args.concurrency,
+                rate=args.rate,
+                dry_run=args.dry_run,
+            )
+            print(stats)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile denormalized counters")
+    parser.add_argument("--collection", choices=["users", "livestreams"])
+    parser.add_argument("--start-after", type=UUID, help="resume after this _id")
+    parser.add_argument("--end-at", type=UUID, help="stop at this _id (inclusive)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=RATE_LIMIT, help="documents per second, 0 = unlimited")
+    parser.add_argument("--dry-run", action="store_true")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
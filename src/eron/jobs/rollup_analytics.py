@@ -0,0 +1,308 @@
+"""
+Roll live activity up into hourly and daily analytics collections
+(analytics_hourly, analytics_daily, see eron.analytics.models.rollups), per
+host and platform-wide (host=None):
+
+    earnings, views, unique_viewers  <- live_viewers (joined_at, fee_paid)
+    comments                         <- live_comments (created_at)
+    live_minutes                     <- livestreams ended in the window,
+                                        split over the buckets they span
+
+Each run continues from the high-water mark stored in analytics_cursors and
+only takes closed buckets, so every bucket's activity is computed in full
+and written with $merge. A window is claimed on the cursor before it is
+rolled up, so overlapping runs (several workers, a CLI run next to them)
+don't roll it up twice. A claim left by a crashed run lapses after
+ANALYTICS_CLAIM_TIMEOUT and the window is rolled up again. That is safe
+because every value is recomputed and $set, never added:
+
+    activity    the window's buckets, from the rows in the window
+    minutes     the buckets spanned by the sessions that ended in the
+                window, from every session ended so far that overlaps them
+                (this reaches back into buckets rolled up before)
+
+Run once from the command line:
+
+    python -m eron.jobs.rollup_analytics --granularity hourly
+
+or in-process by setting ANALYTICS_ROLLUP_INTERVAL (seconds), see eron.db.
+"""
+import argparse
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+from pymongo.errors import DuplicateKeyError
+
+from eron.analytics.models.rollups import DailyRollupModel, HourlyRollupModel, RollupCursorModel
+from eron.core.aggregation.refs import ref_id
+from eron.live_stream.models.live_stream import LiveCommentModel, LiveStreamModel, LiveViewerModel
+
+logger = logging.getLogger(__name__)
+
+# a bucket is rolled up this long after it closes, for writes still in flight
+ANALYTICS_LAG = timedelta(seconds=int(os.getenv("ANALYTICS_LAG", "120")))
+# a window claimed by a run that didn't finish it is free again after this
+ANALYTICS_CLAIM_TIMEOUT = timedelta(seconds=int(os.getenv("ANALYTICS_CLAIM_TIMEOUT", "600")))
+
+# granularity -> ($dateTrunc unit, rollup model, window read per aggregation)
+GRANULARITIES = {
+    "hourly": ("hour", HourlyRollupModel, timedelta(hours=24)),
+    "daily": ("day", DailyRollupModel, timedelta(days=7)),
+}
+
+
+@dataclass
+class RollupStats:
+    granularity: str
+    windows: int = 0
+    high_water: Optional[datetime] = None
+    # stopped because another run holds (or took) the window
+    contended: bool = False
+
+
+def _truncate(at: datetime, unit: str) -> datetime:
+    at = at.replace(minute=0, second=0, microsecond=0)
+    return at.replace(hour=0) if unit == "day" else at
+
+
+def _with_host(session_path: str) -> List[Dict[str, Any]]:
+    # host of the row's session; only the _id index of livestreams is used
+    return [
+        {"$lookup": {
+            "from": LiveStreamModel.get_collection_name(),
+            "let": {"session": ref_id(session_path)},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$_id", "$$session"]}}},
+                {"$project": {"host": 1}},
+            ],
+            "as": "live",
+        }},
+        {"$set": {"host": {"$getField": {"field": {"$literal": "$id"}, "input": {"$first": "$live.host"}}}}},
+    ]
+
+
+def _merge(into: str, when_matched: Any = "merge") -> Dict[str, Any]:
+    # matched on _id = {host, bucket}: a null `on` field (platform rows)
+    # is rejected by $merge, a null inside _id isn't
+    return {"$merge": {"into": into, "on": "_id", "whenMatched": when_matched, "whenNotMatched": "insert"}}
+
+
+def _output(*fields: str) -> Dict[str, Any]:
+    return {"$project": {
+        "host": "$_id.host", "bucket": "$_id.bucket", **{name: 1 for name in fields}, "updated_at": "$$NOW",
+    }}
+
+
+def _by_scope(key: Dict[str, Any]) -> Dict[str, Any]:
+    # every row counts once for its host and once for the platform (host None)
+    return {"scope": ["$host", None], **key}
+
+
+def _viewer_pipeline(unit: str, lo: datetime, hi: datetime, into: str) -> List[Dict[str, Any]]:
+    return [
+        {"$match": {"joined_at": {"$gte": lo, "$lt": hi}}},
+        *_with_host("session"),
+        {"$project": _by_scope({
+            "bucket": {"$dateTrunc": {"date": "$joined_at", "unit": unit}},
+            "user": ref_id("user"),
+            "fee_paid": 1,
+        })},
+        {"$unwind": "$scope"},
+        # a row per viewer first: unique viewers is then a count, not a set
+        {"$group": {
+            "_id": {"host": "$scope", "bucket": "$bucket", "user": "$user"},
+            "earnings": {"$sum": "$fee_paid"},
+            "views": {"$sum": 1},
+        }},
+        {"$group": {
+            "_id": {"host": "$_id.host", "bucket": "$_id.bucket"},
+            "earnings": {"$sum": "$earnings"},
+            "views": {"$sum": "$views"},
+            "unique_viewers": {"$sum": 1},
+        }},
+        _output("earnings", "views", "unique_viewers"),
+        _merge(into),
+    ]
+
+
+def _comment_pipeline(unit: str, lo: datetime, hi: datetime, into: str) -> List[Dict[str, Any]]:
+    return [
+        {"$match": {"created_at": {"$gte": lo, "$lt": hi}}},
+        *_with_host("session"),
+        {"$project": _by_scope({"bucket": {"$dateTrunc": {"date": "$created_at", "unit": unit}}})},
+        {"$unwind": "$scope"},
+        {"$group": {"_id": {"host": "$scope", "bucket": "$bucket"}, "comments": {"$sum": 1}}},
+        _output("comments"),
+        _merge(into),
+    ]
+
+
+def _minutes_pipeline(unit: str, since: datetime, hi: datetime, into: str) -> List[Dict[str, Any]]:
+    """
+    live_minutes of every bucket from `since` on, recomputed from all the
+    sessions that ended before `hi` and overlap it. `since` is the first
+    bucket of the window's sessions (see _minutes_since), so every bucket
+    they touch gets its full total, however often this runs.
+    """
+    bucket_end = {"$dateAdd": {"startDate": "$bucket", "unit": unit, "amount": 1}}
+    return [
+        # ended after `since`, so they can overlap it; end_time index
+        {"$match": {"end_time": {"$gt": since, "$lt": hi}}},
+        {"$project": {
+            "host": ref_id("host"),
+            "start": "$start_time",
+            "end": "$end_time",
+            "first": {"$dateTrunc": {"date": {"$max": ["$start_time", since]}, "unit": unit}},
+        }},
+        {"$set": {"offset": {"$range": [0, {"$add": [
+            {"$dateDiff": {"startDate": "$first", "endDate": "$end", "unit": unit}}, 1,
+        ]}]}}},
+        {"$unwind": "$offset"},
+        {"$set": {"bucket": {"$dateAdd": {"startDate": "$first", "unit": unit, "amount": "$offset"}}}},
+        {"$project": _by_scope({
+            "bucket": 1,
+            "minutes": {"$divide": [
+                {"$subtract": [{"$min": ["$end", bucket_end]}, {"$max": ["$start", "$bucket"]}]},
+                60000,
+            ]},
+        })},
+        {"$match": {"minutes": {"$gt": 0}}},
+        {"$unwind": "$scope"},
+        {"$group": {"_id": {"host": "$scope", "bucket": "$bucket"}, "live_minutes": {"$sum": "$minutes"}}},
+        _output("live_minutes"),
+        # the full total, so a repeated window writes the same value again
+        _merge(into),
+    ]
+
+
+async def _minutes_since(unit: str, lo: datetime, hi: datetime) -> Optional[datetime]:
+    """First bucket touched by a session that ended in [lo, hi), None if none ended."""
+    first = await LiveStreamModel.get_motor_collection().find_one(
+        {"end_time": {"$gte": lo, "$lt": hi}}, projection={"start_time": 1}, sort=[("start_time", 1)]
+    )
+    if first is None:
+        return None
+    return min(_truncate(first["start_time"].replace(tzinfo=timezone.utc), unit), lo)
+
+
+async def _high_water(granularity: str, unit: str, closed: datetime) -> datetime:
+    cursor = await RollupCursorModel.get(granularity)
+    if cursor is not None:
+        return cursor.high_water.replace(tzinfo=timezone.utc)
+    # first run: from the first live session on
+    first = await LiveStreamModel.get_motor_collection().find_one(
+        {}, projection={"start_time": 1}, sort=[("start_time", 1)]
+    )
+    if first is None:
+        return closed
+    return _truncate(first["start_time"].replace(tzinfo=timezone.utc), unit)
+
+
+async def _claim(granularity: str, high_water: datetime, owner: str) -> bool:
+    """
+    Take the window starting at `high_water` for `owner`. False if the
+    cursor has moved on or another run's claim on it hasn't lapsed.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        # upsert: the first run creates the cursor; once it exists a guard
+        # that doesn't match tries to insert it again and hits the _id
+        await RollupCursorModel.get_motor_collection().find_one_and_update(
+            {
+                "_id": granularity,
+                "high_water": high_water,
+                "$or": [{"claimed_until": None}, {"claimed_until": {"$lte": now}}],
+            },
+            {"$set": {"claimed_by": owner, "claimed_until": now + ANALYTICS_CLAIM_TIMEOUT, "updated_at": now}},
+            upsert=True,
+            projection={"_id": 1},
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+async def _advance(granularity: str, high_water: datetime, hi: datetime, owner: str) -> bool:
+    """Move the cursor past a window `owner` rolled up and release the claim."""
+    result = await RollupCursorModel.get_motor_collection().update_one(
+        {"_id": granularity, "high_water": high_water, "claimed_by": owner},
+        {
+            "$set": {"high_water": hi, "updated_at": datetime.now(timezone.utc)},
+            "$unset": {"claimed_by": "", "claimed_until": ""},
+        },
+    )
+    return result.modified_count == 1
+
+
+async def rollup(granularity: str, now: Optional[datetime] = None) -> RollupStats:
+    unit, model, step = GRANULARITIES[granularity]
+    stats = RollupStats(granularity)
+    closed = _truncate((now or datetime.now(timezone.utc)) - ANALYTICS_LAG, unit)
+    high_water = await _high_water(granularity, unit, closed)
+    into = model.get_collection_name()
+    owner = uuid4().hex
+
+    while high_water < closed:
+        if not await _claim(granularity, high_water, owner):
+            stats.contended = True
+            break
+        hi = min(high_water + step, closed)
+        for source, pipeline in (
+                (LiveViewerModel, _viewer_pipeline),
+                (LiveCommentModel, _comment_pipeline),
+        ):
+            await source.get_motor_collection().aggregate(
+                pipeline(unit, high_water, hi, into), allowDiskUse=True
+            ).to_list(None)
+        since = await _minutes_since(unit, high_water, hi)
+        if since is not None:
+            await LiveStreamModel.get_motor_collection().aggregate(
+                _minutes_pipeline(unit, since, hi, into), allowDiskUse=True
+            ).to_list(None)
+        # our claim lapsed and another run took the window: it rewrites the
+        # same values, and the cursor is its to move
+        if not await _advance(granularity, high_water, hi, owner):
+            stats.contended = True
+            break
+        high_water = hi
+        stats.windows += 1
+    stats.high_water = high_water
+    return stats
+
+
+async def run_periodically(interval: float):
+    """Background loop started from the app lifespan."""
+    while True:
+        await asyncio.sleep(interval)
+        for granularity in GRANULARITIES:
+            try:
+                stats = await rollup(granularity)
+                if stats.windows:
+                    logger.info("analytics rollup: %s", stats)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("analytics rollup (%s) failed", granularity)
+
+
+async def _main(args):
+    from eron.db import connect
+
+    client = await connect()
+    try:
+        for granularity in args.granularity or list(GRANULARITIES):
+            print(await rollup(granularity))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Roll live activity up into hourly/daily analytics")
+    parser.add_argument("--granularity", action="append", choices=list(GRANULARITIES))
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,276 @@
+"""
+Rebuild the "who to follow" lists (follow_suggestions, see
+eron.users.models.suggestion_models).
+
+A candidate scores SUGGESTION_FOF_WEIGHT for every followee who follows
+them (friends of friends) plus SUGGESTION_COVIEW_WEIGHT for every live
+session in the last SUGGESTION_COVIEW_DAYS both users joined. People the
+user already follows, and the user, are left out; the SUGGESTIONS_TOP_K
+best are stored.
+
+The follow graph A (users x users) and the viewing matrix V (users x
+sessions) are built as SciPy CSR matrices and scored a block of rows at a
+time as A[rows] @ A + V[rows] @ V.T, so memory stays bounded by the block
+size. `--engine python` takes the same counts in plain Python (slow, kept
+as the reference the sparse path is tested against). Between runs the stored lists are adjusted on follow/unfollow
+(eron.users.utils.suggestions).
+
+Run once from the command line:
+
+    python -m eron.jobs.suggest_follows --block-size 2000 [--engine python]
+
+or in-process by setting FOLLOW_SUGGESTIONS_INTERVAL (seconds), see eron.db.
+Matrix building and scoring run in a worker thread, so the API keeps
+serving meanwhile; still, every process with the interval set loads its own
+copy of the graph, so set it on one of them only.
+"""
+import argparse
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from pymongo import ReplaceOne
+from scipy import sparse
+
+from eron.core.aggregation.refs import ref_id
+from eron.live_stream.models.live_stream import LiveViewerModel
+from eron.users.models.suggestion_models import FollowSuggestionModel
+from eron.users.models.user_models import UserModel
+from eron.users.utils.suggestions import SUGGESTIONS_TOP_K, SUGGESTION_COVIEW_WEIGHT, SUGGESTION_FOF_WEIGHT
+
+logger = logging.getLogger(__name__)
+
+BLOCK_SIZE = int(os.getenv("FOLLOW_SUGGESTIONS_BLOCK_SIZE", "2000"))
+SUGGESTION_COVIEW_DAYS = int(os.getenv("SUGGESTION_COVIEW_DAYS", "30"))
+# bigger audiences say little about who knows whom and cost members^2 pairs
+COVIEW_MAX_SESSION = int(os.getenv("SUGGESTION_COVIEW_MAX_SESSION", "500"))
+
+# (candidate index, score, mutual, coviewed)
+Scored = Tuple[int, float, int, int]
+# copied into every stored suggestion, see SuggestedUser
+_CARD = {"first_name": 1, "last_name": 1, "profile_image": 1}
+
+
+@dataclass
+class SuggestStats:
+    users: int = 0
+    sessions: int = 0
+    stored: int = 0
+    removed: int = 0
+    engine: str = ""
+
+
+class _Graph:
+    def __init__(self):
+        self.ids: List = []
+        self.index: Dict = {}
+        # per user, indexes of the users they follow
+        self.follows: List[Sequence[int]] = []
+        # per user, sessions joined; per session, its viewers
+        self.sessions_of: List[List[int]] = []
+        self.viewers: List[List[int]] = []
+
+
+async def _load(since: datetime) -> _Graph:
+    graph = _Graph()
+    users = UserModel.get_motor_collection()
+    # ids first, so follow lists can be turned into row numbers as they stream
+    # in instead of being held as DBRefs; cards are read later, for the
+    # suggested users only
+    async for doc in users.find({}, projection={"_id": 1}):
+        graph.index[doc["_id"]] = len(graph.ids)
+        graph.ids.append(doc["_id"])
+    graph.follows = [array("i") for _ in graph.ids]
+    async for doc in users.find({}, projection={"following": 1}):
+        user = graph.index.get(doc["_id"])
+        if user is None:
+            continue
+        # the same user in a follow list twice counts once
+        targets = dict.fromkeys(graph.index.get(ref.id) for ref in doc.get("following") or [])
+        targets.pop(None, None)
+        graph.follows[user] = array("i", targets)
+
+    graph.sessions_of = [[] for _ in graph.ids]
+    rows = await LiveViewerModel.get_motor_collection().aggregate([
+        {"$match": {"joined_at": {"$gte": since}}},
+        {"$group": {"_id": ref_id("session"), "users": {"$addToSet": ref_id("user")}}},
+    ], allowDiskUse=True).to_list(None)
+    for row in rows:
+        members = [graph.index[user] for user in row["users"] if user in graph.index]
+        if not 2 <= len(members) <= COVIEW_MAX_SESSION:
+            continue
+        session = len(graph.viewers)
+        graph.viewers.append(members)
+        for member in members:
+            graph.sessions_of[member].append(session)
+    return graph
+
+
+def _top(candidates, top_k: int) -> List[Scored]:
+    return heapq.nlargest(top_k, candidates, key=lambda item: (item[1], -item[0]))
+
+
+def _score_python(graph: _Graph, rows: range, top_k: int) -> Dict[int, List[Scored]]:
+    scored = {}
+    for user in rows:
+        mutual = Counter()
+        for followee in graph.follows[user]:
+            mutual.update(graph.follows[followee])
+        coviewed = Counter()
+        for session in graph.sessions_of[user]:
+            coviewed.update(graph.viewers[session])
+        excluded = set(graph.follows[user])
+        excluded.add(user)
+        scored[user] = _top(
+            (
+                (candidate, SUGGESTION_FOF_WEIGHT * mutual[candidate] + SUGGESTION_COVIEW_WEIGHT * coviewed[candidate],
+                 mutual[candidate], coviewed[candidate])
+                for candidate in mutual.keys() | coviewed.keys() if candidate not in excluded
+            ),
+            top_k,
+        )
+    return scored
+
+
+class _Matrices:
+    def __init__(self, graph: _Graph):
+        n = len(graph.ids)
+        self.follows = _csr(graph.follows, (n, n))
+        self.views = _csr(graph.sessions_of, (n, max(len(graph.viewers), 1)))
+        self.views_t = self.views.T.tocsr()
+
+
+def _csr(rows: List[Sequence[int]], shape) -> sparse.csr_matrix:
+    # row i has a 1 in every column listed in rows[i]
+    lengths = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    indices = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int32, count=int(indptr[-1]))
+    matrix = sparse.csr_matrix((np.ones(len(indices), dtype=np.int32), indices, indptr), shape=shape)
+    matrix.sort_indices()
+    return matrix
+
+
+def _score_sparse(matrices: _Matrices, rows: range, top_k: int) -> Dict[int, List[Scored]]:
+    block = slice(rows.start, rows.stop)
+    mutual = (matrices.follows[block] @ matrices.follows).tocsr()
+    coviewed = (matrices.views[block] @ matrices.views_t).tocsr()
+    score = (SUGGESTION_FOF_WEIGHT * mutual + SUGGESTION_COVIEW_WEIGHT * coviewed).tocsr()
+    followed = matrices.follows[block]
+
+    scored = {}
+    for offset, user in enumerate(rows):
+        start, end = score.indptr[offset], score.indptr[offset + 1]
+        candidates, values = score.indices[start:end], score.data[start:end]
+        excluded = set(followed.indices[followed.indptr[offset]:followed.indptr[offset + 1]].tolist())
+        excluded.add(user)
+        keep = np.fromiter((candidate not in excluded for candidate in candidates), dtype=bool, count=len(candidates))
+        candidates, values = candidates[keep], values[keep]
+        if len(candidates) > top_k:
+            # everything tied with the k-th best goes on, _top breaks the
+            # ties by index like the Python path does
+            kth = np.partition(values, len(values) - top_k)[len(values) - top_k]
+            best = values >= kth
+            candidates, values = candidates[best], values[best]
+        mutual_row = dict(zip(*_row(mutual, offset)))
+        coviewed_row = dict(zip(*_row(coviewed, offset)))
+        scored[user] = _top(
+            (
+                (int(candidate), float(value), int(mutual_row.get(candidate, 0)), int(coviewed_row.get(candidate, 0)))
+                for candidate, value in zip(candidates.tolist(), values.tolist())
+            ),
+            top_k,
+        )
+    return scored
+
+
+def _row(matrix, offset: int):
+    start, end = matrix.indptr[offset], matrix.indptr[offset + 1]
+    return matrix.indices[start:end].tolist(), matrix.data[start:end].tolist()
+
+
+async def suggest(block_size: int = BLOCK_SIZE, top_k: int = SUGGESTIONS_TOP_K, engine: str = "scipy") -> SuggestStats:
+    started = datetime.now(timezone.utc)
+    graph = await _load(started - timedelta(days=SUGGESTION_COVIEW_DAYS))
+    stats = SuggestStats(users=len(graph.ids), sessions=len(graph.viewers), engine=engine)
+    matrices = None
+    if engine == "scipy":
+        # scoring is CPU bound: it runs in a thread so requests keep being served
+        matrices = await asyncio.to_thread(_Matrices, graph)
+        # the matrices hold the graph from here on
+        graph.follows, graph.sessions_of, graph.viewers = [], [], []
+
+    users = UserModel.get_motor_collection()
+    collection = FollowSuggestionModel.get_motor_collection()
+    for start in range(0, len(graph.ids), block_size):
+        rows = range(start, min(start + block_size, len(graph.ids)))
+        if matrices is not None:
+            scored = await asyncio.to_thread(_score_sparse, matrices, rows, top_k)
+        else:
+            scored = await asyncio.to_thread(_score_python, graph, rows, top_k)
+
+        suggested = {graph.ids[candidate] for items in scored.values() for candidate, *_ in items}
+        cards = {
+            doc.pop("_id"): doc
+            for doc in await users.find({"_id": {"$in": list(suggested)}}, projection=_CARD).to_list(None)
+        } if suggested else {}
+
+        writes = []
+        for user, items in scored.items():
+            # users deleted since the load have no card and aren't suggested
+            items = [
+                {"id": graph.ids[candidate], **cards[graph.ids[candidate]],
+                 "score": score, "mutual": mutual, "coviewed": coviewed}
+                for candidate, score, mutual, coviewed in items if graph.ids[candidate] in cards
+            ]
+            if not items:
+                continue
+            writes.append(ReplaceOne({"_id": graph.ids[user]}, {"items": items, "computed_at": started}, upsert=True))
+        if writes:
+            await collection.bulk_write(writes, ordered=False)
+            stats.stored += len(writes)
+
+    # users who have nothing to be suggested any more
+    result = await collection.delete_many({"computed_at": {"$lt": started}})
+    stats.removed = result.deleted_count
+    return stats
+
+
+async def run_periodically(interval: float):
+    """Background loop started from the app lifespan."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            stats = await suggest()
+            logger.info("follow suggestions: %s", stats)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("follow suggestions failed")
+
+
+async def _main(args):
+    from eron.db import connect
+
+    client = await connect()
+    try:
+        print(await suggest(block_size=args.block_size, top_k=args.top_k, engine=args.engine))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild who-to-follow suggestions")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE, help="users scored per step")
+    parser.add_argument("--top-k", type=int, default=SUGGESTIONS_TOP_K)
+    parser.add_argument("--engine", choices=("scipy", "python"), default="scipy")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,44 @@
+"""
+End lives whose host stopped heartbeating, once. Every worker already does
+this every LIVE_HEARTBEAT_INTERVAL (eron.live_stream.utils.liveness); the
+command is for cleaning up by hand, e.g. lives left "live" from before
+heartbeats were recorded:
+
+    python -m eron.jobs.sweep_stale_lives --include-legacy
+
+Room members still connected get "live_ended" from their worker's next
+heartbeat tick.
+"""
+import argparse
+import asyncio
+import logging
+
+from eron.live_stream.utils.liveness import LIVE_STALE_AFTER, LIVE_SWEEP_BATCH_SIZE, sweep_stale_lives
+
+logger = logging.getLogger(__name__)
+
+
+async def _main(args):
+    from eron.db import connect
+
+    client = await connect()
+    try:
+        stats = await sweep_stale_lives(
+            stale_after=args.stale_after,
+            include_legacy=args.include_legacy,
+            batch_size=args.batch_size,
+        )
+        print(stats)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End live sessions whose host stopped heartbeating")
+    parser.add_argument("--stale-after", type=float, default=LIVE_STALE_AFTER or 120,
+                        help="seconds since the last heartbeat")
+    parser.add_argument("--include-legacy", action="store_true",
+                        help="also lives without a heartbeat, by start_time")
+    parser.add_argument("--batch-size", type=int, default=LIVE_SWEEP_BATCH_SIZE)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
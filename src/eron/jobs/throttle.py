@@ -0,0 +1,19 @@
+import asyncio
+import time
+
+
+class Throttle:
+    """Sleeps so that no more than `rate` documents are handled per second (0 = unlimited)."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.started = time.monotonic()
+        self.handled = 0
+
+    async def wait(self, count: int):
+        self.handled += count
+        if self.rate <= 0:
+            return
+        ahead = self.handled / self.rate - (time.monotonic() - self.started)
+        if ahead > 0:
+            await asyncio.sleep(ahead)
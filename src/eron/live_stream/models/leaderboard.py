@@ -0,0 +1,28 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel
+
+
+class LeaderboardScoreModel(Document):
+    """Checkpointed score of one host on one board, see eron.live_stream.utils.leaderboards."""
+    # "<board>:<host id>"
+    id: str = Field(alias="_id")
+    # "<metric>:<period>:<period key>", e.g. "likes:weekly:2025-W07"
+    board: str
+    host: UUID
+    score: int = 0
+    updated_at: datetime
+    # daily and weekly boards are dropped some time after they close
+    expires_at: Optional[datetime] = None
+
+    class Settings:
+        name = "leaderboard_scores"
+        indexes = [
+            IndexModel([("board", 1), ("score", -1)]),
+            # workers pick up each other's checkpoints by time
+            IndexModel([("updated_at", 1)]),
+            IndexModel([("expires_at", 1)], expireAfterSeconds=0),
+        ]
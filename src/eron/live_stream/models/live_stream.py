@@ -1,7 +1,8 @@
-from beanie import before_event, Replace, Save, Link
+from beanie import before_event, Replace, Save, SaveChanges, Link
 from pydantic import Field
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Optional, ClassVar, FrozenSet
+from pymongo import IndexModel
 from eron.core.base.base import BaseCollection
 from eron.users.models.user_models import UserModel
 
@@ -17,16 +18,29 @@ class LiveStreamModel(BaseCollection):
     total_views: int = 0
     total_comment: int = 0
     status: str = "live"
+    # stamped by the host's worker every LIVE_HEARTBEAT_INTERVAL, see
+    # eron.live_stream.utils.liveness
+    last_heartbeat: Optional[datetime] = Field(default_factory=lambda: datetime.now(timezone.utc))
 
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
-    @before_event([Save, Replace])
+    increment_only_fields: ClassVar[FrozenSet[str]] = frozenset(
+        {"total_like", "earn_coins", "total_views", "total_comment"}
+    )
+
+    @before_event([Save, Replace, SaveChanges])
     def update_timestamp(self):
         self.updated_at = datetime.now(timezone.utc)
 
-    class Settings:
+    class Settings(BaseCollection.Settings):
         name = "livestreams"
+        indexes = [
+            # analytics rollups read sessions by the window they ended in
+            IndexModel([("end_time", 1)]),
+            # stale live sweep
+            IndexModel([("status", 1), ("last_heartbeat", 1)]),
+        ]
 
 
 
@@ -36,8 +50,12 @@ class LiveViewerModel(BaseCollection):
     joined_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     fee_paid: int = 0
 
-    class Settings:
+    class Settings(BaseCollection.Settings):
         name = "live_viewers"
+        indexes = [
+            # analytics rollups and co-viewing suggestions read by join time
+            IndexModel([("joined_at", 1)]),
+        ]
 
 
 class LiveCommentModel(BaseCollection):
@@ -46,5 +64,9 @@ class LiveCommentModel(BaseCollection):
     content: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
-    class Settings:
-        name = "live_comments"
\ No newline at end of file
+    class Settings(BaseCollection.Settings):
+        name = "live_comments"
+        indexes = [
+            # analytics rollups read by window
+            IndexModel([("created_at", 1)]),
+        ]
\ No newline at end of file
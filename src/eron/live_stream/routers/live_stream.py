@@ -1,68 +1,178 @@
 
 
-import json
 import time
-import os
 from datetime import datetime, timezone
-from typing import List
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, status,Depends
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect, Query, status,Depends
 from dotenv import load_dotenv
 from eron.live_stream.models.live_stream import LiveStreamModel, LiveViewerModel, LiveCommentModel
 from eron.users.models.user_models import UserModel
 from eron.users.utils.get_current_user import get_current_user
-from agora_token_builder import RtcTokenBuilder
+from eron.users.schemas.user_schemas import UserCard
+from eron.core.loader.link_loader import LinkLoader, get_link_loader, link_id
+from eron.core.metrics.metrics import AGORA_TOKEN_RENEWALS, WEBSOCKET_FRAMES, WEBSOCKET_RESUMES
+from eron.core.metrics.tracing import frame_tracer
+from eron.core.compression.precompressed import PrecompressedFeed
+from eron.core.websocket.protocol import OutgoingFrame, accept_websocket, receive_frame, send_message
+from eron.core.websocket.registry import Connection, ConnectionRegistry
+from eron.core.websocket.session import RoomLogs, issue_resume_token, read_resume_token
+from eron.core.websocket.admission import admit
+from eron.core.ratelimit.limiter import limiter
+from eron.core.cache.response_cache import profile_cache
+from eron.live_stream.schemas.live_stream import live_action_adapter
+from eron.live_stream.utils.leaderboards import leaderboards
+from eron.live_stream.utils.liveness import heartbeats
+from eron.live_stream.utils.agora_tokens import agora_tokens
 from uuid import UUID
 
 load_dotenv()
 
 router = APIRouter(prefix="/live", tags=["Live Stream"])
 
-APP_ID = os.getenv("AGORA_APP_ID")
-APP_CERTIFICATE = os.getenv("AGORA_APP_CERTIFICATE")
-
-
 class LiveConnectionManager:
     def __init__(self):
-        self.active_rooms: dict = {}
-
-    async def connect_to_room(self, websocket: WebSocket, channel_name: str):
-        if channel_name not in self.active_rooms:
-            self.active_rooms[channel_name] = []
-        self.active_rooms[channel_name].append(websocket)
+        # every open socket with its user, room and role
+        self.registry = ConnectionRegistry("live")
+        # per-room sequence numbers + replay buffers for resuming clients
+        self.logs = RoomLogs()
+
+    async def connect_to_room(self, conn: Connection, channel_name: str, role: str):
+        self.release_host(conn)
+        self.registry.join(conn, channel_name, role)
+        if role == "host":
+            # হোস্ট এই ওয়ার্কারে আছে, হার্টবিট এখান থেকে যায়
+            heartbeats.attach(channel_name)
         await self.broadcast_viewer_count(channel_name)
 
-    async def disconnect_from_room(self, websocket: WebSocket, channel_name: str):
-        if channel_name in self.active_rooms:
-            if websocket in self.active_rooms[channel_name]:
-                self.active_rooms[channel_name].remove(websocket)
-            if not self.active_rooms[channel_name]:
-                del self.active_rooms[channel_name]
-            else:
-                await self.broadcast_viewer_count(channel_name)
+    def release_host(self, conn: Connection):
+        if conn.role == "host" and conn.channel:
+            heartbeats.detach(conn.channel)
+
+    async def disconnect_from_room(self, conn: Connection):
+        self.release_host(conn)
+        channel_name = self.registry.leave(conn)
+        if channel_name is None:
+            return
+        if not self.registry.has_room(channel_name):
+            self.logs.drop_idle(keep=self.registry.rooms())
+        else:
+            await self.broadcast_viewer_count(channel_name)
+
+    def close_room(self, channel_name: str):
+        """Everyone out of an ended live's room; their sockets stay open."""
+        for conn in self.registry.members(channel_name):
+            self.release_host(conn)
+            self.registry.leave(conn)
+        self.logs.drop(channel_name)
+        agora_tokens.drop(channel_name)
 
     async def broadcast_viewer_count(self, channel_name: str):
-        count = len(self.active_rooms.get(channel_name, []))
+        count = self.registry.room_size(channel_name)
+        # a resuming client gets the current count anyway, no need to replay these
         await self.broadcast(channel_name, {
             "event": "viewer_count_update",
             "count": count
-        })
-
-    async def broadcast(self, channel_name: str, message: dict):
-        if channel_name in self.active_rooms:
-            for connection in self.active_rooms[channel_name]:
+        }, replay=False)
+
+    async def broadcast(self, channel_name: str, message: dict, replay: bool = True):
+        if self.registry.has_room(channel_name):
+            # encoded once per protocol, not once per viewer; replayable
+            # events get the room's next sequence number
+            frame = self.logs.get(channel_name).append(message) if replay else OutgoingFrame(message)
+            for connection in self.registry.members(channel_name):
                 try:
-                    await connection.send_json(message)
+                    await send_message(connection.websocket, frame)
                 except:
                     pass
 
 
 livestream_manager = LiveConnectionManager()
 
+# GET /live/active, dropped whenever a live starts or ends
+active_lives_feed = PrecompressedFeed("live_active")
+
+
+@heartbeats.on_tick
+async def close_ended_rooms(swept: List[str]):
+    """
+    Rooms on this worker whose live has ended somewhere else: swept as
+    stale, or ended by a host connected to another worker.
+    """
+    if swept:
+        active_lives_feed.invalidate()
+    rooms = list(livestream_manager.registry.rooms())
+    if not rooms:
+        return
+    ended = await LiveStreamModel.get_motor_collection().distinct(
+        "agora_channel_name", {"agora_channel_name": {"$in": rooms}, "status": {"$ne": "live"}}
+    )
+    for channel_name in ended:
+        await livestream_manager.broadcast(channel_name, {
+            "event": "live_ended",
+            "channel_name": channel_name,
+            "message": "The live stream has ended."
+        })
+        livestream_manager.close_room(channel_name)
+    if ended:
+        active_lives_feed.invalidate()
+
+
+@heartbeats.on_tick
+async def prune_agora_tokens(swept: List[str]):
+    agora_tokens.prune()
+
+
+async def resume_live_session(conn: Connection, claims: dict, last_seq: Optional[int]):
+    """
+    Put a reconnecting client back into its room without the join path: no
+    viewer lookup, no payment, no view count, no new Agora token. Missed
+    events after last_seq are replayed if the buffer still has them.
+    """
+    websocket = conn.websocket
+    channel_name = claims["ch"]
+    log = livestream_manager.logs.find(channel_name)
+    fresh = log is None
+    if fresh:
+        # not live on this worker (it may have just restarted), ask the database
+        live = await LiveStreamModel.find_one(
+            LiveStreamModel.agora_channel_name == channel_name,
+            LiveStreamModel.status == "live"
+        )
+        if not live:
+            WEBSOCKET_RESUMES.inc(outcome="ended")
+            await send_message(websocket, {"event": "live_ended", "channel_name": channel_name})
+            return
+        log = livestream_manager.logs.get(channel_name)
+
+    await livestream_manager.connect_to_room(conn, channel_name, claims["role"])
+    # a log made just now starts at seq 0 and knows nothing of what the
+    # client saw before, so it can't vouch for the gap: always resync
+    missed = None if fresh or last_seq is None else log.since(last_seq)
+    WEBSOCKET_RESUMES.inc(outcome="resync" if missed is None else "replayed" if missed else "resumed")
+
+    await send_message(websocket, {
+        "event": "resumed",
+        "channel": channel_name,
+        "role": claims["role"],
+        "seq": log.seq,
+        # events in between were dropped (or the worker restarted): reload room state
+        "resync_required": missed is None,
+        "resume_token": issue_resume_token(conn.user_id, channel_name, claims["role"]),
+    })
+    for frame in missed or []:
+        await send_message(websocket, frame)
+
 
 @router.websocket("/ws")
-async def live_websocket_endpoint(websocket: WebSocket, token: str = Query(...)):
-    await websocket.accept()
-    current_channel = None
+async def live_websocket_endpoint(
+        websocket: WebSocket,
+        token: str = Query(...),
+        resume: Optional[str] = Query(None),
+        last_seq: Optional[int] = Query(None)
+):
+    if not await admit(websocket, "live"):
+        return
+    codec = await accept_websocket(websocket)
     user_id = None
 
     try:
@@ -72,255 +182,311 @@ async def live_websocket_endpoint(websocket: WebSocket, token: str = Query(...))
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
 
+    # কানেকশনের ইউজার, রুম ও রোল রেজিস্ট্রিতে থাকে
+    conn = livestream_manager.registry.register(websocket, user_id)
+    if resume:
+        claims = read_resume_token(resume, user_id)
+        if claims:
+            await resume_live_session(conn, claims, last_seq)
+        else:
+            WEBSOCKET_RESUMES.inc(outcome="invalid")
+            await send_message(websocket, {"event": "resume_failed"})
+
     try:
         while True:
-            data = await websocket.receive_json()
-            action = data.get("action")
-
-            # --- ১. লাইভ শুরু করা (সংশোধিত) ---
-            if action == "start_live":
-                if current_channel: continue
-
-                # হোস্টের জন্য ১ নম্বর UID ফিক্সড করা হলো
-                host_uid = 1
-                channel_name = f"live_{user_id}_{int(time.time())}"
-
-                # এখানে চতুর্থ প্যারামিটার ০ এর জায়গায় host_uid (১) ব্যবহার করা হয়েছে
-                agora_token = RtcTokenBuilder.buildTokenWithUid(
-                    APP_ID, APP_CERTIFICATE, channel_name, host_uid, 1, int(time.time()) + 3600
-                )
-
-                new_live = LiveStreamModel(
-                    host=current_user,
-                    agora_channel_name=channel_name,
-                    is_premium=data.get("is_premium", False),
-                    entry_fee=data.get("entry_fee", 0),
-                    status="live"
-                )
-                await new_live.insert()
-
-                current_channel = channel_name
-                await livestream_manager.connect_to_room(websocket, channel_name)
-
-                # ফ্রন্টএন্ডে uid পাঠিয়ে দেওয়া হচ্ছে যাতে অ্যাপ ঐ UID দিয়ে জয়েন করে
-                await websocket.send_json({
-                    "event": "live_started",
-                    "channel_name": channel_name,
-                    "agora_token": agora_token,
-                    "uid": host_uid
-                })
-
-
-            elif action == "join_live":
-                channel_name = data.get("channel_name")
-                live = await LiveStreamModel.find_one(
-                    LiveStreamModel.agora_channel_name == channel_name,
-                    LiveStreamModel.status == "live",
-                    fetch_links=True
-                )
-
-                if not live:
-                    await websocket.send_json({"event": "error", "message": "Live session not found"})
+            raw = await receive_frame(websocket)
+            trace = frame_tracer.start("live")
+            try:
+                try:
+                    with trace.span("parse"):
+                        data = codec.parse(raw, live_action_adapter)
+                except Exception as e:
+                    trace.action = "unknown"
+                    WEBSOCKET_FRAMES.inc(endpoint="live", action=trace.action)
+                    await send_message(websocket, {"event": "error", "message": "Invalid action", "details": str(e)})
                     continue
+                action = trace.action = data.action
+                WEBSOCKET_FRAMES.inc(endpoint="live", action=trace.action)
 
-                # ১. আগে জয়েন করেছে কি না চেক করুন
-                already_joined = await LiveViewerModel.find_one({
-                    "session.$id": live.id,
-                    "user.$id": current_user.id
-                })
-                # ২. পেমেন্ট লজিক (যদি আগে জয়েন না করে থাকে)
-                if not already_joined:
-                    # প্রিমিয়াম লাইভ এবং ইউজার নিজে হোস্ট না হলে কয়েন কাটবে
-                    if live.is_premium and live.entry_fee > 0 and str(live.host.id) != str(current_user.id):
-
-                        # ব্যালেন্স চেক (Atomic ভাবে লেটেস্ট ডাটা দেখা)
-                        if current_user.coins < live.entry_fee:
-                            await websocket.send_json({"event": "error", "message": "আপনার পর্যাপ্ত কয়েন নেই!"})
-                            continue
-
-                        # --- ATOMIC UPDATE (Safe for Standalone Server) ---
-                        # ইউজারের কয়েন কমানো
-                        await current_user.update({"$inc": {"coins": -live.entry_fee}})
-
-                        # হোস্টের কয়েন বাড়ানো (সরাসরি হোস্টের ID দিয়ে আপডেট)
-                        # আপনার প্রোজেক্টের UserModel ইম্পোর্ট নিশ্চিত করুন
-                        from eron.users.models.user_models import UserModel
-                        await UserModel.find_one({"_id": live.host.id}).update(
-                            {"$inc": {"coins": live.entry_fee}}
-                        )
-
-                        # ভিউয়ার রেকর্ড সেভ (যাতে পুনরায় কয়েন না কাটে)
-                        new_viewer = LiveViewerModel(
-                            session=live, user=current_user, fee_paid=live.entry_fee
-                        )
-                        await new_viewer.insert()
-
-                        await live.update({"$inc": {"earn_coins": live.entry_fee}})
-
-
-                        await livestream_manager.broadcast(channel_name, {
-                            "event": "earning_update",
-                            "total_earned": live.earn_coins
-                        })
-
-                        # লোকাল ইউজারের কয়েন সংখ্যা আপডেট (ফ্রন্টএন্ডে পাঠানোর জন্য)
-                        current_user.coins -= live.entry_fee
-                    else:
-                        # ফ্রি লাইভ বা হোস্ট হলে সরাসরি রেকর্ড
-                        new_viewer = LiveViewerModel(session=live, user=current_user, fee_paid=0)
-                        await new_viewer.insert()
-
-                # ৩. লাইভ ভিউ বাড়ানো এবং জয়েন করা
-                await live.update({"$inc": {"total_views": 1}})
-                current_channel = channel_name
-                await livestream_manager.connect_to_room(websocket, channel_name)
-
-                viewer_uid = 0
-                viewer_token = RtcTokenBuilder.buildTokenWithUid(
-                    APP_ID, APP_CERTIFICATE, channel_name, viewer_uid, 2, int(time.time()) + 3600
-                )
-
-
-
-                await websocket.send_json({
-                    "event": "joined_success",
-                    "channel": channel_name,
-                    "agora_token": viewer_token,
-                    "uid": viewer_uid,
-                   ## "new_balance": current_user.coins
-                    "total_earned": live.earn_coins
-                })
-
-            elif action == "send_like":
-                ch_name = data.get("channel_name")
-
-                if not ch_name:
-                    await websocket.send_json({"event": "error", "message": "Channel name missing"})
+                # লাইক/কমেন্ট স্প্যাম ঠেকাতে প্রতি ইউজার প্রতি অ্যাকশন টোকেন বাকেট
+                retry_after = await trace.timed("rate_limit", limiter.hit(action, user_id))
+                if retry_after:
+                    await send_message(websocket, {"event": "rate_limited", "action": action, "retry_after": round(retry_after, 2)})
                     continue
 
-                # ১. লাইভ অবজেক্ট ফেচ করা
-                live = await LiveStreamModel.find_one(
-                    LiveStreamModel.agora_channel_name == ch_name,
-                    LiveStreamModel.status == "live",
-                    fetch_links=True
-                )
-
-                if live:
-                    # ২. লাইভ সেশনের লাইক বাড়ানো (Atomic update)
-                    if str(live.host.id) != str(current_user.id):
-                        await live.update({"$inc": {"total_like": 1}})
-
-                        # ৩. হোস্টের প্রোফাইলে লাইক বাড়ানো
-                        # নোট: fetch_links=True থাকায় live.host.id সরাসরি কাজ করবে
-                        if live.host:
-                            # এখানে সরাসরি কালেকশন নেম ইউজ না করে সোর্স থেকে সার্চ করা নিরাপদ
-                            from eron.users.models.user_models import UserModel as UserClass
-                            await UserClass.find_one({"_id": live.host.id}).update(
-                                {"$inc": {"total_like": 1}}
+                # --- ১. লাইভ শুরু করা (সংশোধিত) ---
+                if action == "start_live":
+                    if conn.channel: continue
+
+                    channel_name = f"live_{user_id}_{int(time.time())}"
+
+                    # হোস্টের টোকেন (UID ১), আর ভিউয়ারদের টোকেন এখনই একবার বানিয়ে রাখা
+                    agora_token, host_uid, token_expires_at = agora_tokens.get(channel_name, "host", reason="start")
+                    agora_tokens.get(channel_name, "viewer", reason="start")
+
+                    new_live = LiveStreamModel(
+                        host=current_user,
+                        agora_channel_name=channel_name,
+                        is_premium=data.is_premium,
+                        entry_fee=data.entry_fee,
+                        status="live"
+                    )
+                    await trace.timed("db.insert_live", new_live.insert())
+                    active_lives_feed.invalidate()
+
+                    await trace.timed("broadcast.join", livestream_manager.connect_to_room(conn, channel_name, "host"))
+
+                    # ফ্রন্টএন্ডে uid পাঠিয়ে দেওয়া হচ্ছে যাতে অ্যাপ ঐ UID দিয়ে জয়েন করে
+                    await send_message(websocket, {
+                        "event": "live_started",
+                        "channel_name": channel_name,
+                        "agora_token": agora_token,
+                        "uid": host_uid,
+                        "token_expires_at": token_expires_at,
+                        "seq": livestream_manager.logs.get(channel_name).seq,
+                        "resume_token": issue_resume_token(user_id, channel_name, "host")
+                    })
+
+
+                elif action == "join_live":
+                    channel_name = data.channel_name
+                    live = await trace.timed("db.find_live", LiveStreamModel.find_one(
+                        LiveStreamModel.agora_channel_name == channel_name,
+                        LiveStreamModel.status == "live",
+                        fetch_links=True
+                    ))
+
+                    if not live:
+                        await send_message(websocket, {"event": "error", "message": "Live session not found"})
+                        continue
+
+                    # ১. আগে জয়েন করেছে কি না চেক করুন
+                    already_joined = await trace.timed("db.find_viewer", LiveViewerModel.find_one({
+                        "session.$id": live.id,
+                        "user.$id": current_user.id
+                    }))
+                    # ২. পেমেন্ট লজিক (যদি আগে জয়েন না করে থাকে)
+                    if not already_joined:
+                        # প্রিমিয়াম লাইভ এবং ইউজার নিজে হোস্ট না হলে কয়েন কাটবে
+                        if live.is_premium and live.entry_fee > 0 and str(live.host.id) != str(current_user.id):
+
+                            # ব্যালেন্স চেক (Atomic ভাবে লেটেস্ট ডাটা দেখা)
+                            if current_user.coins < live.entry_fee:
+                                await send_message(websocket, {"event": "error", "message": "আপনার পর্যাপ্ত কয়েন নেই!"})
+                                continue
+
+                            # --- ATOMIC UPDATE (Safe for Standalone Server) ---
+                            # ইউজারের কয়েন কমানো
+                            await trace.timed("db.charge_viewer", current_user.update({"$inc": {"coins": -live.entry_fee}}))
+
+                            # হোস্টের কয়েন বাড়ানো (সরাসরি হোস্টের ID দিয়ে আপডেট)
+                            # আপনার প্রোজেক্টের UserModel ইম্পোর্ট নিশ্চিত করুন
+                            from eron.users.models.user_models import UserModel
+                            await trace.timed("db.inc_host", UserModel.find_one({"_id": live.host.id}).update(
+                                {"$inc": {"coins": live.entry_fee}}
+                            ))
+                            # query update, UserModel-এর হুক চলে না
+                            profile_cache.invalidate(live.host.id)
+
+                            # ভিউয়ার রেকর্ড সেভ (যাতে পুনরায় কয়েন না কাটে)
+                            new_viewer = LiveViewerModel(
+                                session=live, user=current_user, fee_paid=live.entry_fee
                             )
-
-                        # ৪. লাইক সংখ্যা আপডেট করে রেসপন্স পাঠানো
-                        updated_likes = live.total_like + 1
-                        response_data = {
-                            "event": "new_like",
-                            "total_likes": updated_likes
+                            await trace.timed("db.insert_viewer", new_viewer.insert())
+
+                            await trace.timed("db.inc_live", live.update({"$inc": {"earn_coins": live.entry_fee}}))
+                            leaderboards.record(live.host.id, "coins", live.entry_fee)
+
+
+                            await trace.timed("broadcast", livestream_manager.broadcast(channel_name, {
+                                "event": "earning_update",
+                                "total_earned": live.earn_coins
+                            }))
+
+                            # current_user.update() লোকাল কয়েনও নতুন ডকুমেন্ট থেকে নেয়; এখানে আবার
+                            # কমালে পরের save_changes() দ্বিতীয়বার $inc পাঠিয়ে ফি দুবার কাটবে
+                        else:
+                            # ফ্রি লাইভ বা হোস্ট হলে সরাসরি রেকর্ড
+                            new_viewer = LiveViewerModel(session=live, user=current_user, fee_paid=0)
+                            await trace.timed("db.insert_viewer", new_viewer.insert())
+
+                    # ৩. লাইভ ভিউ বাড়ানো এবং জয়েন করা
+                    await trace.timed("db.inc_live", live.update({"$inc": {"total_views": 1}}))
+                    leaderboards.record(live.host.id, "views")
+                    await trace.timed("broadcast.join", livestream_manager.connect_to_room(conn, channel_name, "viewer"))
+
+                    # চ্যানেলের সব ভিউয়ার একই টোকেন পায়, ক্যাশ থেকে
+                    viewer_token, viewer_uid, token_expires_at = agora_tokens.get(channel_name, "viewer")
+
+
+
+                    await send_message(websocket, {
+                        "event": "joined_success",
+                        "channel": channel_name,
+                        "agora_token": viewer_token,
+                        "uid": viewer_uid,
+                        "token_expires_at": token_expires_at,
+                       ## "new_balance": current_user.coins
+                        "total_earned": live.earn_coins,
+                        "seq": livestream_manager.logs.get(channel_name).seq,
+                        "resume_token": issue_resume_token(user_id, channel_name, "viewer")
+                    })
+
+                elif action == "send_like":
+                    ch_name = data.channel_name
+
+                    # ১. লাইভ অবজেক্ট ফেচ করা
+                    live = await trace.timed("db.find_live", LiveStreamModel.find_one(
+                        LiveStreamModel.agora_channel_name == ch_name,
+                        LiveStreamModel.status == "live",
+                        fetch_links=True
+                    ))
+
+                    if live:
+                        # ২. লাইভ সেশনের লাইক বাড়ানো (Atomic update)
+                        if str(live.host.id) != str(current_user.id):
+                            await trace.timed("db.inc_live", live.update({"$inc": {"total_like": 1}}))
+                            leaderboards.record(live.host.id, "likes")
+
+                            # ৩. হোস্টের প্রোফাইলে লাইক বাড়ানো
+                            # নোট: fetch_links=True থাকায় live.host.id সরাসরি কাজ করবে
+                            if live.host:
+                                # এখানে সরাসরি কালেকশন নেম ইউজ না করে সোর্স থেকে সার্চ করা নিরাপদ
+                                from eron.users.models.user_models import UserModel as UserClass
+                                await trace.timed("db.inc_host", UserClass.find_one({"_id": live.host.id}).update(
+                                    {"$inc": {"total_like": 1}}
+                                ))
+                                profile_cache.invalidate(live.host.id)
+
+                            # ৪. লাইক সংখ্যা আপডেট করে রেসপন্স পাঠানো
+                            updated_likes = live.total_like + 1
+                            response_data = {
+                                "event": "new_like",
+                                "total_likes": updated_likes
+                            }
+
+                            # নিজের কাছে কনফার্মেশন পাঠানো
+                            await send_message(websocket, response_data)
+
+                            # রুমে থাকা সবাইকে জানানো
+                            await trace.timed("broadcast", livestream_manager.broadcast(ch_name, response_data))
+                    else:
+                        await send_message(websocket, {"event": "error", "message": "Live session not found"})
+
+
+                elif action == "send_comment":
+                    ch_name = data.channel_name
+                    content = data.message
+
+                    if not content:
+                        await send_message(websocket, {"event": "error", "message": "Channel name or message missing"})
+                        continue
+
+                    # ১. লাইভ সেশন খুঁজে বের করা
+                    live = await trace.timed("db.find_live", LiveStreamModel.find_one(
+                        LiveStreamModel.agora_channel_name == ch_name,
+                        LiveStreamModel.status == "live"
+                    ))
+
+                    if live:
+                        # ২. ডাটাবেসে কমেন্ট সেভ
+                        # দ্রষ্টব্য: এখানে live অবজেক্টটি সরাসরি পাস করলেই Beanie লিঙ্ক তৈরি করে নেয়
+                        new_comment = LiveCommentModel(session=live, user=current_user, content=content)
+                        await trace.timed("db.insert_comment", new_comment.insert())
+
+                        # ৩. টোটাল কমেন্ট সংখ্যা আপডেট (Atomic Update)
+                        await trace.timed("db.inc_live", live.update({"$inc": {"total_comment": 1}}))
+
+                        # ৪. ব্রডকাস্ট ডাটা তৈরি
+                        comment_payload = {
+                            "event": "new_comment",
+                            "user": {
+                                "id": str(current_user.id),
+                                "name": f"{current_user.first_name or ''} {current_user.last_name or ''}".strip(),
+                                "avatar": current_user.profile_image
+                            },
+                            "message": content,
+                            "total_comments": live.total_comment + 1
                         }
 
-                        # নিজের কাছে কনফার্মেশন পাঠানো
-                        await websocket.send_json(response_data)
-
-                        # রুমে থাকা সবাইকে জানানো
-                        await livestream_manager.broadcast(ch_name, response_data)
-                else:
-                    await websocket.send_json({"event": "error", "message": "Live session not found"})
-
-
-            elif action == "send_comment":
-                ch_name = data.get("channel_name")
-                content = data.get("message", "").strip()
-
-                if not ch_name or not content:
-                    await websocket.send_json({"event": "error", "message": "Channel name or message missing"})
-                    continue
+                        # ৫. নিজের কাছে সরাসরি রেসপন্স পাঠান (নিশ্চিত হওয়ার জন্য)
+                        #await send_message(websocket, comment_payload)
 
-                # ১. লাইভ সেশন খুঁজে বের করা
-                live = await LiveStreamModel.find_one(
-                    LiveStreamModel.agora_channel_name == ch_name,
-                    LiveStreamModel.status == "live"
-                )
-
-                if live:
-                    # ২. ডাটাবেসে কমেন্ট সেভ
-                    # দ্রষ্টব্য: এখানে live অবজেক্টটি সরাসরি পাস করলেই Beanie লিঙ্ক তৈরি করে নেয়
-                    new_comment = LiveCommentModel(session=live, user=current_user, content=content)
-                    await new_comment.insert()
-
-                    # ৩. টোটাল কমেন্ট সংখ্যা আপডেট (Atomic Update)
-                    await live.update({"$inc": {"total_comment": 1}})
-
-                    # ৪. ব্রডকাস্ট ডাটা তৈরি
-                    comment_payload = {
-                        "event": "new_comment",
-                        "user": {
-                            "id": str(current_user.id),
-                            "name": f"{current_user.first_name or ''} {current_user.last_name or ''}".strip(),
-                            "avatar": current_user.profile_image
-                        },
-                        "message": content,
-                        "total_comments": live.total_comment + 1
-                    }
-
-                    # ৫. নিজের কাছে সরাসরি রেসপন্স পাঠান (নিশ্চিত হওয়ার জন্য)
-                    #await websocket.send_json(comment_payload)
-
-                    # ৬. রুমে থাকা বাকি সবাইকে পাঠানো
-                    await livestream_manager.broadcast(ch_name, comment_payload)
-                else:
-                    await websocket.send_json({"event": "error", "message": "Live session not found for " + ch_name})
-
-            elif action == "end_live":
-                ch_name = data.get("channel_name")
-
-                # লাইভ সেশনটি খুঁজে বের করা
-                live = await LiveStreamModel.find_one(
-                    LiveStreamModel.agora_channel_name == ch_name,  # এখানে ch_name ব্যবহার করুন
-                    LiveStreamModel.status == "live",
-                    fetch_links=True
-                )
-
-                if live:
-                    # fetch_links=True থাকায় live.host সরাসরি UserModel অবজেক্ট
-                    # তাই সরাসরি ID তুলনা করা সবচেয়ে নিরাপদ
-                    if str(live.host.id) == str(current_user.id):
-                        live.status = "ended"
-                        live.end_time = datetime.now(timezone.utc)
-                        await live.save()
-
-                        # রুমে থাকা সবাইকে জানানো
-                        await livestream_manager.broadcast(ch_name, {
-                            "event": "live_ended",
-                            "channel_name": ch_name,
-                            "message": "The host has ended the live stream."
-                        })
-
-                        # হোস্টের কানেকশন ক্লোজ করা
-                        await livestream_manager.disconnect_from_room(websocket, ch_name)
-                        current_channel = None
+                        # ৬. রুমে থাকা বাকি সবাইকে পাঠানো
+                        await trace.timed("broadcast", livestream_manager.broadcast(ch_name, comment_payload))
+                    else:
+                        await send_message(websocket, {"event": "error", "message": "Live session not found for " + ch_name})
+
+                elif action == "renew_token":
+                    # ডাটাবেসে না গিয়ে কানেকশনের রুম ও রোল থেকেই নতুন টোকেন
+                    if not conn.channel:
+                        AGORA_TOKEN_RENEWALS.inc(outcome="not_in_room")
+                        await send_message(websocket, {"event": "error", "message": "Join a live before renewing its token"})
+                        continue
+                    agora_token, uid, token_expires_at = agora_tokens.get(conn.channel, conn.role, reason="renew")
+                    AGORA_TOKEN_RENEWALS.inc(outcome="renewed")
+                    await send_message(websocket, {
+                        "event": "token_renewed",
+                        "channel": conn.channel,
+                        "agora_token": agora_token,
+                        "uid": uid,
+                        "token_expires_at": token_expires_at
+                    })
+
+                elif action == "end_live":
+                    ch_name = data.channel_name
+
+                    # লাইভ সেশনটি খুঁজে বের করা
+                    live = await trace.timed("db.find_live", LiveStreamModel.find_one(
+                        LiveStreamModel.agora_channel_name == ch_name,  # এখানে ch_name ব্যবহার করুন
+                        LiveStreamModel.status == "live",
+                        fetch_links=True
+                    ))
+
+                    if live:
+                        # fetch_links=True থাকায় live.host সরাসরি UserModel অবজেক্ট
+                        # তাই সরাসরি ID তুলনা করা সবচেয়ে নিরাপদ
+                        if str(live.host.id) == str(current_user.id):
+                            live.status = "ended"
+                            live.end_time = datetime.now(timezone.utc)
+                            await trace.timed("db.end_live", live.save_changes())
+                            active_lives_feed.invalidate()
+
+                            # রুমে থাকা সবাইকে জানানো
+                            await trace.timed("broadcast", livestream_manager.broadcast(ch_name, {
+                                "event": "live_ended",
+                                "channel_name": ch_name,
+                                "message": "The host has ended the live stream."
+                            }))
+
+                            # রুমের সবাইকে (হোস্টসহ) রুম থেকে বের করা
+                            livestream_manager.close_room(ch_name)
+                        else:
+                            await send_message(websocket, {"event": "error", "message": "You are not the host of this live."})
                     else:
-                        await websocket.send_json({"event": "error", "message": "You are not the host of this live."})
-                else:
-                    await websocket.send_json({"event": "error", "message": "Active live session not found."})
+                        await send_message(websocket, {"event": "error", "message": "Active live session not found."})
+            finally:
+                frame_tracer.finish(trace)
 
-    except WebSocketDisconnect:
+    except WebSocketDisconnect as e:
+        current_channel = conn.channel
         if current_channel:
-            await livestream_manager.disconnect_from_room(websocket, current_channel)
+            await livestream_manager.disconnect_from_room(conn)
+            # 1012: this worker is restarting, the host will resume on another one
+            if e.code == status.WS_1012_SERVICE_RESTART:
+                return
             live = await LiveStreamModel.find_one(LiveStreamModel.agora_channel_name == current_channel)
 
             if live and str(live.host.ref.id) == user_id:
                 live.status = "ended"
                 live.end_time = datetime.now(timezone.utc)
-                await live.save()
+                await live.save_changes()
+                active_lives_feed.invalidate()
                 await livestream_manager.broadcast(current_channel, {"event": "live_ended"})
+                livestream_manager.close_room(current_channel)
+    finally:
+        livestream_manager.release_host(conn)
+        livestream_manager.registry.unregister(conn)
 
 
 
@@ -328,20 +494,27 @@ async def live_websocket_endpoint(websocket: WebSocket, token: str = Query(...))
 
 
 @router.get("/active", response_model=List[dict])
-async def get_active_lives():
+async def get_active_lives(request: Request, loader: LinkLoader = Depends(get_link_loader)):
+    return await active_lives_feed.response(request, "all", lambda: _active_lives(loader))
+
+
+async def _active_lives(loader: LinkLoader) -> List[dict]:
     active_lives = await LiveStreamModel.find(
-        LiveStreamModel.status == "live",
-        fetch_links=True  # Performance optimized
+        LiveStreamModel.status == "live"
     ).to_list()
 
+    # সব হোস্টকে একটি $in কুয়েরিতে আনা
+    hosts = await loader.resolve(active_lives, "host", projection_model=UserCard)
+
     response_data = []
     for live in active_lives:
+        host = hosts.get(link_id(live.host))
         response_data.append({
             "id": str(live.id),
             "host": {
-                "id": str(live.host.id),
-                "name": live.host.first_name,
-                "avatar": getattr(live.host, 'profile_image', None)
+                "id": str(link_id(live.host)),
+                "name": host.first_name if host else None,
+                "avatar": host.profile_image if host else None
             },
             "channel_name": live.agora_channel_name,
             "is_premium": live.is_premium,
@@ -355,30 +528,62 @@ async def get_active_lives():
 
 
 
+@router.get("/leaderboard/{metric}", response_model=List[dict])
+async def get_leaderboard(
+        metric: Literal["likes", "views", "coins"],
+        period: Literal["daily", "weekly", "all_time"] = "weekly",
+        limit: int = Query(10, ge=1, le=100),
+        loader: LinkLoader = Depends(get_link_loader)
+):
+    """
+    Top hosts by likes, views or coins earned today (UTC), this ISO week or
+    of all time.
+    """
+    # মেমরির র‍্যাংকিং থেকে, লাইভ কালেকশনে কোনো সর্ট হয় না
+    top = leaderboards.top(metric, period, limit)
+    cards = await loader.load_many(UserModel, [UUID(host) for host, _ in top], UserCard)
+    return [
+        {"rank": position, "host": cards.get(UUID(host)), "score": score}
+        for position, (host, score) in enumerate(top, start=1)
+    ]
+
+
+@router.get("/leaderboard/{metric}/rank/{host_id}")
+async def get_leaderboard_rank(
+        metric: Literal["likes", "views", "coins"],
+        host_id: UUID,
+        period: Literal["daily", "weekly", "all_time"] = "weekly",
+):
+    rank, score = leaderboards.rank(metric, period, host_id)
+    return {"host_id": host_id, "rank": rank, "score": score}
+
+
 @router.get("/session/{session_id}/viewers", response_model=List[dict])
-async def get_live_viewers(session_id: UUID):
+async def get_live_viewers(session_id: UUID, loader: LinkLoader = Depends(get_link_loader)):
     """
-    একটি নির্দিষ্ট লাইভ সেশনের সকল ভিউয়ারদের তালিকা দেখার ফাংশন।
+    একটি নির্দিষ্ট লাইভ সেশনের সকল ভিউয়ারদের তালিকা দেখার ফাংশন।
     """
-    # ১. ওই সেশনের সকল ভিউয়ার খুঁজে বের করা (fetch_links=True ইউজারের ডাটা পাওয়ার জন্য)
+    # ১. ওই সেশনের সকল ভিউয়ার খুঁজে বের করা
     viewers = await LiveViewerModel.find(
-        {"session.$id": session_id},
-        fetch_links=True
+        {"session.$id": session_id}
     ).to_list()
 
     if not viewers:
         return []
 
-    # ২. ডাটাকে সুন্দরভাবে সাজিয়ে রিটার্ন করা
+    # ২. ভিউয়ারদের ইউজার কার্ড একবারে লোড করা
+    users = await loader.resolve(viewers, "user", projection_model=UserCard)
+
+    # ৩. ডাটাকে সুন্দরভাবে সাজিয়ে রিটার্ন করা
     viewer_list = []
     for viewer in viewers:
-        # যেহেতু user একটি Link, তাই viewer.user সরাসরি UserModel অবজেক্ট দিবে
-        user_data = viewer.user
+        user_data = users.get(link_id(viewer.user))
+        if user_data is None:
+            continue
         viewer_list.append({
             "user_id": user_data.id,
-            "full_name": user_data.full_name, # আপনার UserModel এ যে ফিল্ড আছে
-            "username": user_data.username,
-            "profile_pic": user_data.profile_pic if hasattr(user_data, 'profile_pic') else None,
+            "full_name": f"{user_data.first_name or ''} {user_data.last_name or ''}".strip(),
+            "profile_pic": user_data.profile_image,
             "joined_at": viewer.joined_at,
             "fee_paid": viewer.fee_paid
         })
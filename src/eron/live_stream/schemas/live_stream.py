@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, StringConstraints, TypeAdapter
+from typing import Annotated, Literal, Optional, Union
 from datetime import datetime
 from uuid import UUID
 
@@ -24,4 +24,43 @@ class LiveStreamResponse(BaseModel):
     start_time: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+
+# ---- WebSocket actions (/live/ws), selected by the "action" field ----
+
+class StartLiveAction(LiveStartRequest):
+    action: Literal["start_live"]
+
+
+class JoinLiveAction(LiveJoinRequest):
+    action: Literal["join_live"]
+
+
+class SendLikeAction(BaseModel):
+    action: Literal["send_like"]
+    channel_name: str = Field(..., min_length=1)
+
+
+class SendCommentAction(BaseModel):
+    action: Literal["send_comment"]
+    channel_name: str = Field(..., min_length=1)
+    message: Annotated[str, StringConstraints(strip_whitespace=True)] = ""
+
+
+class EndLiveAction(BaseModel):
+    action: Literal["end_live"]
+    channel_name: str = Field(..., min_length=1)
+
+
+class RenewTokenAction(BaseModel):
+    # for the room the connection is in, with the role it joined as
+    action: Literal["renew_token"]
+
+
+LiveAction = Annotated[
+    Union[StartLiveAction, JoinLiveAction, SendLikeAction, SendCommentAction, EndLiveAction, RenewTokenAction],
+    Field(discriminator="action"),
+]
+live_action_adapter = TypeAdapter(LiveAction)
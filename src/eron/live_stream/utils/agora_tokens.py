@@ -0,0 +1,72 @@
+import os
+import time
+from typing import Dict, Tuple
+from dotenv import load_dotenv
+from agora_token_builder import RtcTokenBuilder
+from agora_token_builder.RtcTokenBuilder import Role_Publisher, Role_Subscriber
+from eron.core.metrics.metrics import AGORA_TOKENS
+
+load_dotenv()
+
+APP_ID = os.getenv("AGORA_APP_ID")
+APP_CERTIFICATE = os.getenv("AGORA_APP_CERTIFICATE")
+# lifetime of a minted RTC token (seconds)
+AGORA_TOKEN_TTL = int(os.getenv("AGORA_TOKEN_TTL", "3600"))
+# a cached token is only handed out while it has at least this long left;
+# clients renew when Agora warns them (30s before expiry), well inside it
+AGORA_TOKEN_RENEW_SLACK = int(os.getenv("AGORA_TOKEN_RENEW_SLACK", "300"))
+
+# every host joins as uid 1, every viewer as uid 0 (one token per channel)
+HOST_UID = 1
+VIEWER_UID = 0
+ROLES = {"host": (HOST_UID, Role_Publisher), "viewer": (VIEWER_UID, Role_Subscriber)}
+
+
+class AgoraTokens:
+    """
+    RTC tokens per (channel, uid, role), minted once and reused until they
+    get within AGORA_TOKEN_RENEW_SLACK of expiring. Viewers all share uid 0,
+    so a channel's viewer token is minted once (when the live starts) and
+    served to every join and renewal from memory.
+    """
+
+    def __init__(self, ttl: int = AGORA_TOKEN_TTL, slack: int = AGORA_TOKEN_RENEW_SLACK):
+        self.ttl = ttl
+        self.slack = min(slack, ttl // 2)
+        # channel -> (uid, role) -> (token, expires at, unix time)
+        self._tokens: Dict[str, Dict[Tuple[int, int], Tuple[str, int]]] = {}
+
+    def get(self, channel_name: str, role: str, reason: str = "join") -> Tuple[str, int, int]:
+        """(token, uid, expires_at) for a "host" or "viewer" of the channel."""
+        uid, rtc_role = ROLES[role]
+        now = int(time.time())
+        channel = self._tokens.setdefault(channel_name, {})
+        cached = channel.get((uid, rtc_role))
+        if cached is not None and cached[1] - now > self.slack:
+            AGORA_TOKENS.inc(role=role, reason=reason, outcome="cached")
+            return cached[0], uid, cached[1]
+
+        expires_at = now + self.ttl
+        token = RtcTokenBuilder.buildTokenWithUid(APP_ID, APP_CERTIFICATE, channel_name, uid, rtc_role, expires_at)
+        channel[(uid, rtc_role)] = (token, expires_at)
+        AGORA_TOKENS.inc(role=role, reason=reason, outcome="minted")
+        return token, uid, expires_at
+
+    def drop(self, channel_name: str):
+        self._tokens.pop(channel_name, None)
+
+    def prune(self):
+        """Forget channels whose tokens have all expired (lives that ended on another worker)."""
+        now = int(time.time())
+        expired = [
+            name for name, tokens in self._tokens.items()
+            if all(expires_at <= now for _, expires_at in tokens.values())
+        ]
+        for name in expired:
+            del self._tokens[name]
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+
+agora_tokens = AgoraTokens()
@@ -0,0 +1,23 @@
+from typing import Dict, List
+from uuid import UUID
+from eron.core.aggregation.refs import group_by_ref
+from eron.live_stream.models.live_stream import LiveCommentModel, LiveViewerModel
+
+
+async def stream_counters(batch: List[dict]) -> Dict[UUID, Dict[str, int]]:
+    """
+    earn_coins and total_comment of each live session in `batch`, recounted
+    from its live_viewers and live_comments rows. total_views isn't here: it
+    counts joins, rejoins included, and live_viewers keeps one row per viewer.
+    """
+    ids = [doc["_id"] for doc in batch]
+    coins = await group_by_ref(LiveViewerModel, "session", ids, "$fee_paid")
+    comments = await group_by_ref(LiveCommentModel, "session", ids)
+
+    return {
+        doc["_id"]: {
+            "earn_coins": coins.get(doc["_id"], 0),
+            "total_comment": comments.get(doc["_id"], 0),
+        }
+        for doc in batch
+    }
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from eron.core.leaderboard.ranked_set import RankedSet
+from eron.live_stream.models.leaderboard import LeaderboardScoreModel
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("likes", "views", "coins")
+PERIODS = ("daily", "weekly", "all_time")
+
+# how often the in-memory boards are written out and the other workers' read back
+LEADERBOARD_CHECKPOINT_INTERVAL = float(os.getenv("LEADERBOARD_CHECKPOINT_INTERVAL", "5"))
+# checkpoints are re-read this far back, covers clock skew between workers
+LEADERBOARD_SYNC_OVERLAP = 5.0
+# closed daily/weekly boards are kept this long for history
+_RETENTION = {"daily": timedelta(days=35), "weekly": timedelta(weeks=53)}
+
+
+def period_key(period: str, at: datetime) -> str:
+    if period == "daily":
+        return at.strftime("%Y-%m-%d")
+    if period == "weekly":
+        year, week, _ = at.isocalendar()
+        return f"{year}-W{week:02d}"
+    return "all"
+
+
+def board_name(metric: str, period: str, at: datetime) -> str:
+    return f"{metric}:{period}:{period_key(period, at)}"
+
+
+def _expires_at(period: str, at: datetime) -> Optional[datetime]:
+    retention = _RETENTION.get(period)
+    return at + retention if retention else None
+
+
+class Leaderboards:
+    """
+    Daily, weekly and all-time host rankings by likes, views and coins
+    earned. Increments land in in-memory ranked sets at the same time as the
+    counter $inc; every LEADERBOARD_CHECKPOINT_INTERVAL the deltas are
+    $inc-ed into leaderboard_scores and the scores other workers wrote are
+    read back, so every worker converges on the same boards.
+    """
+
+    def __init__(self):
+        self._boards: Dict[str, RankedSet] = {}
+        # (board, host) -> increments not checkpointed yet
+        self._pending: Dict[Tuple[str, str], int] = {}
+        self._synced_at: Optional[datetime] = None
+
+    def _current(self, now: Optional[datetime] = None) -> List[str]:
+        now = now or datetime.now(timezone.utc)
+        return [board_name(metric, period, now) for metric in METRICS for period in PERIODS]
+
+    def _board(self, name: str) -> RankedSet:
+        board = self._boards.get(name)
+        if board is None:
+            board = self._boards[name] = RankedSet()
+        return board
+
+    def record(self, host_id, metric: str, amount: int = 1):
+        if not amount:
+            return
+        host = str(host_id)
+        now = datetime.now(timezone.utc)
+        for period in PERIODS:
+            name = board_name(metric, period, now)
+            self._board(name).add(host, amount)
+            self._pending[(name, host)] = self._pending.get((name, host), 0) + amount
+
+    def top(self, metric: str, period: str, n: int) -> List[Tuple[str, int]]:
+        board = self._boards.get(board_name(metric, period, datetime.now(timezone.utc)))
+        return board.top(n) if board is not None else []
+
+    def rank(self, metric: str, period: str, host_id) -> Tuple[Optional[int], int]:
+        """1-based rank and score of a host, (None, 0) if it has none yet."""
+        board = self._boards.get(board_name(metric, period, datetime.now(timezone.utc)))
+        host = str(host_id)
+        if board is None or host not in board:
+            return None, 0
+        return board.rank(host) + 1, board.score(host)
+
+    async def load(self):
+        """Read the current boards, at startup."""
+        started = datetime.now(timezone.utc)
+        cursor = LeaderboardScoreModel.get_motor_collection().find(
+            {"board": {"$in": self._current(started)}}, projection={"board": 1, "host": 1, "score": 1}
+        )
+        async for doc in cursor:
+            self._board(doc["board"]).set(str(doc["host"]), doc["score"])
+        self._synced_at = started
+
+    async def checkpoint(self):
+        collection = LeaderboardScoreModel.get_motor_collection()
+        now = datetime.now(timezone.utc)
+        if self._pending:
+            pending, self._pending = self._pending, {}
+            try:
+                await collection.bulk_write([
+                    UpdateOne(
+                        {"_id": f"{board}:{host}"},
+                        {
+                            "$inc": {"score": delta},
+                            "$set": {"updated_at": now},
+                            "$setOnInsert": {
+                                "board": board,
+                                "host": UUID(host),
+                                "expires_at": _expires_at(board.split(":")[1], now),
+                            },
+                        },
+                        upsert=True,
+                    )
+                    for (board, host), delta in pending.items()
+                ], ordered=False)
+            except PyMongoError:
+                # kept for the next checkpoint, the in-memory boards already have them
+                for key, delta in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + delta
+                logger.warning("could not checkpoint %d leaderboard scores", len(pending), exc_info=True)
+                return
+
+        current = self._current(now)
+        since = (self._synced_at or now) - timedelta(seconds=LEADERBOARD_SYNC_OVERLAP)
+        try:
+            changed = await collection.find(
+                {"updated_at": {"$gte": since}, "board": {"$in": current}},
+                projection={"board": 1, "host": 1, "score": 1},
+            ).to_list(None)
+        except PyMongoError:
+            logger.warning("could not read leaderboard checkpoints", exc_info=True)
+            return
+        for doc in changed:
+            host = str(doc["host"])
+            # stored total plus what this worker counted since the flush above
+            self._board(doc["board"]).set(host, doc["score"] + self._pending.get((doc["board"], host), 0))
+        self._synced_at = now
+
+        # boards of closed periods are only kept in the collection
+        for name in [name for name in self._boards if name not in current]:
+            del self._boards[name]
+
+    async def run(self, interval: float = LEADERBOARD_CHECKPOINT_INTERVAL):
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await self.checkpoint()
+        finally:
+            await self.checkpoint()
+
+
+leaderboards = Leaderboards()
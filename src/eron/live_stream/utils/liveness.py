@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from eron.core.metrics.metrics import LIVE_SESSIONS_SWEPT
+from eron.live_stream.models.live_stream import LiveStreamModel
+from eron.live_stream.utils.counters import stream_counters
+
+logger = logging.getLogger(__name__)
+
+# seconds between heartbeat flushes (and stale sweeps)
+LIVE_HEARTBEAT_INTERVAL = float(os.getenv("LIVE_HEARTBEAT_INTERVAL", "15"))
+# a live whose host no worker has reported for this long is ended, 0 = never
+LIVE_STALE_AFTER = float(os.getenv("LIVE_STALE_AFTER", "120"))
+LIVE_SWEEP_BATCH_SIZE = int(os.getenv("LIVE_SWEEP_BATCH_SIZE", "200"))
+
+
+@dataclass
+class SweepStats:
+    scanned: int = 0
+    ended: int = 0
+    channels: List[str] = field(default_factory=list)
+
+
+async def sweep_stale_lives(
+        stale_after: float = LIVE_STALE_AFTER,
+        now: Optional[datetime] = None,
+        include_legacy: bool = False,
+        batch_size: int = LIVE_SWEEP_BATCH_SIZE,
+) -> SweepStats:
+    """
+    End lives whose last heartbeat is older than `stale_after` seconds: status,
+    end_time and the view/coin/comment counters (recomputed from their rows)
+    are written in one bulk_write per batch. Each write is guarded by the
+    heartbeat that was read, so a host that comes back in between keeps its
+    live. `include_legacy` also takes lives started before heartbeats
+    existed, by their start_time.
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(seconds=stale_after)
+    stale = {"last_heartbeat": {"$lt": cutoff}}
+    if include_legacy:
+        stale = {"$or": [stale, {"last_heartbeat": None, "start_time": {"$lt": cutoff}}]}
+
+    collection = LiveStreamModel.get_motor_collection()
+    stats = SweepStats()
+    while True:
+        batch = await collection.find(
+            {"status": "live", **stale},
+            projection={"agora_channel_name": 1, "last_heartbeat": 1},
+        ).limit(batch_size).to_list(None)
+        if not batch:
+            break
+        stats.scanned += len(batch)
+
+        counters = await stream_counters(batch)
+        result = await collection.bulk_write([
+            UpdateOne(
+                {"_id": doc["_id"], "status": "live", "last_heartbeat": doc.get("last_heartbeat")},
+                {"$set": {"status": "ended", "end_time": now, "updated_at": now, **counters[doc["_id"]]}},
+            )
+            for doc in batch
+        ], ordered=False)
+        stats.ended += result.modified_count
+        stats.channels.extend(doc["agora_channel_name"] for doc in batch)
+        # a guard that missed leaves the live out of the next find, so this ends
+        if len(batch) < batch_size:
+            break
+
+    if stats.ended:
+        LIVE_SESSIONS_SWEPT.inc(stats.ended)
+    return stats
+
+
+class LiveHeartbeats:
+    """
+    Lives whose host is connected to this worker. Nothing is written per
+    frame or per connection: every LIVE_HEARTBEAT_INTERVAL one update_many
+    stamps last_heartbeat on all of them, then stale lives (whose worker
+    died, or whose host socket went away without a close) are swept and the
+    tick listeners run.
+    """
+
+    def __init__(self):
+        # channel -> host connections on this worker
+        self._hosting: Dict[str, int] = {}
+        self._listeners: List[Callable[[List[str]], Awaitable[None]]] = []
+
+    def attach(self, channel_name: str):
+        self._hosting[channel_name] = self._hosting.get(channel_name, 0) + 1
+
+    def detach(self, channel_name: str):
+        count = self._hosting.get(channel_name, 0) - 1
+        if count > 0:
+            self._hosting[channel_name] = count
+        else:
+            self._hosting.pop(channel_name, None)
+
+    def on_tick(self, listener: Callable[[List[str]], Awaitable[None]]):
+        """Register `listener(swept_channels)`, run after every flush and sweep."""
+        self._listeners.append(listener)
+        return listener
+
+    async def flush(self):
+        if not self._hosting:
+            return
+        try:
+            await LiveStreamModel.get_motor_collection().update_many(
+                {"agora_channel_name": {"$in": list(self._hosting)}, "status": "live"},
+                {"$set": {"last_heartbeat": datetime.now(timezone.utc)}},
+            )
+        except PyMongoError:
+            # the next flush is well within LIVE_STALE_AFTER
+            logger.warning("could not write %d live heartbeats", len(self._hosting), exc_info=True)
+
+    async def tick(self):
+        await self.flush()
+        swept: List[str] = []
+        if LIVE_STALE_AFTER > 0:
+            try:
+                stats = await sweep_stale_lives()
+                swept = stats.channels
+                if stats.ended:
+                    logger.info("ended %d stale lives: %s", stats.ended, stats)
+            except PyMongoError:
+                logger.warning("stale live sweep failed", exc_info=True)
+        for listener in self._listeners:
+            try:
+                await listener(swept)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("live heartbeat listener failed")
+
+    async def run(self, interval: float = LIVE_HEARTBEAT_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            await self.tick()
+
+
+heartbeats = LiveHeartbeats()
@@ -1,4 +1,5 @@
 from fastapi import FastAPI
+from eron.core.logger.logger import setup_logging, RequestIdMiddleware
 from eron.db import lifespan
 from eron.core.exceptions_handler.global_exception_handler import global_exception_handler
 from eron.core.exceptions_handler.http_exception_handler import http_exception_handler
@@ -6,13 +7,18 @@ from starlette.exceptions import HTTPException as StarletteHTTPException
 from fastapi.staticfiles import StaticFiles
 import os
 from fastapi.middleware.cors import CORSMiddleware
+from eron.core.metrics.middleware import MetricsMiddleware, metrics_router
+from eron.core.metrics.tracing import debug_router
+from eron.core.compression.middleware import CompressionMiddleware
 
 from eron.users.routers.auth_routers import router as auth_router
 from eron.users.routers.user_routers import user_router
 from eron.users.routers.follow_routers import router as follow_router
 from eron.chats.routers.chat_routers import chat_router
 from eron.live_stream.routers.live_stream import router as livestream_router
+from eron.analytics.routers.analytics_routers import router as analytics_router
 
+setup_logging()
 
 app = FastAPI(
     title="Eron API",
@@ -34,6 +40,9 @@ origins = [
     "https://eron.mtscorporate.com",
 ]
 
+# innermost: compresses what the routes return, before CORS adds its headers
+app.add_middleware(CompressionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -42,6 +51,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(RequestIdMiddleware)
+
+# added last = outermost, so CORS preflights are timed as well
+app.add_middleware(MetricsMiddleware)
+
 
 @app.get("/")
 def read_root():
@@ -52,8 +66,11 @@ app.add_exception_handler(StarletteHTTPException, http_exception_handler)
 app.add_exception_handler(Exception, global_exception_handler)
 
 
+app.include_router(metrics_router)
+app.include_router(debug_router)
 app.include_router(auth_router,prefix="/api/v1")
 app.include_router(user_router,prefix="/api/v1")
 app.include_router(follow_router,prefix="/api/v1")
 app.include_router(chat_router, prefix="/api/v1")
 app.include_router(livestream_router, prefix="/api/v1")
+app.include_router(analytics_router, prefix="/api/v1")
@@ -0,0 +1,33 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+from uuid import UUID
+from beanie import Document
+from pydantic import BaseModel, Field
+
+
+class SuggestedUser(BaseModel):
+    # card fields are copied in so the endpoint reads one document
+    id: UUID
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    profile_image: Optional[str] = None
+    score: float
+    # followed by this many of the people the user follows
+    mutual: int = 0
+    # watched this many of the same live sessions
+    coviewed: int = 0
+
+
+class FollowSuggestionModel(Document):
+    """
+    Top "who to follow" candidates of one user, best first. Rebuilt by
+    eron.jobs.suggest_follows and adjusted on every follow/unfollow in
+    between, see eron.users.utils.suggestions.
+    """
+    # the user the suggestions are for
+    id: UUID = Field(alias="_id")
+    items: List[SuggestedUser] = []
+    computed_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    class Settings:
+        name = "follow_suggestions"
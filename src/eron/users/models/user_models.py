@@ -1,12 +1,20 @@
-from beanie import before_event, Replace, Save
+from beanie import after_event, before_event, Delete, Insert, Replace, Save, SaveChanges, Update
 from pydantic import EmailStr, Field
 from typing import Optional
 from datetime import datetime, timezone
 from eron.core.base.base import BaseCollection
+from eron.core.cache.response_cache import profile_cache
+from eron.core.cache.prefix_cache import fold, user_search_cache
+from eron.core.compression.precompressed import users_feed
 from eron.users.utils.account_status import AccountStatus
 from eron.users.utils.user_role import UserRole
-from typing import List
+from typing import List, ClassVar, FrozenSet
 from beanie import Link
+from pymongo import IndexModel
+
+# /users/search compares names at primary strength: case and accents are
+# ignored. Queries must pass the same collation to use these indexes.
+SEARCH_COLLATION = {"locale": "en", "strength": 1}
 
 class UserModel(BaseCollection):
 
@@ -36,11 +44,37 @@ class UserModel(BaseCollection):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+    increment_only_fields: ClassVar[FrozenSet[str]] = frozenset(
+        {"followers_count", "following_count", "total_like", "coins"}
+    )
+
     # Auto-update "updated_at" on update
-    @before_event([Save, Replace])
+    @before_event([Save, Replace, SaveChanges])
     def update_timestamp(self):
         self.updated_at = datetime.now(timezone.utc)
 
-    class Settings:
+    # save/save_changes go through update() too; dropped after the write so
+    # a concurrent read can't cache the old document again
+    @after_event([Update, Replace, Delete])
+    def invalidate_profile_cache(self):
+        profile_cache.invalidate(self.id)
+
+    @after_event([Insert, Update, Replace, Delete])
+    def invalidate_search_cache(self):
+        user_search_cache.invalidate(self.id, (fold(self.first_name), fold(self.last_name)))
+
+    # any write can move a user between /users/ pages or change what they show
+    @after_event([Insert, Update, Replace, Delete])
+    def invalidate_users_feed(self):
+        users_feed.invalidate()
+
+    class Settings(BaseCollection.Settings):
         name = "users"
+        indexes = [
+            # followers lookups: "who has me in their following array"
+            IndexModel([("following.$id", 1), ("_id", 1)]),
+            # name prefixes for /users/search
+            IndexModel([("first_name", 1), ("last_name", 1)], name="search_first_last", collation=SEARCH_COLLATION),
+            IndexModel([("last_name", 1), ("first_name", 1)], name="search_last_first", collation=SEARCH_COLLATION),
+        ]
 
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends,status
+from fastapi import APIRouter, HTTPException, Depends, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from eron.users.models.user_models import UserModel
 from eron.users.schemas.user_schemas import UserResponse, UserCreate, VerifyOTP, ResendOTPRequest, ResetPasswordRequest
@@ -7,6 +7,7 @@ from eron.users.utils.otp_generate import generate_otp
 from eron.users.utils.password import hash_password, verify_password
 from eron.users.utils.token_generate import create_access_token
 from eron.users.utils.user_role import UserRole
+from eron.core.ratelimit.limiter import client_ip, enforce_rate_limit
 import requests
 
 
@@ -75,7 +76,10 @@ async def verify_otp(user:VerifyOTP):
 
 # Login logic update
 @router.post("/login", status_code=status.HTTP_200_OK)
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(http_request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    # প্রতি ইমেইল ও প্রতি IP তে লগইন চেষ্টা সীমিত
+    await enforce_rate_limit("auth_ip", client_ip(http_request))
+    await enforce_rate_limit("login", form_data.username.lower())
     # Flexible query for email or phone
     db_user = await UserModel.find_one(
         UserModel.email == form_data.username
@@ -98,7 +102,9 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
 
 
 @router.post("/resend-otp", status_code=status.HTTP_200_OK)
-async def resend_otp(request: ResendOTPRequest):
+async def resend_otp(request: ResendOTPRequest, http_request: Request):
+    await enforce_rate_limit("auth_ip", client_ip(http_request))
+    await enforce_rate_limit("resend_otp", request.email.lower())
     db_user = await UserModel.find_one(UserModel.email == request.email)
     if db_user is None :
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="User not found")
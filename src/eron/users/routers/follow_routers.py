@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from bson import ObjectId
-from beanie import PydanticObjectId
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from uuid import UUID
+from beanie.operators import In
 from eron.users.utils.get_current_user import get_current_user
 from eron.users.models.user_models import UserModel
-from typing import List
+from eron.users.schemas.user_schemas import UserCard, UserCardPage, RelationshipLookupRequest, RelationshipStatus
+from eron.core.loader.link_loader import LinkLoader, get_link_loader, link_id
+from eron.core.cache.response_cache import profile_cache
+from eron.users.models.suggestion_models import FollowSuggestionModel, SuggestedUser
+from eron.users.utils.suggestions import SUGGESTIONS_TOP_K, update_after_follow
+from typing import List, Optional
 
 router = APIRouter(
     prefix="/social",
@@ -13,9 +18,9 @@ router = APIRouter(
 
 @router.post("/follow/{target_id}")
 async def follow_user(target_id: str, current_user: UserModel = Depends(get_current_user)):
-    # target_id কে PydanticObjectId তে রূপান্তর
+    # target_id কে UUID তে রূপান্তর
     try:
-        target_oid = PydanticObjectId(target_id)
+        target_oid = UUID(target_id)
     except:
         raise HTTPException(status_code=400, detail="Invalid User ID format")
 
@@ -36,8 +41,10 @@ async def follow_user(target_id: str, current_user: UserModel = Depends(get_curr
     current_user.following_count += 1
     target_user.followers_count += 1
 
-    await current_user.save()
-    await target_user.save()
+    # $push + $inc only, the rest of both documents is left alone
+    await current_user.save_changes()
+    await target_user.save_changes()
+    await update_after_follow(current_user, target_user, followed=True)
 
     return {"message": "Followed successfully"}
 
@@ -45,7 +52,7 @@ async def follow_user(target_id: str, current_user: UserModel = Depends(get_curr
 @router.post("/unfollow/{target_id}")
 async def unfollow_user(target_id: str, current_user: UserModel = Depends(get_current_user)):
     try:
-        target_oid = PydanticObjectId(target_id)
+        target_oid = UUID(target_id)
     except:
         raise HTTPException(status_code=400, detail="Invalid User ID format")
 
@@ -66,17 +73,21 @@ async def unfollow_user(target_id: str, current_user: UserModel = Depends(get_cu
     current_user.following_count = max(0, current_user.following_count - 1)
     target_user.followers_count = max(0, target_user.followers_count - 1)
 
-    await current_user.save()
-    await target_user.save()
+    await current_user.save_changes()
+    await target_user.save_changes()
+    await update_after_follow(current_user, target_user, followed=False)
 
     return {"status": "success", "message": f"Unfollowed {target_user.first_name}"}
 
 
 @router.get("/me/following-list")
-async def get_my_following(current_user: UserModel = Depends(get_current_user)):
-    # fetch_links=True সরাসরি রিলেটেড ডাটা নিয়ে আসে
-    user = await UserModel.find_one(UserModel.id == current_user.id, fetch_links=True)
-    return user.following
+async def get_my_following(
+        current_user: UserModel = Depends(get_current_user),
+        loader: LinkLoader = Depends(get_link_loader)
+):
+    # ফলো করা ইউজারদের একটি $in কুয়েরিতে কম্প্যাক্ট কার্ড হিসেবে আনা
+    users = await loader.resolve([current_user], "following", projection_model=UserCard)
+    return [user for user in users.values() if user is not None]
 
 
 @router.get("/active-priority-list")
@@ -103,12 +114,124 @@ async def get_my_followers(current_user: UserModel = Depends(get_current_user)):
     লজিক: এমন ইউজারদের খুঁজে বের করো যাদের 'following' লিস্টে আপনার ID আছে।
     """
     followers = await UserModel.find(
-        UserModel.following.id == current_user.id
+        UserModel.following.id == current_user.id,
+        projection_model=UserCard
     ).to_list()
 
     return followers
 
 
+def parse_cursor(cursor: Optional[str]) -> Optional[UUID]:
+    if cursor is None:
+        return None
+    try:
+        return UUID(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/me/following", response_model=UserCardPage)
+async def get_my_following_page(
+        cursor: Optional[str] = None,
+        limit: int = Query(20, ge=1, le=100),
+        current_user: UserModel = Depends(get_current_user),
+        loader: LinkLoader = Depends(get_link_loader)
+):
+    """
+    যাদের ফলো করছেন তাদের কার্ড, নতুন ফলো আগে। `next_cursor` দিয়ে পরের পেজ।
+    """
+    # following লিস্ট current_user এর সাথেই আসে, তাই পেজিং মেমরিতে
+    following_ids = [link_id(link) for link in reversed(current_user.following)]
+
+    start = 0
+    after = parse_cursor(cursor)
+    if after is not None:
+        if after not in following_ids:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        start = following_ids.index(after) + 1
+
+    page_ids = following_ids[start:start + limit]
+    cards = await loader.load_many(UserModel, page_ids, UserCard)
+    has_more = start + limit < len(following_ids)
+
+    return UserCardPage(
+        items=[card for card in cards.values() if card is not None],
+        next_cursor=str(page_ids[-1]) if has_more and page_ids else None
+    )
+
+
+@router.get("/me/followers", response_model=UserCardPage)
+async def get_my_followers_page(
+        cursor: Optional[str] = None,
+        limit: int = Query(20, ge=1, le=100),
+        current_user: UserModel = Depends(get_current_user)
+):
+    """
+    আপনার ফলোয়ারদের কার্ড, _id অনুযায়ী সাজানো। `next_cursor` দিয়ে পরের পেজ।
+    """
+    query = UserModel.find(UserModel.following.id == current_user.id)
+    after = parse_cursor(cursor)
+    if after is not None:
+        query = query.find(UserModel.id > after)
+
+    # একটি বেশি এনে দেখা পরের পেজ আছে কি না
+    cards = await query.sort(+UserModel.id).limit(limit + 1).project(UserCard).to_list()
+    has_more = len(cards) > limit
+    cards = cards[:limit]
+
+    return UserCardPage(
+        items=cards,
+        next_cursor=str(cards[-1].id) if has_more else None
+    )
+
+
+@router.post("/relationships", response_model=List[RelationshipStatus])
+async def get_relationships(
+        request: RelationshipLookupRequest,
+        current_user: UserModel = Depends(get_current_user)
+):
+    """
+    একসাথে অনেক ইউজারের ফলো স্ট্যাটাস: আপনি তাকে ফলো করেন কি না এবং সে আপনাকে ফলো করে কি না।
+    """
+    user_ids = list(dict.fromkeys(request.user_ids))
+    following_ids = {link_id(link) for link in current_user.following}
+
+    # একটি কুয়েরিতেই দেখা এদের মধ্যে কারা আপনাকে ফলো করে
+    followed_by = await UserModel.find(
+        In(UserModel.id, user_ids),
+        UserModel.following.id == current_user.id,
+        projection_model=UserCard
+    ).to_list()
+    followed_by_ids = {user.id for user in followed_by}
+
+    return [
+        RelationshipStatus(
+            user_id=user_id,
+            is_following=user_id in following_ids,
+            is_followed_by=user_id in followed_by_ids
+        )
+        for user_id in user_ids
+    ]
+
+
+@router.get("/me/suggestions", response_model=List[SuggestedUser])
+async def get_follow_suggestions(
+        limit: int = Query(20, ge=1, le=SUGGESTIONS_TOP_K),
+        current_user: UserModel = Depends(get_current_user)
+):
+    """
+    "Who to follow": people followed by the users you follow and people who
+    watch the same lives, best match first.
+    """
+    # আগে থেকে হিসাব করা লিস্ট, একটি _id রিড
+    stored = await FollowSuggestionModel.get(current_user.id)
+    if stored is None:
+        return []
+    # the list can predate a follow made from another device
+    following_ids = {link_id(link) for link in current_user.following}
+    return [item for item in stored.items if item.id not in following_ids][:limit]
+
+
 @router.get("/me/counts")
 async def get_social_counts(current_user: UserModel = Depends(get_current_user)):
     """
@@ -122,18 +245,22 @@ async def get_social_counts(current_user: UserModel = Depends(get_current_user))
 
 # আপনি চাইলে নির্দিষ্ট কোনো ইউজারের আইডি দিয়েও তার কাউন্ট দেখতে পারেন
 @router.get("/{user_id}/stats")
-async def get_user_stats(user_id: str):
+async def get_user_stats(user_id: str, request: Request):
     try:
-        user_oid = PydanticObjectId(user_id)
+        user_oid = UUID(user_id)
     except:
         raise HTTPException(status_code=400, detail="Invalid User ID format")
 
-    user = await UserModel.get(user_oid)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    async def build():
+        user = await UserModel.get(user_oid)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
 
-    return {
-        "username": f"{user.first_name} {user.last_name}",
-        "follower_count": user.followers_count,
-        "following_count": user.following_count
-    }
\ No newline at end of file
+        return {
+            "username": f"{user.first_name} {user.last_name}",
+            "follower_count": user.followers_count,
+            "following_count": user.following_count
+        }
+
+    # প্রোফাইল কার্ডের সাথে একই ক্যাশ, ফলো/আনফলোতে ইনভ্যালিডেট হয়
+    return await profile_cache.response(request, "stats", user_id, build)
\ No newline at end of file
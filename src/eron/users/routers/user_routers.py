@@ -1,47 +1,69 @@
 
-from fastapi import APIRouter, HTTPException, status,Depends
+from fastapi import APIRouter, HTTPException, Query, Request, status,Depends
 from typing import List
+from eron.core.compression.precompressed import users_feed
+from eron.core.cache.response_cache import profile_cache
+from eron.core.ratelimit.limiter import enforce_rate_limit
 from eron.users.models.user_models import UserModel
-from eron.users.schemas.user_schemas import UserResponse
+from eron.users.schemas.user_schemas import UserCard, UserResponse
 from eron.users.utils.get_current_user import get_current_user
+from eron.users.utils.user_search import USER_SEARCH_FETCH, search_users
 
 # Define the router for User Management
 user_router = APIRouter(prefix="/users", tags=["Users"])
 
 
 @user_router.get("/", response_model=List[UserResponse], status_code=status.HTTP_200_OK)
-async def get_all_users(skip: int = 0, limit: int = 20):
+async def get_all_users(request: Request, skip: int = 0, limit: int = 20):
     """
     Retrieve a list of all users with pagination.
 
     - **skip**: Number of records to skip (default is 0)
     - **limit**: Maximum number of records to return (default is 20)
     """
-    # Fetch users sorted by creation date (newest first)
-    users = await UserModel.find_all().sort("-created_at").skip(skip).limit(limit).to_list()
-    return users
-
-
+    async def build():
+        # Fetch users sorted by creation date (newest first)
+        users = await UserModel.find_all().sort("-created_at").skip(skip).limit(limit).to_list()
+        return [UserResponse.model_validate(user) for user in users]
 
+    # served from a short-lived, precompressed copy per page
+    return await users_feed.response(request, (skip, limit), build)
 
 
+@user_router.get("/search", response_model=List[UserCard], status_code=status.HTTP_200_OK)
+async def search_user_cards(
+        q: str = Query(..., min_length=1, max_length=100),
+        limit: int = Query(10, ge=1, le=USER_SEARCH_FETCH),
+        current_user: UserModel = Depends(get_current_user),
+):
+    """
+    Typeahead search: users whose first or last name starts with `q`,
+    case and accents ignored. "ada lov" also finds Ada Lovelace.
+    """
+    # প্রতি কীস্ট্রোকে একটা রিকোয়েস্ট, বেশিরভাগই ক্যাশ থেকে
+    await enforce_rate_limit("search_users", str(current_user.id))
+    return await search_users(q, limit)
 
 
 @user_router.get("/{user_id}", response_model=UserResponse, status_code=status.HTTP_200_OK)
-async def get_user(user_id: str):
+async def get_user(user_id: str, request: Request):
     """
     Get detailed information about a specific user by their unique ID.
     """
-    # Search for the user in the database by ID
-    user = await UserModel.get(user_id)
-
-    # Check if user exists; if not, raise a 404 error
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    return user
+    async def build():
+        # Search for the user in the database by ID
+        user = await UserModel.get(user_id)
+
+        # Check if user exists; if not, raise a 404 error
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        return UserResponse.model_validate(user)
+
+    # cached per user with an ETag, dropped whenever the user document changes
+    return await profile_cache.response(request, "user", user_id, build)
 
 
 @user_router.get("/users/my_profile", response_model=UserModel)
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, EmailStr,Field
+from pydantic import BaseModel, EmailStr,Field, AliasChoices
 from typing import Optional,List
+from uuid import UUID
 from datetime import datetime
 from eron.core.base.base import BaseResponse
 from eron.users.utils.account_status import AccountStatus
@@ -46,6 +47,36 @@ class UserResponse(BaseResponse):
         from_attributes = True
 
 
+class UserCard(BaseResponse):
+    # read from "_id" when projected straight out of the users collection
+    id: UUID = Field(validation_alias=AliasChoices("id", "_id"))
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    profile_image: Optional[str] = None
+
+    class Settings:
+        projection = {"_id": 1, "first_name": 1, "last_name": 1, "profile_image": 1}
+
+
+class UserCardPage(BaseModel):
+    items: List[UserCard]
+    next_cursor: Optional[str] = None
+
+
+# Upper bound on ids accepted by one relationship lookup
+MAX_RELATIONSHIP_LOOKUP = 100
+
+
+class RelationshipLookupRequest(BaseModel):
+    user_ids: List[UUID] = Field(..., min_length=1, max_length=MAX_RELATIONSHIP_LOOKUP)
+
+
+class RelationshipStatus(BaseModel):
+    user_id: UUID
+    is_following: bool
+    is_followed_by: bool
+
+
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
@@ -31,7 +31,8 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserModel:
         raise credentials_exception
 
 
-    user = await UserModel.get(user_id, fetch_links=True)
+    # links stay unresolved; routers load what they need through LinkLoader
+    user = await UserModel.get(user_id)
 
     if user is None:
         raise credentials_exception
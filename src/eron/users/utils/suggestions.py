@@ -0,0 +1,104 @@
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, List
+from beanie.operators import In
+from pymongo.errors import PyMongoError
+from eron.core.loader.link_loader import link_id
+from eron.users.models.suggestion_models import FollowSuggestionModel, SuggestedUser
+from eron.users.models.user_models import UserModel
+from eron.users.schemas.user_schemas import UserCard
+
+logger = logging.getLogger(__name__)
+
+# suggestions stored per user
+SUGGESTIONS_TOP_K = int(os.getenv("SUGGESTIONS_TOP_K", "50"))
+# score of one followee who follows the candidate, and of one shared live session
+SUGGESTION_FOF_WEIGHT = float(os.getenv("SUGGESTION_FOF_WEIGHT", "1"))
+SUGGESTION_COVIEW_WEIGHT = float(os.getenv("SUGGESTION_COVIEW_WEIGHT", "0.5"))
+# newest follows of the followed user taken into account on follow/unfollow
+SUGGESTION_FANOUT = int(os.getenv("SUGGESTION_FANOUT", "200"))
+
+
+def _ranked(items: Dict, top_k: int = SUGGESTIONS_TOP_K) -> List[SuggestedUser]:
+    return sorted(items.values(), key=lambda item: item.score, reverse=True)[:top_k]
+
+
+async def _store(user_id, items: List[SuggestedUser]):
+    await FollowSuggestionModel.get_motor_collection().update_one(
+        {"_id": user_id},
+        {
+            "$set": {"items": [item.model_dump() for item in items]},
+            "$setOnInsert": {"computed_at": datetime.now(timezone.utc)},
+        },
+        upsert=True,
+    )
+
+
+def _followees(user: UserModel) -> List:
+    return [link_id(link) for link in user.following[-SUGGESTION_FANOUT:]]
+
+
+async def on_follow(user: UserModel, target: UserModel):
+    """
+    `user` just followed `target`: target is no longer a suggestion, and
+    everyone target follows is one mutual connection closer. Only the
+    stored top-K is adjusted; the next job run recomputes it in full.
+    """
+    stored = await FollowSuggestionModel.get(user.id)
+    items = {item.id: item for item in stored.items} if stored else {}
+    items.pop(target.id, None)
+
+    following = {link_id(link) for link in user.following}
+    new = {}
+    for candidate in _followees(target):
+        if candidate == user.id or candidate in following:
+            continue
+        item = items.get(candidate) or new.get(candidate)
+        if item is None:
+            item = new[candidate] = SuggestedUser(id=candidate, score=0)
+        item.score += SUGGESTION_FOF_WEIGHT
+        item.mutual += 1
+
+    ranked = _ranked({**items, **new})
+    # only candidates that made it into the top-K need a card
+    entering = [item.id for item in ranked if item.id in new]
+    if entering:
+        cards = {
+            card.id: card
+            for card in await UserModel.find(In(UserModel.id, entering), projection_model=UserCard).to_list()
+        }
+        for item in ranked:
+            card = cards.get(item.id)
+            if card is not None:
+                item.first_name, item.last_name, item.profile_image = card.first_name, card.last_name, card.profile_image
+        ranked = [item for item in ranked if item.id not in new or item.id in cards]
+    await _store(user.id, ranked)
+
+
+async def on_unfollow(user: UserModel, target: UserModel):
+    """`user` unfollowed `target`: the connections through target are gone."""
+    stored = await FollowSuggestionModel.get(user.id)
+    if stored is None:
+        return
+    items = {item.id: item for item in stored.items}
+    for candidate in _followees(target):
+        item = items.get(candidate)
+        if item is None or item.mutual <= 0:
+            continue
+        item.score -= SUGGESTION_FOF_WEIGHT
+        item.mutual -= 1
+        if item.score <= 0:
+            del items[candidate]
+    await _store(user.id, _ranked(items))
+
+
+async def update_after_follow(user: UserModel, target: UserModel, followed: bool):
+    # suggestions are a nicety: a failed update must not fail the follow
+    try:
+        if followed:
+            await on_follow(user, target)
+        else:
+            await on_unfollow(user, target)
+    except PyMongoError:
+        logger.warning("could not update follow suggestions of %s", user.id, exc_info=True)
@@ -0,0 +1,76 @@
+import asyncio
+import os
+from typing import List
+from pymongo import ASCENDING
+from eron.core.cache.prefix_cache import fold, split_prefix, user_search_cache
+from eron.core.metrics.metrics import RESPONSE_CACHE_REQUESTS
+from eron.users.models.user_models import SEARCH_COLLATION, UserModel
+from eron.users.schemas.user_schemas import UserCard
+
+# matches read per branch and kept per cached prefix; also the largest page
+USER_SEARCH_FETCH = int(os.getenv("USER_SEARCH_FETCH", "20"))
+
+# highest primary weight in the root collation, closes a prefix range
+_PREFIX_END = "\uffff"
+_PROJECTION = {"_id": 1, "first_name": 1, "last_name": 1, "profile_image": 1}
+
+
+def _starts_with(prefix: str) -> dict:
+    return {"$gte": prefix, "$lt": prefix + _PREFIX_END}
+
+
+def _branches(prefix: str) -> List[tuple]:
+    # each branch is a range on the leading field of one collation index
+    branches = [
+        ({"first_name": _starts_with(prefix)}, [("first_name", ASCENDING), ("last_name", ASCENDING)]),
+        ({"last_name": _starts_with(prefix)}, [("last_name", ASCENDING), ("first_name", ASCENDING)]),
+    ]
+    head, tail = split_prefix(prefix)
+    if tail is not None:
+        # "ada lov": first name Ada and a last name starting with lov, or the other way round
+        branches += [
+            ({"first_name": head, "last_name": _starts_with(tail)}, [("first_name", ASCENDING), ("last_name", ASCENDING)]),
+            ({"last_name": head, "first_name": _starts_with(tail)}, [("last_name", ASCENDING), ("first_name", ASCENDING)]),
+        ]
+    return branches
+
+
+async def search_users(q: str, limit: int) -> List[UserCard]:
+    """
+    Users whose first or last name starts with `q`, ignoring case and
+    accents; "first last" and "last first" also match. Emails aren't
+    searched, a prefix match would let anyone enumerate them. Results come
+    from a per-prefix cache first, see eron.core.cache.prefix_cache.
+    """
+    prefix = fold(q)
+    if not prefix:
+        return []
+    cached = user_search_cache.get(prefix, limit)
+    if cached is not None:
+        RESPONSE_CACHE_REQUESTS.inc(cache=user_search_cache.name, outcome="hit")
+        return cached
+    RESPONSE_CACHE_REQUESTS.inc(cache=user_search_cache.name, outcome="miss")
+
+    collection = UserModel.get_motor_collection()
+    # every branch stops after USER_SEARCH_FETCH index entries
+    pages = await asyncio.gather(*[
+        collection.find(
+            query, projection=_PROJECTION, collation=SEARCH_COLLATION, sort=sort, limit=USER_SEARCH_FETCH
+        ).to_list(None)
+        for query, sort in _branches(prefix)
+    ])
+
+    rows = []
+    seen = set()
+    for page in pages:
+        for doc in page:
+            if doc["_id"] in seen:
+                continue
+            seen.add(doc["_id"])
+            fields = (fold(doc.get("first_name")), fold(doc.get("last_name")))
+            rows.append((doc["_id"], UserCard.model_validate(doc), fields))
+    # no branch was cut off, so a longer prefix can be answered from these
+    complete = len(rows) <= USER_SEARCH_FETCH and all(len(page) < USER_SEARCH_FETCH for page in pages)
+    rows = rows[:USER_SEARCH_FETCH]
+    user_search_cache.put(prefix, rows, complete)
+    return [card for _, card, _ in rows[:limit]]
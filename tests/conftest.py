@@ -0,0 +1,34 @@
+"""
+Shared fixtures. Database tests run against mongomock-motor, an in-memory
+stand-in: good for the Python side of a query path, not for MongoDB-only
+operators ($merge, $dateTrunc, $getField, collations), which it doesn't run.
+
+    python -m pytest
+"""
+import os
+
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+import pytest
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def init_models():
+    """`await init_models(Model, ...)` binds the models to a fresh in-memory database."""
+    client = AsyncMongoMockClient()
+
+    async def init(*models):
+        database = client["eron_test"]
+        await init_beanie(database=database, document_models=list(models))
+        return database
+
+    yield init
+    client.close()
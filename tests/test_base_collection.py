@@ -0,0 +1,103 @@
+from typing import ClassVar, FrozenSet, List
+
+import pytest
+
+from eron.core.base.base import BaseCollection
+
+pytestmark = pytest.mark.anyio
+
+
+class Post(BaseCollection):
+    title: str = ""
+    likes: int = 0
+    tags: List[str] = []
+
+    increment_only_fields: ClassVar[FrozenSet[str]] = frozenset({"likes"})
+
+    class Settings(BaseCollection.Settings):
+        name = "test_posts"
+
+
+@pytest.fixture
+async def post(init_models):
+    await init_models(Post)
+    post = Post(title="hello", likes=3, tags=["a", "b", "c"])
+    await post.insert()
+    return await Post.get(post.id)
+
+
+@pytest.mark.parametrize("tags, expected", [
+    # appending to the end -> only the new tail
+    (["a", "b", "c", "d", "e"], {"$push": {"tags": {"$each": ["d", "e"]}}}),
+    # dropping items -> $pullAll of those items
+    (["a", "c"], {"$pullAll": {"tags": ["b"]}}),
+    # reorders and inserts in the middle rewrite the array
+    (["b", "a", "c"], {"$set": {"tags": ["b", "a", "c"]}}),
+    (["a", "x", "b", "c"], {"$set": {"tags": ["a", "x", "b", "c"]}}),
+])
+async def test_list_changes(post, tags, expected):
+    post.tags = tags
+    assert post.get_update_document() == expected
+
+
+async def test_removing_a_duplicate_rewrites_the_list(init_models):
+    await init_models(Post)
+    post = Post(tags=["a", "b", "a"])
+    await post.insert()
+    post = await Post.get(post.id)
+    # $pullAll would take every "a", not just one of them
+    post.tags = ["a", "b"]
+    assert post.get_update_document() == {"$set": {"tags": ["a", "b"]}}
+    await post.save_changes()
+    assert (await Post.get(post.id)).tags == ["a", "b"]
+
+
+async def test_update_document_splits_by_operator(post):
+    post.title = "changed"
+    post.likes += 2
+    post.tags.append("d")
+    assert post.get_update_document() == {
+        "$set": {"title": "changed"},
+        "$inc": {"likes": 2},
+        "$push": {"tags": {"$each": ["d"]}},
+    }
+
+
+async def test_unchanged_document_has_empty_update(post):
+    assert post.get_update_document() == {}
+    assert await post.save_changes() is None
+
+
+async def test_counter_decrement_is_negative_inc(post):
+    post.likes -= 1
+    assert post.get_update_document() == {"$inc": {"likes": -1}}
+
+
+async def test_save_changes_keeps_concurrent_increments(post):
+    # another worker bumps the counter after we loaded the document
+    await Post.find_one({"_id": post.id}).update({"$inc": {"likes": 10}})
+    post.likes += 1
+    post.tags.remove("b")
+    await post.save_changes()
+
+    stored = await Post.get(post.id)
+    assert stored.likes == 14
+    assert stored.tags == ["a", "c"]
+    assert stored.title == "hello"
+
+
+async def test_save_changes_resets_saved_state(post):
+    post.likes += 1
+    await post.save_changes()
+    assert post.get_update_document() == {}
+
+
+async def test_update_refreshes_the_local_copy(post):
+    # an atomic $inc through update() must not be applied again by the next
+    # save_changes() (a viewer's entry fee, see the live join)
+    await post.update({"$inc": {"likes": -2}})
+    assert post.likes == 1
+    post.title = "after"
+    assert post.get_update_document() == {"$set": {"title": "after"}}
+    await post.save_changes()
+    assert (await Post.get(post.id)).likes == 1
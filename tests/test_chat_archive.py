@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import mongomock.database
+import pytest
+from bson import Binary, DBRef
+
+from eron.chats.models.chat_models import ChatMessageModel
+from eron.chats.utils.archive import archive_catalog, archive_name, find_archived, reaches_archive
+from eron.jobs import archive_chats
+from eron.users.models.user_models import UserModel
+
+pytestmark = pytest.mark.anyio
+
+# mongomock can't encode native UUIDs, raw documents carry them as Binary
+ALICE, BOB, CAROL = (Binary.from_uuid(uuid4()) for _ in range(3))
+NAMES = {ALICE: "alice", BOB: "bob", CAROL: "carol"}
+
+
+def at(month, day=1):
+    return datetime(2024, month, day, 12, tzinfo=timezone.utc)
+
+
+def message(sender, receiver, timestamp, delivered=True):
+    return {
+        "_id": Binary.from_uuid(uuid4()),
+        "sender": DBRef("users", sender),
+        "receiver": DBRef("users", receiver),
+        "message": pair(sender, receiver),
+        "is_read": False,
+        "is_delivered": delivered,
+        "timestamp": timestamp,
+    }
+
+
+@pytest.fixture
+async def database(init_models, monkeypatch):
+    database = await init_models(UserModel, ChatMessageModel)
+    create_collection = mongomock.database.Database.create_collection
+    # no storage engine options in mongomock
+    monkeypatch.setattr(
+        mongomock.database.Database, "create_collection",
+        lambda self, name, **options: create_collection(self, name),
+    )
+    monkeypatch.setattr(archive_chats, "CHAT_ARCHIVE_LIST_TTL", 0)
+    archive_catalog._ready.clear()
+    archive_catalog.invalidate()
+    yield database
+    archive_catalog._ready.clear()
+    archive_catalog.invalidate()
+
+
+async def archive_messages(database, *docs):
+    for doc in docs:
+        await database[archive_name(doc["timestamp"])].insert_one(doc)
+    archive_catalog.invalidate()
+
+
+def pair(a, b):
+    return "+".join(sorted((NAMES[a], NAMES[b])))
+
+
+def conversation(a, b):
+    # the router matches "sender.$id"/"receiver.$id", which mongomock can't
+    # address inside a DBRef; the text stands in for the participants
+    return {"message": pair(a, b)}
+
+
+def stamps(messages):
+    return [msg.timestamp.replace(tzinfo=timezone.utc) for msg in messages]
+
+
+async def test_find_archived_merges_months_newest_first(database):
+    await archive_messages(
+        database,
+        message(ALICE, BOB, at(1, 5)),
+        message(BOB, ALICE, at(3, 2)),
+        message(ALICE, BOB, at(3, 20)),
+        message(ALICE, CAROL, at(3, 21)),
+        message(BOB, ALICE, at(2, 9)),
+    )
+    found = await find_archived(conversation(ALICE, BOB), None, None)
+    assert stamps(found) == [at(3, 20), at(3, 2), at(2, 9), at(1, 5)]
+
+
+async def test_find_archived_pages_with_before_and_limit(database):
+    await archive_messages(database, *(message(ALICE, BOB, at(month, day)) for month in (1, 2, 3) for day in (3, 6)))
+    page = await find_archived(conversation(ALICE, BOB), at(3, 6), 3)
+    assert stamps(page) == [at(3, 3), at(2, 6), at(2, 3)]
+    # months at or after `before` aren't read at all
+    assert stamps(await find_archived(conversation(ALICE, BOB), at(2, 1), None)) == [at(1, 6), at(1, 3)]
+
+
+async def test_reaches_archive_compares_with_the_newest_month(database):
+    assert not await reaches_archive(at(1))
+    await archive_messages(database, message(ALICE, BOB, at(2, 10)))
+    assert await reaches_archive(at(2, 28))
+    assert not await reaches_archive(at(3, 1))
+
+
+async def test_catalog_lists_new_months_after_archiving(database):
+    assert await archive_catalog.names() == []
+    hot = database["chat_messages"]
+    await hot.insert_many([
+        message(ALICE, BOB, at(1, 10)),
+        message(BOB, ALICE, at(2, 10)),
+        message(BOB, ALICE, at(2, 11), delivered=False),
+        message(ALICE, BOB, at(6, 1)),
+    ])
+    stats = await archive_chats.archive(cutoff=at(5), rate=0)
+    assert stats.moved == 2
+    assert stats.months == {archive_name(at(1)): 1, archive_name(at(2)): 1}
+    assert await archive_catalog.names() == [archive_name(at(2)), archive_name(at(1))]
+    # undelivered messages stay in the offline queue
+    assert sorted(doc["timestamp"].day for doc in await hot.find().to_list(None)) == [1, 11]
+    assert stamps(await find_archived(conversation(ALICE, BOB), None, None)) == [at(2, 10), at(1, 10)]
+
+
+async def test_archiver_waits_before_deleting_into_a_new_month(database, monkeypatch):
+    slept = []
+
+    async def sleep(seconds):
+        slept.append(seconds)
+
+    monkeypatch.setattr(archive_chats, "CHAT_ARCHIVE_LIST_TTL", 7)
+    monkeypatch.setattr(archive_chats.asyncio, "sleep", sleep)
+    hot = database["chat_messages"]
+    await hot.insert_one(message(ALICE, BOB, at(1, 10)))
+    await archive_chats.archive(cutoff=at(5), rate=0)
+    await hot.insert_one(message(ALICE, BOB, at(1, 11)))
+    await archive_chats.archive(cutoff=at(5), rate=0)
+    assert slept == [7]
@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+
+from eron.chats.utils import search
+from eron.chats.utils.search import SNIPPET_CONTEXT, postings_for, snippet, tokenize
+
+
+def highlighted(text, matches):
+    return [text[start:end] for start, end in matches]
+
+
+def test_tokenize_lowercases_dedupes_and_drops_single_letters():
+    assert tokenize("Hello, hello a WORLD 42!") == ["hello", "world", "42"]
+
+
+def test_tokenize_keeps_bengali_words_whole():
+    assert tokenize("আমি ভালো আছি") == ["আমি", "ভালো", "আছি"]
+
+
+def test_snippet_marks_every_match():
+    text, matches = snippet("Tea? TEA time, tea!", ["tea"])
+    assert text == "Tea? TEA time, tea!"
+    assert highlighted(text, matches) == ["Tea", "TEA", "tea"]
+
+
+def test_snippet_offsets_survive_case_changes_that_change_length():
+    # "İ".lower() is two characters, offsets taken on lower() would drift
+    text, matches = snippet("İİİ meet at the station", ["station", "meet"])
+    assert highlighted(text, matches) == ["meet", "station"]
+
+
+def test_snippet_prefers_the_longest_term():
+    text, matches = snippet("hello there", ["he", "hello"])
+    assert highlighted(text, matches) == ["hello", "he"]
+
+
+def test_snippet_windows_long_messages():
+    text = "x" * 100 + " needle " + "y" * 200
+    window, matches = snippet(text, ["needle"])
+    assert window.startswith("…") and window.endswith("…")
+    assert len(window) == SNIPPET_CONTEXT * 3 + 2
+    assert highlighted(window, matches) == ["needle"]
+
+
+def test_snippet_without_a_match_starts_at_the_beginning():
+    assert snippet("short", ["absent"]) == ("short", [])
+    assert snippet("short", []) == ("short", [])
+
+
+def test_postings_for_indexes_each_term_for_both_sides(monkeypatch):
+    monkeypatch.setattr(search, "MAX_TERMS_PER_MESSAGE", 2)
+    sender, receiver, message_id = uuid4(), uuid4(), uuid4()
+    sent = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    msg = SimpleNamespace(
+        id=message_id, timestamp=sent, message="see you soon",
+        sender=SimpleNamespace(id=sender), receiver=SimpleNamespace(id=receiver),
+    )
+    postings = postings_for(msg)
+    assert {(p["u"], p["t"]) for p in postings} == {
+        (user, term) for user in (sender, receiver) for term in ("see", "you")
+    }
+    assert {(p["m"], p["ts"]) for p in postings} == {(message_id, sent)}
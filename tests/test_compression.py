@@ -0,0 +1,103 @@
+import gzip
+
+import brotli
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from eron.core.compression.middleware import COMPRESSION_MIN_SIZE, CompressionMiddleware, choose_encoding
+
+BODY = b'{"items":[' + b",".join(b'"item"' for _ in range(COMPRESSION_MIN_SIZE)) + b"]}"
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/big")
+    def big():
+        return Response(BODY, media_type="application/json", headers={"ETag": '"abc"'})
+
+    @app.get("/small")
+    def small():
+        return Response(b'{"ok":true}', media_type="application/json", headers={"ETag": '"abc"'})
+
+    @app.get("/image")
+    def image():
+        return Response(BODY, media_type="image/png")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([BODY[:500], BODY[500:]]), media_type="application/json")
+
+    return TestClient(app)
+
+
+def raw_body(response):
+    # TestClient decodes gzip/br; the wire bytes are what we check
+    return b"".join(response.iter_raw())
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("", None),
+    ("gzip", "gzip"),
+    ("gzip, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("br;q=0, gzip;q=0", None),
+    ("*", "br"),
+    ("identity", None),
+])
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header) == expected
+
+
+def test_large_json_is_compressed_with_weak_etag(client):
+    with client.stream("GET", "/big", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["etag"] == 'W/"abc"'
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert gzip.decompress(raw_body(response)) == BODY
+
+
+def test_brotli_is_preferred(client):
+    with client.stream("GET", "/big", headers={"Accept-Encoding": "gzip, br"}) as response:
+        assert response.headers["content-encoding"] == "br"
+        assert brotli.decompress(raw_body(response)) == BODY
+
+
+def test_small_and_binary_bodies_pass_through(client):
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    assert small.headers["etag"] == '"abc"'
+    image = client.get("/image", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in image.headers
+
+
+def test_streaming_body_is_compressed_chunk_by_chunk(client):
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        assert gzip.decompress(raw_body(response)) == BODY
+
+
+@pytest.mark.anyio
+async def test_user_writes_drop_the_users_feed(init_models):
+    from eron.core.compression.precompressed import users_feed
+    from eron.users.models.user_models import UserModel
+
+    await init_models(UserModel)
+
+    async def build():
+        return [user.first_name for user in await UserModel.find_all().to_list()]
+
+    user = UserModel(email="ada@example.com", first_name="Ada")
+    await user.insert()
+    assert (await users_feed._entry((0, 20), build)).body == b'["Ada"]'
+
+    await user.set({UserModel.first_name: "Grace"})
+    assert (await users_feed._entry((0, 20), build)).body == b'["Grace"]'
+
+    await user.delete()
+    assert (await users_feed._entry((0, 20), build)).body == b"[]"
@@ -0,0 +1,87 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from eron.core.websocket.session import RoomLog
+from eron.live_stream.models.live_stream import LiveStreamModel
+from eron.live_stream.routers.live_stream import livestream_manager, resume_live_session
+from eron.users.models.user_models import UserModel
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeSocket:
+    def __init__(self):
+        self.state = SimpleNamespace()
+        self.sent = []
+
+    async def send_text(self, frame):
+        self.sent.append(json.loads(frame))
+
+
+def log_with(count, size=256):
+    log = RoomLog(size)
+    for n in range(count):
+        log.append({"event": "comment", "n": n})
+    return log
+
+
+def seqs(frames):
+    return [frame.payload["seq"] for frame in frames]
+
+
+def test_since_replays_events_after_last_seq():
+    log = log_with(5)
+    assert seqs(log.since(2)) == [3, 4, 5]
+    assert seqs(log.since(0)) == [1, 2, 3, 4, 5]
+    assert log.since(5) == []
+
+
+def test_since_needs_resync_once_events_were_dropped():
+    log = log_with(10, size=4)
+    assert seqs(log.since(6)) == [7, 8, 9, 10]
+    assert log.since(5) is None
+
+
+def test_since_needs_resync_for_a_seq_this_log_never_issued():
+    assert log_with(3).since(7) is None
+
+
+@pytest.fixture
+async def live_models(init_models, monkeypatch):
+    await init_models(UserModel, LiveStreamModel)
+
+    async def live(*args, **kwargs):
+        return SimpleNamespace(status="live")
+
+    monkeypatch.setattr(LiveStreamModel, "find_one", live)
+    yield
+    livestream_manager.close_room("resume-test")
+
+
+async def resume(last_seq):
+    socket = FakeSocket()
+    conn = livestream_manager.registry.register(socket, "viewer-1")
+    try:
+        await resume_live_session(conn, {"ch": "resume-test", "role": "viewer"}, last_seq)
+    finally:
+        livestream_manager.registry.unregister(conn)
+    return [message for message in socket.sent if message["event"] != "viewer_count_update"]
+
+
+async def test_resume_against_a_fresh_log_asks_for_resync(live_models):
+    # this worker never saw the room (restart): the client's seq 3 means nothing here
+    resumed, *replayed = await resume(last_seq=3)
+    assert resumed["event"] == "resumed"
+    assert resumed["resync_required"] is True
+    assert replayed == []
+
+
+async def test_resume_replays_from_an_existing_log(live_models):
+    log = livestream_manager.logs.get("resume-test")
+    for n in range(3):
+        log.append({"event": "comment", "n": n})
+    resumed, *replayed = await resume(last_seq=1)
+    assert resumed["resync_required"] is False
+    assert [message["seq"] for message in replayed] == [2, 3]
@@ -0,0 +1,121 @@
+import pytest
+
+from eron.core.cache import prefix_cache as prefix_cache_module
+from eron.core.cache.prefix_cache import MAX_CACHED_PREFIX, PrefixCache, fold, matches, split_prefix
+
+PEOPLE = {
+    "1": ("ada", "lovelace"),
+    "2": ("alan", "turing"),
+    "3": ("alice", "ada"),
+    "4": ("grace", "hopper"),
+}
+
+
+def rows(prefix):
+    return [(doc_id, doc_id, fields) for doc_id, fields in PEOPLE.items() if matches(prefix, fields)]
+
+
+@pytest.fixture
+def cache():
+    cache = PrefixCache("test_prefix")
+    yield cache
+    prefix_cache_module.caches.pop("test_prefix", None)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(prefix_cache_module.time, "monotonic", clock)
+    return clock
+
+
+def test_fold():
+    assert fold("  Ámélie   Poulain ") == "amelie poulain"
+    assert fold("STRASSE") == fold("straße")
+    assert fold(None) == ""
+
+
+def test_split_prefix_and_matches():
+    assert split_prefix("ada lov") == ("ada", "lov")
+    assert split_prefix("ada") == ("ada", None)
+    assert matches("ali", PEOPLE["3"])
+    assert matches("ada lov", PEOPLE["1"])
+    assert matches("lovelace a", PEOPLE["1"])
+    assert not matches("ada tur", PEOPLE["1"])
+
+
+def test_exact_prefix_is_served_up_to_limit(cache):
+    cache.put("al", rows("al"), complete=True)
+    assert cache.get("al", 10) == ["2", "3"]
+    assert cache.get("al", 1) == ["2"]
+
+
+def test_longer_prefix_is_filtered_from_a_complete_shorter_one(cache):
+    cache.put("a", rows("a"), complete=True)
+    assert cache.get("ali", 10) == ["3"]
+    assert cache.get("ada lov", 10) == ["1"]
+
+
+def test_incomplete_shorter_prefix_is_a_miss(cache):
+    cache.put("a", rows("a")[:1], complete=False)
+    assert cache.get("a", 1) == ["1"]
+    assert cache.get("al", 10) is None
+
+
+def test_entries_expire(cache, clock):
+    cache.put("al", rows("al"), complete=True)
+    clock.now += cache.ttl + 1
+    assert cache.get("al", 10) is None
+    assert cache.get("ali", 10) is None
+
+
+def test_least_recently_used_prefix_is_evicted(cache):
+    cache.max_entries = 2
+    cache.put("a", rows("a"), complete=True)
+    cache.put("g", rows("g"), complete=True)
+    cache.get("a", 10)
+    cache.put("h", rows("h"), complete=True)
+    assert list(cache._entries) == ["a", "h"]
+    # the evicted entry's documents no longer point at it
+    assert "g" not in cache._holders.get("4", set())
+
+
+def test_long_prefixes_are_not_cached(cache):
+    prefix = "a" * (MAX_CACHED_PREFIX + 1)
+    cache.put(prefix, [], complete=True)
+    assert prefix not in cache._entries
+
+
+def test_invalidate_drops_entries_holding_the_document(cache):
+    cache.put("a", rows("a"), complete=True)
+    cache.put("g", rows("g"), complete=True)
+    cache.invalidate(1)
+    assert cache.get("a", 10) is None
+    assert cache.get("g", 10) == ["4"]
+    assert "1" not in cache._holders
+
+
+def test_invalidate_drops_prefixes_of_new_field_values(cache):
+    # "4" is renamed to "adelaide": "ad" doesn't hold it yet but now matches it
+    cache.put("ad", rows("ad"), complete=True)
+    cache.put("g", rows("g"), complete=True)
+    cache.invalidate(4, ["adelaide"])
+    assert cache.get("ad", 10) is None
+    assert cache.get("g", 10) is None
+
+
+def test_invalidations_are_published_like_response_cache_ones(cache, monkeypatch):
+    from eron.core.cache import response_cache
+
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_BACKEND", "mongo")
+    monkeypatch.setattr(response_cache, "_outbox", set())
+    cache.invalidate(7, ["grace"])
+    assert response_cache._outbox == {("test_prefix", "7")}
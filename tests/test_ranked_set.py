@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+from eron.core.leaderboard.ranked_set import RankedSet
+
+
+def reference_order(scores):
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def assert_matches(ranked, scores):
+    expected = reference_order(scores)
+    assert len(ranked) == len(scores)
+    assert ranked.top(len(scores) + 5) == expected
+    for position, (member, score) in enumerate(expected):
+        assert ranked.rank(member) == position
+        assert ranked.score(member) == score
+
+
+def test_highest_first_and_ties_by_member():
+    ranked = RankedSet()
+    for member, score in [("carol", 5), ("alice", 9), ("bob", 5), ("dave", 1)]:
+        ranked.set(member, score)
+    assert ranked.top(3) == [("alice", 9), ("bob", 5), ("carol", 5)]
+    assert [ranked.rank(member) for member in ("alice", "bob", "carol", "dave")] == [0, 1, 2, 3]
+
+
+def test_add_moves_a_member_up():
+    ranked = RankedSet()
+    ranked.set("alice", 10)
+    ranked.set("bob", 3)
+    assert ranked.add("bob", 8) == 11
+    assert ranked.add("carol", 2) == 2
+    assert ranked.top(10) == [("bob", 11), ("alice", 10), ("carol", 2)]
+
+
+def test_discard_and_unknown_members():
+    ranked = RankedSet()
+    ranked.set("alice", 1)
+    ranked.discard("alice")
+    ranked.discard("nobody")
+    assert len(ranked) == 0
+    assert "alice" not in ranked
+    assert ranked.rank("alice") is None
+    assert ranked.score("alice") is None
+    assert ranked.top(5) == []
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_random_operations_match_a_sorted_reference(seed):
+    rng = random.Random(seed)
+    random.seed(seed)  # skip list levels
+    ranked, scores = RankedSet(), {}
+    members = [f"user{n}" for n in range(40)]
+    for step in range(600):
+        member = rng.choice(members)
+        operation = rng.random()
+        if operation < 0.4:
+            score = rng.randint(0, 20)
+            ranked.set(member, score)
+            scores[member] = score
+        elif operation < 0.8:
+            amount = rng.randint(-5, 10)
+            assert ranked.add(member, amount) == scores.get(member, 0) + amount
+            scores[member] = scores.get(member, 0) + amount
+        else:
+            ranked.discard(member)
+            scores.pop(member, None)
+        if step % 50 == 0:
+            assert_matches(ranked, scores)
+    assert_matches(ranked, scores)
+    assert ranked.top(5) == reference_order(scores)[:5]
@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+
+import pytest
+
+from eron.core.ratelimit import limiter as limiter_module
+from eron.core.ratelimit.limiter import MemoryBackend, RateLimit, RateLimiter, client_ip, parse_rate_limits
+
+pytestmark = pytest.mark.anyio
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(limiter_module.time, "monotonic", clock)
+    return clock
+
+
+def test_parse_rate_limits():
+    limits = parse_rate_limits(" login=5/60, send_like=10 ,,")
+    assert (limits["login"].capacity, limits["login"].rate) == (5, 5 / 60)
+    assert (limits["send_like"].capacity, limits["send_like"].rate) == (10, 10)
+
+
+async def test_bucket_allows_a_burst_then_refills(clock):
+    backend = MemoryBackend()
+    limit = RateLimit(3, 6)  # one token every 2s
+    assert [await backend.take("k", limit) for _ in range(3)] == [0, 0, 0]
+    assert await backend.take("k", limit) == pytest.approx(2)
+    clock.now += 1
+    assert await backend.take("k", limit) == pytest.approx(1)
+    clock.now += 1
+    assert await backend.take("k", limit) == 0
+    # never refills past capacity
+    clock.now += 600
+    assert [await backend.take("k", limit) for _ in range(4)][-1] > 0
+
+
+async def test_buckets_are_per_key(clock):
+    backend = MemoryBackend()
+    limit = RateLimit(1, 60)
+    assert await backend.take("a", limit) == 0
+    assert await backend.take("a", limit) > 0
+    assert await backend.take("b", limit) == 0
+
+
+async def test_eviction_keeps_recently_hit_keys(clock):
+    backend = MemoryBackend(max_keys=4)
+    limit = RateLimit(1, 60)
+    for key in "abcd":
+        await backend.take(key, limit)
+    # "a" is the oldest key but still being hit
+    assert await backend.take("a", limit) > 0
+    await backend.take("e", limit)
+    assert list(backend._buckets) == ["d", "a", "e"]
+    # so it stays limited instead of starting full again
+    assert await backend.take("a", limit) > 0
+
+
+async def test_limiter_ignores_unlisted_actions(clock):
+    limiter = RateLimiter({"login": RateLimit(1, 60)}, MemoryBackend())
+    assert await limiter.hit("login", "u") == 0
+    assert await limiter.hit("login", "u") > 0
+    assert await limiter.hit("search", "u") == 0
+
+
+def request(peer, forwarded=None):
+    headers = {"x-forwarded-for": forwarded} if forwarded is not None else {}
+    return SimpleNamespace(client=SimpleNamespace(host=peer), headers=headers)
+
+
+@pytest.mark.parametrize("hops, forwarded, expected", [
+    (0, "6.6.6.6", "10.0.0.1"),
+    (1, None, "10.0.0.1"),
+    (1, "6.6.6.6, 203.0.113.7", "203.0.113.7"),
+    (2, "6.6.6.6, 203.0.113.7, 10.0.0.9", "203.0.113.7"),
+    (3, "203.0.113.7", "203.0.113.7"),
+])
+def test_client_ip_trusts_only_proxy_written_entries(monkeypatch, hops, forwarded, expected):
+    monkeypatch.setattr(limiter_module, "TRUSTED_PROXY_HOPS", hops)
+    assert client_ip(request("10.0.0.1", forwarded)) == expected
@@ -0,0 +1,30 @@
+from uuid import uuid4
+
+import pytest
+
+from eron.jobs import reconcile_counters
+from eron.live_stream.models.live_stream import LiveCommentModel, LiveStreamModel, LiveViewerModel
+from eron.live_stream.utils import counters as counters_module
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_stream_counters_leave_total_views_alone(monkeypatch):
+    session = uuid4()
+    rows = {
+        (LiveViewerModel, "$fee_paid"): {session: 50},
+        (LiveCommentModel, 1): {session: 7},
+    }
+
+    async def group_by_ref(model, ref_path, ids, value=1):
+        assert ref_path == "session" and ids == [session]
+        return rows[(model, value)]
+
+    monkeypatch.setattr(counters_module, "group_by_ref", group_by_ref)
+    counters = await counters_module.stream_counters([{"_id": session}])
+
+    # joins (rejoins included) can't be recounted from one-row-per-viewer data
+    assert counters == {session: {"earn_coins": 50, "total_comment": 7}}
+    compute, projection = reconcile_counters.RECONCILERS[LiveStreamModel]
+    assert compute is counters_module.stream_counters
+    assert "total_views" not in projection
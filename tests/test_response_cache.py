@@ -0,0 +1,151 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from eron.core.cache import response_cache as response_cache_module
+from eron.core.cache.response_cache import ResponseCache, _etag_matches
+
+pytestmark = pytest.mark.anyio
+
+
+def request(if_none_match=None):
+    return SimpleNamespace(headers={"if-none-match": if_none_match} if if_none_match else {})
+
+
+class Builder:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return {"calls": self.calls}
+
+
+@pytest.fixture
+def cache():
+    cache = ResponseCache("test")
+    yield cache
+    response_cache_module.caches.pop("test", None)
+    response_cache_module._outbox.clear()
+
+
+@pytest.mark.parametrize("header, matches", [
+    (None, False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"xyz", W/"abc"', True),
+    ("*", True),
+    ('"abcd"', False),
+])
+def test_etag_matches(header, matches):
+    assert _etag_matches(header, '"abc"') is matches
+
+
+async def test_second_request_is_served_from_cache(cache):
+    build, key = Builder(), str(uuid4())
+    first = await cache.response(request(), "user", key, build)
+    second = await cache.response(request(), "user", key, build)
+    assert build.calls == 1
+    assert json.loads(second.body) == {"calls": 1}
+    assert first.headers["etag"] == second.headers["etag"]
+
+
+async def test_matching_etag_gets_304(cache):
+    build, key = Builder(), str(uuid4())
+    etag = (await cache.response(request(), "user", key, build)).headers["etag"]
+    response = await cache.response(request(etag), "user", key, build)
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == etag
+    # what the compression middleware hands out for a compressed body
+    assert (await cache.response(request("W/" + etag), "user", key, build)).status_code == 304
+
+
+async def test_keys_are_canonical_uuids(cache):
+    build, key = Builder(), uuid4()
+    await cache.response(request(), "user", str(key).upper(), build)
+    await cache.response(request(), "user", str(key), build)
+    assert build.calls == 1
+    # anything else goes straight to the builder
+    assert await cache.response(request(), "user", "me", build) == {"calls": 2}
+    assert await cache.response(request(), "user", "me", build) == {"calls": 3}
+
+
+async def test_invalidate_drops_every_route_for_the_key(cache):
+    build, key = Builder(), uuid4()
+    await cache.response(request(), "user", str(key), build)
+    await cache.response(request(), "stats", str(key), build)
+    cache.invalidate(key)
+    await cache.response(request(), "user", str(key), build)
+    await cache.response(request(), "stats", str(key), build)
+    assert build.calls == 4
+
+
+async def test_entries_expire(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache_module.time, "monotonic", lambda: now[0])
+    build, key = Builder(), str(uuid4())
+    await cache.response(request(), "user", key, build)
+    now[0] += cache.ttl + 1
+    response = await cache.response(request(), "user", key, build)
+    assert json.loads(response.body) == {"calls": 2}
+
+
+async def test_least_recently_used_entry_is_evicted(cache):
+    cache.max_entries = 2
+    build = Builder()
+    a, b, c = (str(uuid4()) for _ in range(3))
+    for key in (a, b, a, c):
+        await cache.response(request(), "user", key, build)
+    assert [key for _, key in cache._entries] == [a, c]
+
+
+async def test_concurrent_misses_build_once(cache):
+    release = asyncio.Event()
+    calls = []
+
+    async def build():
+        calls.append(1)
+        await release.wait()
+        return {"ok": True}
+
+    key = str(uuid4())
+    pending = [asyncio.create_task(cache.response(request(), "user", key, build)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    responses = await asyncio.gather(*pending)
+    assert len(calls) == 1
+    assert {response.body for response in responses} == {b'{"ok":true}'}
+
+
+async def test_build_running_during_invalidate_is_not_stored(cache):
+    release = asyncio.Event()
+    build_calls = []
+
+    async def build():
+        build_calls.append(1)
+        if len(build_calls) == 1:
+            await release.wait()
+        return {"version": len(build_calls)}
+
+    key = str(uuid4())
+    stale = asyncio.create_task(cache.response(request(), "user", key, build))
+    await asyncio.sleep(0)
+    cache.invalidate(key)
+    release.set()
+    await stale
+    fresh = await cache.response(request(), "user", key, build)
+    assert json.loads(fresh.body) == {"version": 2}
+
+
+async def test_invalidations_are_published_only_with_the_mongo_backend(cache, monkeypatch):
+    key = uuid4()
+    cache.invalidate(key)
+    assert response_cache_module._outbox == set()
+    monkeypatch.setattr(response_cache_module, "RESPONSE_CACHE_BACKEND", "mongo")
+    cache.invalidate(key)
+    cache.invalidate(key)
+    assert response_cache_module._outbox == {("test", str(key))}
@@ -0,0 +1,98 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from eron.analytics.models.rollups import HourlyRollupModel, RollupCursorModel
+from eron.jobs import rollup_analytics
+from eron.jobs.rollup_analytics import _advance, _claim, _minutes_since, _truncate, rollup
+from eron.live_stream.models.live_stream import LiveCommentModel, LiveStreamModel, LiveViewerModel
+from eron.users.models.user_models import UserModel
+
+pytestmark = pytest.mark.anyio
+
+T0 = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+def hours(n):
+    return T0 + timedelta(hours=n)
+
+
+@pytest.fixture
+async def database(init_models):
+    return await init_models(
+        UserModel, LiveStreamModel, LiveViewerModel, LiveCommentModel, HourlyRollupModel, RollupCursorModel
+    )
+
+
+def test_truncate():
+    at = datetime(2024, 3, 5, 17, 42, 10, 5, tzinfo=timezone.utc)
+    assert _truncate(at, "hour") == datetime(2024, 3, 5, 17, tzinfo=timezone.utc)
+    assert _truncate(at, "day") == datetime(2024, 3, 5, tzinfo=timezone.utc)
+
+
+async def cursor():
+    return await RollupCursorModel.get_motor_collection().find_one({"_id": "hourly"})
+
+
+async def test_a_window_is_claimed_by_one_run(database):
+    assert await _claim("hourly", hours(0), "a")
+    assert not await _claim("hourly", hours(0), "b")
+    # only the owner moves the cursor, and only from where it claimed
+    assert not await _advance("hourly", hours(0), hours(24), "b")
+    assert await _advance("hourly", hours(0), hours(24), "a")
+    assert (await cursor())["high_water"] == hours(24).replace(tzinfo=None)
+    # the next window is free, the one behind the cursor is gone
+    assert not await _claim("hourly", hours(0), "b")
+    assert await _claim("hourly", hours(24), "b")
+
+
+async def test_a_lapsed_claim_can_be_taken_over(database, monkeypatch):
+    monkeypatch.setattr(rollup_analytics, "ANALYTICS_CLAIM_TIMEOUT", timedelta(seconds=-1))
+    assert await _claim("hourly", hours(0), "crashed")
+    assert await _claim("hourly", hours(0), "b")
+    # the run that lost its claim can't move the cursor any more
+    assert not await _advance("hourly", hours(0), hours(24), "crashed")
+    assert await _advance("hourly", hours(0), hours(24), "b")
+
+
+async def test_minutes_since_reaches_back_to_the_first_spanned_bucket(database):
+    collection = LiveStreamModel.get_motor_collection()
+    await collection.insert_many([
+        {"start_time": hours(-30) + timedelta(minutes=20), "end_time": hours(2)},
+        {"start_time": hours(1), "end_time": hours(3)},
+        # ended in an earlier window
+        {"start_time": hours(-50), "end_time": hours(-40)},
+    ])
+    assert await _minutes_since("hour", hours(0), hours(24)) == hours(-30)
+    assert await _minutes_since("day", hours(0), hours(24)) == T0 - timedelta(days=2)
+    assert await _minutes_since("hour", hours(4), hours(24)) is None
+    # a session that started inside the window doesn't move it back
+    await collection.delete_many({"start_time": {"$lt": hours(0)}})
+    assert await _minutes_since("hour", hours(0), hours(24)) == hours(0)
+
+
+async def test_overlapping_runs_roll_each_window_up_once(database, monkeypatch):
+    windows = []
+
+    def pipeline(unit, lo, hi, into):
+        windows.append((lo, hi))
+        return [{"$match": {"_id": None}}]
+
+    async def nothing_ended(unit, lo, hi):
+        await asyncio.sleep(0)
+        return None
+
+    monkeypatch.setattr(rollup_analytics, "_viewer_pipeline", pipeline)
+    monkeypatch.setattr(rollup_analytics, "_comment_pipeline", lambda *args: [{"$match": {"_id": None}}])
+    monkeypatch.setattr(rollup_analytics, "_minutes_since", nothing_ended)
+    monkeypatch.setattr(rollup_analytics, "ANALYTICS_LAG", timedelta(0))
+    await LiveStreamModel.get_motor_collection().insert_one({"start_time": hours(0)})
+
+    now = hours(72)
+    first, second = await asyncio.gather(rollup("hourly", now), rollup("hourly", now))
+    assert sorted(windows) == [(hours(0), hours(24)), (hours(24), hours(48)), (hours(48), hours(72))]
+    assert first.windows + second.windows == 3
+    assert first.contended or second.contended
+    assert (await cursor())["high_water"] == now.replace(tzinfo=None)
+    assert "claimed_by" not in await cursor()
@@ -0,0 +1,79 @@
+import random
+from uuid import uuid4
+
+import pytest
+from bson import Binary, DBRef
+
+from eron.jobs import suggest_follows
+from eron.jobs.suggest_follows import _Graph, _Matrices, _score_python, _score_sparse
+from eron.live_stream.models.live_stream import LiveViewerModel
+from eron.users.models.suggestion_models import FollowSuggestionModel
+from eron.users.models.user_models import UserModel
+
+
+def graph_of(follows, viewers=()):
+    graph = _Graph()
+    graph.ids = list(range(len(follows)))
+    graph.index = {user: user for user in graph.ids}
+    graph.follows = [list(targets) for targets in follows]
+    graph.viewers = [list(members) for members in viewers]
+    graph.sessions_of = [[] for _ in graph.ids]
+    for session, members in enumerate(graph.viewers):
+        for member in members:
+            graph.sessions_of[member].append(session)
+    return graph
+
+
+def both(graph, top_k):
+    rows = range(len(graph.ids))
+    return _score_python(graph, rows, top_k), _score_sparse(_Matrices(graph), rows, top_k)
+
+
+def test_small_graph_scores():
+    # 0 follows 1 and 2, who both follow 3; 1 also follows 4; 0, 4 and 5 watched a live together
+    graph = graph_of([[1, 2], [3, 4], [3], [], [], []], viewers=[[0, 4, 5]])
+    python, scipy = both(graph, top_k=10)
+    assert python[0] == [(3, 2.0, 2, 0), (4, 1.5, 1, 1), (5, 0.5, 0, 1)]
+    assert scipy == python
+
+
+def test_followed_users_and_self_are_not_suggested():
+    graph = graph_of([[1], [0, 2], [0]])
+    python, scipy = both(graph, top_k=10)
+    assert python[0] == [(2, 1.0, 1, 0)]
+    assert python[1] == []
+    assert scipy == python
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_sparse_path_matches_python_path(seed):
+    rng = random.Random(seed)
+    users = 60
+    follows = [rng.sample(range(users), rng.randint(0, 8)) for _ in range(users)]
+    viewers = [rng.sample(range(users), rng.randint(2, 6)) for _ in range(15)]
+    graph = graph_of(follows, viewers)
+    # a small top_k forces ties at the cut-off
+    for top_k in (3, 50):
+        python, scipy = both(graph, top_k)
+        assert scipy == python
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("engine", ["scipy", "python"])
+async def test_suggest_copies_the_cards_of_suggested_users(init_models, engine):
+    database = await init_models(UserModel, LiveViewerModel, FollowSuggestionModel)
+    # raw ids: mongomock can't encode native UUIDs
+    ada, alan, grace = (Binary.from_uuid(uuid4()) for _ in range(3))
+    await database.users.insert_many([
+        {"_id": ada, "first_name": "Ada", "following": [DBRef("users", alan)]},
+        {"_id": alan, "first_name": "Alan", "following": [DBRef("users", grace), DBRef("users", grace)]},
+        {"_id": grace, "first_name": "Grace", "profile_image": "grace.png"},
+    ])
+
+    stats = await suggest_follows.suggest(block_size=2, engine=engine)
+    assert (stats.users, stats.stored) == (3, 1)
+    stored = await database.follow_suggestions.find_one({"_id": ada})
+    assert stored["items"] == [{
+        "id": grace, "first_name": "Grace", "profile_image": "grace.png",
+        "score": 1.0, "mutual": 1, "coviewed": 0,
+    }]
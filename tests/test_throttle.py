@@ -0,0 +1,37 @@
+import pytest
+
+from eron.jobs import throttle as throttle_module
+from eron.jobs.throttle import Throttle
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    slept = []
+
+    async def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    monkeypatch.setattr(throttle_module.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(throttle_module.asyncio, "sleep", sleep)
+    return now, slept
+
+
+async def test_throttle_sleeps_off_what_is_ahead_of_the_rate(clock):
+    now, slept = clock
+    throttle = Throttle(rate=100)
+    await throttle.wait(50)
+    assert slept == [pytest.approx(0.5)]
+    # time spent handling the batch counts
+    now[0] += 0.4
+    await throttle.wait(50)
+    assert slept[1:] == [pytest.approx(0.1)]
+
+
+async def test_zero_rate_is_unlimited(clock):
+    _, slept = clock
+    await Throttle(rate=0).wait(10_000)
+    assert slept == []
@@ -0,0 +1,60 @@
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+
+import msgpack
+import pytest
+from pydantic import BaseModel, TypeAdapter
+
+from eron.core.websocket.protocol import CODECS, JSON_CODEC, OutgoingFrame, negotiate
+
+
+class Ping(BaseModel):
+    channel_name: str
+
+
+def socket_offering(*subprotocols):
+    return SimpleNamespace(scope={"subprotocols": list(subprotocols)})
+
+
+def test_negotiate_takes_first_supported_subprotocol():
+    codec, subprotocol = negotiate(socket_offering("v2.bogus", "msgpack", "json"))
+    assert (codec.name, subprotocol) == ("msgpack", "msgpack")
+
+
+def test_negotiate_defaults_to_json_without_subprotocol():
+    assert negotiate(socket_offering()) == (JSON_CODEC, None)
+    assert negotiate(socket_offering("v2.bogus")) == (JSON_CODEC, None)
+
+
+def test_codecs_accept_the_same_payloads():
+    # UUIDs and datetimes, which routers put into frames, go out as strings in both
+    user_id = uuid4()
+    at = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    payload = {"event": "x", "user": user_id, "at": at, "text": "হ্যালো"}
+    expected = {"event": "x", "user": str(user_id), "at": str(at), "text": "হ্যালো"}
+
+    assert json.loads(CODECS["json"].encode(payload)) == expected
+    assert msgpack.unpackb(CODECS["msgpack"].encode(payload), raw=False) == expected
+
+
+@pytest.mark.parametrize("protocol", sorted(CODECS))
+def test_parse_round_trip(protocol):
+    codec = CODECS[protocol]
+    raw = codec.encode({"channel_name": "live_1"})
+    assert codec.parse(raw, Ping) == Ping(channel_name="live_1")
+    assert codec.parse(raw, TypeAdapter(Ping)) == Ping(channel_name="live_1")
+
+
+def test_outgoing_frame_encodes_once_per_protocol(monkeypatch):
+    calls = []
+    encode = CODECS["json"].encode
+    monkeypatch.setattr(CODECS["json"], "encode", lambda payload: calls.append(payload) or encode(payload))
+
+    frame = OutgoingFrame({"event": "new_like", "total_likes": 3})
+    first = frame.encoded(CODECS["json"])
+    assert frame.encoded(CODECS["json"]) is first
+    assert first[1] == len(first[0].encode())
+    assert len(calls) == 1
+    assert isinstance(frame.encoded(CODECS["msgpack"])[0], bytes)